@@ -0,0 +1,248 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+from cache_distancias import CacheDistancias
+from carp_reader import ler_instancia_carp
+from carp_solver import BUSCAS
+from metaheuristica import METAHEURISTICAS
+from resolver_lote import OpcoesResolucao
+
+
+@dataclass
+class SolucaoReferencia:
+    custo_total: int
+    num_rotas: int
+    clocks: int
+
+
+@dataclass
+class ResultadoBenchmark:
+    nome: str
+    referencia: SolucaoReferencia
+    custos: List[int] = field(default_factory=list)
+    tempos: List[float] = field(default_factory=list)  # segundos de CPU
+    gap: float = 0.0          # (melhor custo - referência) / referência
+    tempo_p50: float = 0.0
+    tempo_p90: float = 0.0
+    tempo_max: float = 0.0
+    regressao: Optional[str] = None
+
+
+def ler_solucao_referencia(caminho: str) -> SolucaoReferencia:
+    """
+    Lê o cabeçalho de um arquivo sol-*.dat: custo total, número de rotas e
+    clocks (linhas 1 a 4; a quarta linha é o total de clocks da solução).
+
+    Raises:
+        ValueError: Se o cabeçalho não for numérico ou se a referência tiver
+            custo ou número de rotas nulo (nenhuma instância é atendida sem
+            rotas, e o gap relativo a custo 0 não tem sentido)
+    """
+    with open(caminho, 'r') as f:
+        linhas = [f.readline().strip() for _ in range(4)]
+    if not all(linha.lstrip('-').isdigit() for linha in linhas):
+        raise ValueError(f"Cabeçalho de solução inválido em {caminho}")
+    referencia = SolucaoReferencia(
+        int(linhas[0]), int(linhas[1]), int(linhas[3])
+    )
+    if referencia.custo_total <= 0 or referencia.num_rotas <= 0:
+        raise ValueError(
+            f"Referência inválida em {caminho}: custo "
+            f"{referencia.custo_total} com {referencia.num_rotas} rota(s)"
+        )
+    return referencia
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil p (0 a 100) com interpolação linear."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    fracao = posicao - inferior
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fracao
+
+
+def executar_benchmark(
+    diretorio_referencias: str = "referencias",
+    diretorio_instancias: str = "selected_instances",
+    repeticoes: int = 3,
+    filtro: str = "*",
+    limite_gap: float = 0.0,
+    limite_tempo: float = 0.5,
+    folga_tempo: float = 0.05,
+    opcoes: Optional[OpcoesResolucao] = None
+) -> List[ResultadoBenchmark]:
+    """
+    Executa o solver nas instâncias que têm solução de referência.
+
+    Args:
+        diretorio_referencias: Pasta com os arquivos sol-*.dat de
+            referência; é separada de best_solutions, onde o solver grava,
+            para que uma execução comum não substitua a linha de base
+        diretorio_instancias: Pasta com os arquivos de instância
+        repeticoes: Execuções de CARPSolver.resolver por instância
+        filtro: Padrão glob aplicado ao nome da instância (sem .dat)
+        limite_gap: Gap máximo aceito em relação ao custo de referência
+        limite_tempo: Aumento relativo máximo do tempo mediano em relação aos
+            clocks de referência
+        folga_tempo: Folga absoluta (segundos) somada ao limite de tempo, pois
+            os clocks de referência têm resolução grosseira
+        opcoes: Parâmetros do solver (os mesmos de resolver_lote); cada
+            repetição executa CARPSolver.resolver com um início, e a repetição
+            r usa a semente opcoes.semente + r
+
+    Returns:
+        Lista de ResultadoBenchmark; regressao fica preenchido quando algum
+        limite é ultrapassado
+
+    Raises:
+        ValueError: Se alguma solução de referência for inválida
+    """
+    if opcoes is None:
+        opcoes = OpcoesResolucao()
+    padrao = os.path.join(diretorio_referencias, f"sol-{filtro}.dat")
+    resultados = []
+    cache = CacheDistancias()
+
+    for caminho_referencia in sorted(glob.glob(padrao)):
+        nome = os.path.basename(caminho_referencia)[len("sol-"):]
+        caminho_instancia = os.path.join(diretorio_instancias, nome)
+        if not os.path.exists(caminho_instancia):
+            continue
+
+        referencia = ler_solucao_referencia(caminho_referencia)
+        resultado = ResultadoBenchmark(nome, referencia)
+
+        grafo, arestas_requeridas, capacidade, deposito = \
+            ler_instancia_carp(caminho_instancia)
+        solver = opcoes.criar_solver(
+            grafo, arestas_requeridas, capacidade, deposito, cache
+        )
+        rotas_vazias = 0
+        for repeticao in range(repeticoes):
+            rotas, custo_total, clocks = solver.resolver(
+                tempo_limite=opcoes.tempo_limite,
+                construcao=opcoes.construcao,
+                metaheuristica=opcoes.metaheuristica,
+                semente=None if opcoes.semente is None
+                else opcoes.semente + repeticao
+            )
+            rotas_vazias += sum(1 for rota in rotas if not rota.ids)
+            resultado.custos.append(custo_total)
+            resultado.tempos.append(clocks / 1e9)
+
+        resultado.gap = (
+            (min(resultado.custos) - referencia.custo_total) /
+            referencia.custo_total
+        )
+        resultado.tempo_p50 = percentil(resultado.tempos, 50)
+        resultado.tempo_p90 = percentil(resultado.tempos, 90)
+        resultado.tempo_max = max(resultado.tempos)
+
+        tempo_referencia = referencia.clocks / 1e9
+        if rotas_vazias:
+            # Seriam gravadas como linhas "(D 0,1,1) (D 0,1,1)" sem serviços
+            resultado.regressao = f"{rotas_vazias} rota(s) sem serviços"
+        elif resultado.gap > limite_gap:
+            resultado.regressao = (
+                f"gap {resultado.gap:.2%} acima do limite {limite_gap:.2%}"
+            )
+        elif (resultado.tempo_p50 >
+                tempo_referencia * (1 + limite_tempo) + folga_tempo):
+            resultado.regressao = (
+                f"tempo mediano {resultado.tempo_p50:.3f}s acima de "
+                f"{tempo_referencia:.3f}s + {limite_tempo:.0%}"
+            )
+        resultados.append(resultado)
+
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compara custo e tempo do solver com as soluções de "
+                    "referência e falha se houver regressão."
+    )
+    parser.add_argument("filtro", nargs="?", default="*",
+                        help="Padrão glob do nome da instância (ex.: 'BHW*')")
+    parser.add_argument("-n", "--repeticoes", type=int, default=3)
+    parser.add_argument(
+        "--referencias", default="referencias",
+        help="Pasta das soluções de referência, só lida pelo benchmark "
+             "(padrão: referencias)"
+    )
+    parser.add_argument("--instancias", default="selected_instances")
+    parser.add_argument("--limite-gap", type=float, default=0.0,
+                        help="Gap máximo aceito (0.01 = 1%%; padrão: 0)")
+    parser.add_argument("--limite-tempo", type=float, default=0.5,
+                        help="Aumento máximo do tempo mediano (padrão: 0.5)")
+    parser.add_argument("--folga-tempo", type=float, default=0.05,
+                        help="Folga absoluta de tempo em segundos "
+                             "(padrão: 0.05)")
+    parser.add_argument("-t", "--tempo-limite", type=float, default=None,
+                        help="Tempo máximo de resolução por execução")
+    parser.add_argument("-k", "--vizinhos", type=int, default=None,
+                        help="Tamanho da lista granular (padrão: todos os "
+                             "pares)")
+    parser.add_argument("-b", "--busca", choices=BUSCAS, default="primeira")
+    parser.add_argument("-M", "--metaheuristica",
+                        choices=sorted(METAHEURISTICAS), default=None,
+                        help="Metaheurística após a busca local (use com -t)")
+    parser.add_argument("-s", "--semente", type=int, default=None)
+    parser.add_argument("--json", default=None,
+                        help="Grava o resultado completo neste arquivo")
+    args = parser.parse_args(argv)
+
+    opcoes = OpcoesResolucao(
+        tempo_limite=args.tempo_limite,
+        semente=args.semente,
+        k_vizinhos=args.vizinhos,
+        busca=args.busca,
+        metaheuristica=args.metaheuristica
+    )
+    try:
+        resultados = executar_benchmark(
+            diretorio_referencias=args.referencias,
+            diretorio_instancias=args.instancias,
+            repeticoes=args.repeticoes,
+            filtro=args.filtro,
+            limite_gap=args.limite_gap,
+            limite_tempo=args.limite_tempo,
+            folga_tempo=args.folga_tempo,
+            opcoes=opcoes
+        )
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    print(f"{'instância':<28}{'ref':>10}{'melhor':>10}{'gap':>9}"
+          f"{'p50 (s)':>10}{'p90 (s)':>10}{'ref (s)':>10}")
+    for r in resultados:
+        print(
+            f"{r.nome:<28}{r.referencia.custo_total:>10}{min(r.custos):>10}"
+            f"{r.gap:>9.2%}{r.tempo_p50:>10.3f}{r.tempo_p90:>10.3f}"
+            f"{r.referencia.clocks / 1e9:>10.3f}"
+            + (f"  REGRESSÃO: {r.regressao}" if r.regressao else "")
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(r) for r in resultados], f, indent=2)
+
+    regressoes = [r for r in resultados if r.regressao]
+    if regressoes:
+        print(f"\n{len(regressoes)} instância(s) com regressão.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,590 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Sequence, Tuple
+
+
+class Rota:
+    """
+    Rota de um veículo em colunas ``array('i')`` paralelas: origem, destino
+    e id de cada serviço, no sentido em que é atendido.
+
+    Os movimentos da busca local alteram as colunas no lugar (inserir,
+    remover, substituir, inverter, virar, trocar_caudas); demanda_total e
+    custo_total são mantidos por quem altera a rota (ver
+    CARPSolver._atualizar_rota). A propriedade sequencia monta a lista de
+    tuplas (origem, destino, id_servico), para leitura e gravação da solução.
+    """
+    __slots__ = ("origens", "destinos", "ids", "demanda_total", "custo_total")
+
+    def __init__(
+        self,
+        sequencia: Sequence[Tuple[int, int, int]] = (),
+        demanda_total: int = 0,
+        custo_total: int = 0
+    ):
+        self.origens = array('i')
+        self.destinos = array('i')
+        self.ids = array('i')
+        self.sequencia = sequencia
+        self.demanda_total = demanda_total
+        self.custo_total = custo_total
+
+    @property
+    def sequencia(self) -> List[Tuple[int, int, int]]:
+        return list(zip(self.origens, self.destinos, self.ids))
+
+    @sequencia.setter
+    def sequencia(self, sequencia: Sequence[Tuple[int, int, int]]):
+        self.origens = array('i', [servico[0] for servico in sequencia])
+        self.destinos = array('i', [servico[1] for servico in sequencia])
+        self.ids = array('i', [servico[2] for servico in sequencia])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, pos: int) -> Tuple[int, int, int]:
+        return self.origens[pos], self.destinos[pos], self.ids[pos]
+
+    def __iter__(self):
+        return zip(self.origens, self.destinos, self.ids)
+
+    def __repr__(self) -> str:
+        return (
+            f"Rota(sequencia={self.sequencia}, demanda_total={self.demanda_total}, "
+            f"custo_total={self.custo_total})"
+        )
+
+    def copiar(self) -> "Rota":
+        copia = Rota((), self.demanda_total, self.custo_total)
+        copia.origens = array('i', self.origens)
+        copia.destinos = array('i', self.destinos)
+        copia.ids = array('i', self.ids)
+        return copia
+
+    def inserir(self, pos: int, servico: Tuple[int, int, int]):
+        """Insere servico (origem, destino, id) antes da posição pos."""
+        self.origens.insert(pos, servico[0])
+        self.destinos.insert(pos, servico[1])
+        self.ids.insert(pos, servico[2])
+
+    def remover(self, pos: int) -> Tuple[int, int, int]:
+        """Retira e devolve o serviço da posição pos."""
+        return self.origens.pop(pos), self.destinos.pop(pos), self.ids.pop(pos)
+
+    def substituir(
+        self,
+        pos: int,
+        servico: Tuple[int, int, int]
+    ) -> Tuple[int, int, int]:
+        """Troca o serviço da posição pos por servico e devolve o antigo."""
+        antigo = self[pos]
+        self.origens[pos], self.destinos[pos], self.ids[pos] = servico
+        return antigo
+
+    def inverter(self, inicio: int, fim: int):
+        """Inverte a ordem dos serviços inicio..fim-1 (cada um mantém o sentido)."""
+        for coluna in (self.origens, self.destinos, self.ids):
+            coluna[inicio:fim] = coluna[inicio:fim][::-1]
+
+    def virar(self, pos: int):
+        """Atende o serviço da posição pos no sentido oposto."""
+        self.origens[pos], self.destinos[pos] = self.destinos[pos], self.origens[pos]
+
+    def trocar_caudas(self, corte: int, outra: "Rota", corte_outra: int):
+        """Troca self[corte:] com outra[corte_outra:] (2-opt*)."""
+        for coluna, coluna_outra in (
+            (self.origens, outra.origens),
+            (self.destinos, outra.destinos),
+            (self.ids, outra.ids)
+        ):
+            cauda = coluna[corte:]
+            del coluna[corte:]
+            coluna.extend(coluna_outra[corte_outra:])
+            del coluna_outra[corte_outra:]
+            coluna_outra.extend(cauda)
+
+
+class DadosRota:
+    """
+    Somas acumuladas de uma rota, usadas para avaliar movimentos em O(1).
+
+    Para uma rota s_0..s_{m-1}, com s_i = (o_i, t_i, id_i):
+    - carga[k]: demanda de s_0..s_{k-1}
+    - prefixo[k]: custo do depósito até o fim de s_{k-1}, sem a volta
+    - sufixo[k]: custo de s_k..s_{m-1} mais a volta, sem chegar em o_k
+    - ligacoes[k]: soma de d(t_i, o_{i+1}) para i < k
+    - ligacoes_inversas[k]: soma de d(t_{i+1}, o_i) para i < k
+    - custo: custo total da rota
+    - entrada[k] e saida[k]: vértices antes e depois da posição de inserção k
+      (t_{k-1} ou o depósito; o_k ou o depósito)
+    - atalho[k]: d(entrada[k], saida[k])
+    """
+    __slots__ = (
+        "carga", "prefixo", "sufixo", "ligacoes", "ligacoes_inversas", "custo",
+        "entrada", "saida", "atalho"
+    )
+
+    def __init__(self, carga, prefixo, sufixo, ligacoes, ligacoes_inversas,
+                 custo, entrada, saida, atalho):
+        self.carga = carga
+        self.prefixo = prefixo
+        self.sufixo = sufixo
+        self.ligacoes = ligacoes
+        self.ligacoes_inversas = ligacoes_inversas
+        self.custo = custo
+        self.entrada = entrada
+        self.saida = saida
+        self.atalho = atalho
+
+
+class AvaliadorMovimentos:
+    """
+    Calcula a variação de custo de movimentos da busca local sem montar as
+    rotas resultantes. Cada avaliação consulta apenas os vizinhos das posições
+    alteradas na matriz de distâncias e as somas acumuladas em DadosRota.
+    """
+
+    def __init__(self, distancias: List[Sequence[int]], servicos, deposito: int):
+        self.distancias = distancias
+        self.demanda = servicos.demanda
+        self.custo_servico = servicos.custo_servico
+        self.bidirecional = servicos.bidirecional
+        self.deposito = deposito
+
+    def orientacoes(
+        self,
+        servico: Tuple[int, int, int]
+    ) -> Tuple[Tuple[int, int, int], ...]:
+        """O serviço e, se for uma aresta, o mesmo serviço no sentido oposto."""
+        origem, destino, id_servico = servico
+        if self.bidirecional[id_servico]:
+            return (servico, (destino, origem, id_servico))
+        return (servico,)
+
+    def preparar(self, rota: Rota) -> DadosRota:
+        """Calcula as somas acumuladas de uma rota em O(m)."""
+        dist = self.distancias
+        demanda = self.demanda
+        custo_servico = self.custo_servico
+        deposito = self.deposito
+        origens, destinos, ids = rota.origens, rota.destinos, rota.ids
+        m = len(ids)
+
+        carga = [0] * (m + 1)
+        prefixo = [0] * (m + 1)
+        sufixo = [0] * (m + 1)
+        ligacoes = [0] * max(m, 1)
+        ligacoes_inversas = [0] * max(m, 1)
+
+        anterior = deposito
+        for k, (origem, destino, id_servico) in enumerate(zip(origens, destinos, ids)):
+            carga[k + 1] = carga[k] + demanda[id_servico]
+            prefixo[k + 1] = (
+                prefixo[k] + dist[anterior][origem] + custo_servico[id_servico]
+            )
+            if k > 0:
+                ligacoes[k] = ligacoes[k - 1] + dist[anterior][origem]
+                ligacoes_inversas[k] = (
+                    ligacoes_inversas[k - 1] + dist[destino][origens[k - 1]]
+                )
+            anterior = destino
+
+        proximo = deposito
+        for k in range(m - 1, -1, -1):
+            sufixo[k] = (
+                sufixo[k + 1] + custo_servico[ids[k]] + dist[destinos[k]][proximo]
+            )
+            proximo = origens[k]
+
+        custo = sufixo[0] + dist[deposito][origens[0]] if m else 0
+        entrada = [deposito]
+        entrada.extend(destinos)
+        saida = origens.tolist()
+        saida.append(deposito)
+        atalho = [dist[e][s] for e, s in zip(entrada, saida)]
+        return DadosRota(
+            carga, prefixo, sufixo, ligacoes, ligacoes_inversas, custo,
+            entrada, saida, atalho
+        )
+
+    def delta_remocao(self, rota: Rota, pos: int) -> int:
+        """Variação de custo ao retirar o serviço da posição pos."""
+        dist = self.distancias
+        origem, destino = rota.origens[pos], rota.destinos[pos]
+        anterior = rota.destinos[pos - 1] if pos > 0 else self.deposito
+        proximo = rota.origens[pos + 1] if pos + 1 < len(rota.ids) else self.deposito
+        return (
+            dist[anterior][proximo]
+            - dist[anterior][origem]
+            - self.custo_servico[rota.ids[pos]]
+            - dist[destino][proximo]
+        )
+
+    def delta_insercao(
+        self,
+        rota: Rota,
+        pos: int,
+        servico: Tuple[int, int, int]
+    ) -> int:
+        """Variação de custo ao inserir servico antes da posição pos."""
+        dist = self.distancias
+        origem, destino, id_servico = servico
+        anterior = rota.destinos[pos - 1] if pos > 0 else self.deposito
+        proximo = rota.origens[pos] if pos < len(rota.ids) else self.deposito
+        return (
+            dist[anterior][origem]
+            + self.custo_servico[id_servico]
+            + dist[destino][proximo]
+            - dist[anterior][proximo]
+        )
+
+    def delta_substituicao(
+        self,
+        rota: Rota,
+        pos: int,
+        servico: Tuple[int, int, int]
+    ) -> int:
+        """Variação de custo ao trocar o serviço da posição pos por servico."""
+        dist = self.distancias
+        custo_servico = self.custo_servico
+        anterior = rota.destinos[pos - 1] if pos > 0 else self.deposito
+        proximo = rota.origens[pos + 1] if pos + 1 < len(rota.ids) else self.deposito
+        return (
+            dist[anterior][servico[0]]
+            + custo_servico[servico[2]]
+            + dist[servico[1]][proximo]
+            - dist[anterior][rota.origens[pos]]
+            - custo_servico[rota.ids[pos]]
+            - dist[rota.destinos[pos]][proximo]
+        )
+
+    def delta_troca(
+        self,
+        rota_a: Rota,
+        pos_a: int,
+        rota_b: Rota,
+        pos_b: int
+    ) -> int:
+        """Variação de custo ao trocar serviços entre duas rotas diferentes."""
+        servico_a = (rota_a.origens[pos_a], rota_a.destinos[pos_a], rota_a.ids[pos_a])
+        servico_b = (rota_b.origens[pos_b], rota_b.destinos[pos_b], rota_b.ids[pos_b])
+        return (
+            self.delta_substituicao(rota_a, pos_a, servico_b) +
+            self.delta_substituicao(rota_b, pos_b, servico_a)
+        )
+
+    def melhor_insercao(
+        self,
+        dados: DadosRota,
+        servico: Tuple[int, int, int]
+    ) -> Tuple[int, int, Tuple[int, int, int]]:
+        """
+        Melhor posição (e sentido, se for aresta) para inserir servico na
+        rota, avaliando todas as posições de uma vez.
+
+        Returns:
+            Tuple com a variação de custo, a posição e o serviço orientado
+        """
+        dist = self.distancias
+        linhas_entrada = [dist[e] for e in dados.entrada]
+        melhor = None
+        for orientado in self.orientacoes(servico):
+            origem, destino, _ = orientado
+            linha_destino = dist[destino]
+            valores = [
+                linha[origem] + linha_destino[s] - a
+                for linha, s, a in zip(linhas_entrada, dados.saida, dados.atalho)
+            ]
+            menor = min(valores)
+            if melhor is None or menor < melhor[0]:
+                melhor = (menor, valores.index(menor), orientado)
+        menor, pos, orientado = melhor
+        return menor + self.custo_servico[servico[2]], pos, orientado
+
+    def melhor_troca(
+        self,
+        rota_a: Rota,
+        dados_a: DadosRota,
+        pos_a: int,
+        rota_b: Rota,
+        dados_b: DadosRota,
+        folga_a: int,
+        folga_b: int
+    ) -> Tuple[int, int]:
+        """
+        Melhor serviço de rota_b para trocar com rota_a[pos_a] (mesmo
+        resultado de delta_troca), respeitando as folgas de capacidade.
+
+        Returns:
+            Tuple com a variação de custo e a posição em rota_b, ou (0, -1)
+            se nenhuma troca couber
+        """
+        dist = self.distancias
+        demanda = self.demanda
+        origem_a, destino_a, id_a = rota_a[pos_a]
+        demanda_a = demanda[id_a]
+        # Vizinhos de a na rota a e custo atual da sua posição
+        anterior_a = dados_a.entrada[pos_a]
+        proximo_a = dados_a.saida[pos_a + 1]
+        linha_anterior_a = dist[anterior_a]
+        linha_destino_a = dist[destino_a]
+        # Os custos de serviço se cancelam na troca
+        base_a = -linha_anterior_a[origem_a] - linha_destino_a[proximo_a]
+        entrada_b, saida_b = dados_b.entrada, dados_b.saida
+
+        melhor_delta = None
+        melhor_pos = -1
+        for pos_b, (origem_b, destino_b, id_b) in enumerate(rota_b):
+            diferenca = demanda[id_b] - demanda_a
+            if diferenca > folga_a or -diferenca > folga_b:
+                continue
+            anterior_b = entrada_b[pos_b]
+            proximo_b = saida_b[pos_b + 1]
+            linha_anterior_b = dist[anterior_b]
+            linha_destino_b = dist[destino_b]
+            delta = (
+                base_a
+                # b entra no lugar de a
+                + linha_anterior_a[origem_b] + linha_destino_b[proximo_a]
+                # a entra no lugar de b
+                + linha_anterior_b[origem_a] + linha_destino_a[proximo_b]
+                - linha_anterior_b[origem_b] - linha_destino_b[proximo_b]
+            )
+            if melhor_delta is None or delta < melhor_delta:
+                melhor_delta = delta
+                melhor_pos = pos_b
+        if melhor_delta is None:
+            return 0, -1
+        return melhor_delta, melhor_pos
+
+    def custo_2opt(
+        self,
+        dados_a: DadosRota,
+        corte_a: int,
+        dados_b: DadosRota,
+        corte_b: int
+    ) -> int:
+        """
+        Custo de a[:corte_a] + b[corte_b:] (troca de caudas entre rotas,
+        2-opt*).
+        """
+        if corte_a == 0 and corte_b == len(dados_b.carga) - 1:
+            return 0
+        return (
+            dados_a.prefixo[corte_a]
+            + self.distancias[dados_a.entrada[corte_a]][dados_b.saida[corte_b]]
+            + dados_b.sufixo[corte_b]
+        )
+
+    def melhor_2opt(
+        self,
+        dados_a: DadosRota,
+        dados_b: DadosRota,
+        capacidade: int
+    ) -> Tuple[int, int, int]:
+        """
+        Melhor troca de caudas entre duas rotas (mesmo resultado de
+        custo_2opt nos dois sentidos). Para cada corte em a, os cortes de b
+        que respeitam a capacidade formam um intervalo (a carga acumulada é
+        crescente) e são avaliados de uma vez.
+
+        Returns:
+            Tuple com a variação de custo e os cortes em a e b, ou (0, -1, -1)
+        """
+        dist = self.distancias
+        carga_a, carga_b = dados_a.carga, dados_b.carga
+        total_a, total_b = carga_a[-1], carga_b[-1]
+        # Custo de cada metade nova sem a ligação: prefixo de uma + sufixo da outra
+        prefixo_b, sufixo_b = dados_b.prefixo, dados_b.sufixo
+        linhas_entrada_b = [dist[e] for e in dados_b.entrada]
+        saida_b = dados_b.saida
+        custo_atual = dados_a.custo + dados_b.custo
+
+        melhor_delta = 0
+        melhor = (-1, -1)
+        for corte_a in range(len(carga_a)):
+            # a[:corte_a] + b[corte_b:] e b[:corte_b] + a[corte_a:] cabem
+            minimo = total_b - (capacidade - carga_a[corte_a])
+            maximo = capacidade - (total_a - carga_a[corte_a])
+            inicio = bisect_left(carga_b, minimo)
+            fim = bisect_right(carga_b, maximo)
+            if inicio >= fim:
+                continue
+            linha_entrada_a = dist[dados_a.entrada[corte_a]]
+            saida_a = dados_a.saida[corte_a]
+            base = dados_a.prefixo[corte_a] + dados_a.sufixo[corte_a] - custo_atual
+            valores = [
+                linha_entrada_a[s] + sufixo + prefixo + linha[saida_a]
+                for s, sufixo, prefixo, linha in zip(
+                    saida_b[inicio:fim], sufixo_b[inicio:fim],
+                    prefixo_b[inicio:fim], linhas_entrada_b[inicio:fim]
+                )
+            ]
+            menor = min(valores)
+            if base + menor < melhor_delta:
+                melhor_delta = base + menor
+                melhor = (corte_a, inicio + valores.index(menor))
+        return melhor_delta, melhor[0], melhor[1]
+
+    def melhor_inversao(
+        self,
+        rota: Rota,
+        dados: DadosRota
+    ) -> Tuple[int, int, int]:
+        """
+        Melhor inversão de segmento da rota (mesmo resultado de
+        delta_inversao), avaliando todos os fins de cada início de uma vez.
+
+        Returns:
+            Tuple com a variação de custo, início e fim, ou (0, -1, -1)
+        """
+        dist = self.distancias
+        m = len(rota)
+        saida = dados.saida
+        ligacoes, inversas = dados.ligacoes, dados.ligacoes_inversas
+        # Parte de delta_inversao que só depende do fim f
+        parcela_fim = [0] * (m + 1)
+        for f in range(1, m + 1):
+            parcela_fim[f] = inversas[f - 1] - ligacoes[f - 1] - dados.atalho[f]
+
+        melhor_delta = 0
+        melhor = (-1, -1)
+        for inicio in range(m - 1):
+            linha_anterior = dist[dados.entrada[inicio]]
+            linha_destino = dist[rota.destinos[inicio]]
+            base = (
+                ligacoes[inicio] - inversas[inicio]
+                - linha_anterior[saida[inicio]]
+            )
+            # fim = inicio + 2 .. m; o último serviço invertido é fim - 1
+            valores = [
+                linha_anterior[ultimo] + linha_destino[proximo] + parcela
+                for ultimo, proximo, parcela in zip(
+                    saida[inicio + 1:m], saida[inicio + 2:],
+                    parcela_fim[inicio + 2:]
+                )
+            ]
+            menor = min(valores)
+            if base + menor < melhor_delta:
+                melhor_delta = base + menor
+                melhor = (inicio, inicio + 2 + valores.index(menor))
+        return melhor_delta, melhor[0], melhor[1]
+
+    def orientar(self, rota: Rota) -> Tuple[int, List[int]]:
+        """
+        Escolhe o sentido de todas as arestas da rota de forma exata, por
+        programação dinâmica em O(m): o estado é o sentido do serviço atual e
+        o custo de cada estado é o menor custo desde o depósito até o fim do
+        serviço. A ordem dos serviços não muda.
+
+        Returns:
+            Tuple com o custo da rota orientada e as posições cujo sentido
+            deve ser invertido (ver Rota.virar)
+        """
+        if not len(rota):
+            return 0, []
+        dist = self.distancias
+        custo_servico = self.custo_servico
+        deposito = self.deposito
+
+        # Para cada posição: opções (serviço orientado, custo, opção anterior)
+        estados = []
+        anteriores = [((deposito, deposito, 0), 0, -1)]
+        for servico in rota:
+            opcoes = []
+            for orientado in self.orientacoes(servico):
+                origem = orientado[0]
+                custo, escolha = min(
+                    (custo + dist[anterior[1]][origem], k)
+                    for k, (anterior, custo, _) in enumerate(anteriores)
+                )
+                opcoes.append(
+                    (orientado, custo + custo_servico[servico[2]], escolha)
+                )
+            estados.append(opcoes)
+            anteriores = opcoes
+
+        custo, escolha = min(
+            (custo + dist[orientado[1]][deposito], k)
+            for k, (orientado, custo, _) in enumerate(anteriores)
+        )
+        # A opção 0 é o sentido atual; a opção 1, o oposto
+        viradas = []
+        for pos in range(len(estados) - 1, -1, -1):
+            if escolha:
+                viradas.append(pos)
+            escolha = estados[pos][escolha][2]
+        viradas.reverse()
+        return custo, viradas
+
+    def delta_inversao(
+        self,
+        rota: Rota,
+        dados: DadosRota,
+        inicio: int,
+        fim: int
+    ) -> int:
+        """Variação de custo ao inverter a ordem de rota[inicio:fim]."""
+        dist = self.distancias
+        anterior = dados.entrada[inicio]
+        proximo = dados.saida[fim]
+        return (
+            dist[anterior][rota.origens[fim - 1]]
+            + dist[rota.destinos[inicio]][proximo]
+            + dados.ligacoes_inversas[fim - 1] - dados.ligacoes_inversas[inicio]
+            - dist[anterior][rota.origens[inicio]]
+            - dist[rota.destinos[fim - 1]][proximo]
+            - dados.ligacoes[fim - 1] + dados.ligacoes[inicio]
+        )
+
+
+class VizinhancaGranular:
+    """
+    Lista granular: para cada serviço, os k serviços mais próximos.
+
+    A proximidade entre a e b é min(d(t_a, o_b), d(t_b, o_a)), o menor
+    deslocamento para atender um logo antes do outro. Os movimentos entre
+    rotas só colocam um serviço ao lado de um dos seus vizinhos (ou junto ao
+    depósito, se o depósito estiver mais perto que o k-ésimo vizinho), o que
+    reduz cada passada de O(n²) para O(n·k) avaliações.
+    """
+    __slots__ = ("k", "vizinhos", "perto_deposito")
+
+    def __init__(self, distancias: List[Sequence[int]], servicos, deposito: int,
+                 k: int):
+        self.k = k
+        origem = servicos.origem
+        destino = servicos.destino
+        ids = list(servicos.ids())
+        # Listas indexadas pelo id do serviço (posição 0 não usada)
+        self.vizinhos: List[List[int]] = [[] for _ in range(len(origem))]
+        self.perto_deposito = bytearray(len(origem))
+
+        for a in ids:
+            linha_a = distancias[destino[a]]
+            o_a = origem[a]
+            proximos = heapq.nsmallest(
+                k + 1,
+                ((min(linha_a[origem[b]], distancias[destino[b]][o_a]), b)
+                 for b in ids),
+            )
+            self.vizinhos[a] = [b for _, b in proximos if b != a][:k]
+            ate_deposito = min(
+                distancias[deposito][o_a], linha_a[deposito]
+            )
+            self.perto_deposito[a] = (
+                len(proximos) <= k or ate_deposito <= proximos[-1][0]
+            )
+
+    @staticmethod
+    def posicoes(rotas) -> Tuple[List[int], List[int]]:
+        """Rota e posição de cada serviço, indexadas pelo id."""
+        tamanho = 1 + sum(len(rota) for rota in rotas)
+        rota_de = [-1] * tamanho
+        posicao_de = [-1] * tamanho
+        for i, rota in enumerate(rotas):
+            for pos, id_servico in enumerate(rota.ids):
+                rota_de[id_servico] = i
+                posicao_de[id_servico] = pos
+        return rota_de, posicao_de
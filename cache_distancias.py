@@ -0,0 +1,168 @@
+import hashlib
+import mmap
+import os
+import sys
+from array import array
+from typing import List, Optional
+
+from distancias import (
+    CaminhosMinimos,
+    calcular_caminhos_minimos,
+    montar_caminhos_minimos
+)
+from grafo import Grafo
+
+
+# Alterar quando o formato dos arquivos ou o motor de caminhos mudar, para
+# que entradas antigas deixem de ser encontradas.
+VERSAO_FORMATO = 1
+
+DIRETORIO_PADRAO = ".cache_distancias"
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024  # bytes
+
+_EXTENSOES = (".dist", ".pred")
+
+
+def chave_grafo(grafo: Grafo) -> str:
+    """Gera um hash do conteúdo do grafo (vértices, arcos e custos)."""
+    h = hashlib.sha256(sys.byteorder.encode())
+    h.update(array('q', [VERSAO_FORMATO, grafo.num_vertices]).tobytes())
+    for coluna in (grafo.inicio, grafo.destino, grafo.custo):
+        h.update(coluna.tobytes())
+    return h.hexdigest()
+
+
+class CacheDistancias:
+    """
+    Cache em disco das matrizes de distâncias e predecessores.
+
+    Cada grafo gera dois arquivos binários crus (int64 e int32), abertos com
+    mmap na leitura, de forma que execuções repetidas da mesma instância não
+    recalculam nem copiam a matriz. O tamanho total é limitado e as entradas
+    menos usadas recentemente são removidas primeiro.
+    """
+
+    def __init__(
+        self,
+        diretorio: str = DIRETORIO_PADRAO,
+        tamanho_maximo: int = TAMANHO_MAXIMO_PADRAO
+    ):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+
+    def _caminho(self, chave: str, extensao: str) -> str:
+        return os.path.join(self.diretorio, chave + extensao)
+
+    def carregar(self, chave: str) -> Optional[CaminhosMinimos]:
+        """Carrega uma entrada do cache ou devolve None se não existir."""
+        caminho_dist = self._caminho(chave, ".dist")
+        caminho_pred = self._caminho(chave, ".pred")
+        mapas: List[mmap.mmap] = []
+        try:
+            # Os arquivos são fechados ao sair do with; os mmaps continuam
+            # válidos sem eles
+            with open(caminho_dist, 'rb') as f_dist, \
+                    open(caminho_pred, 'rb') as f_pred:
+                for f in (f_dist, f_pred):
+                    mapas.append(
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+        except (FileNotFoundError, ValueError):
+            # ValueError: arquivo vazio (gravação interrompida)
+            for mapa in mapas:
+                mapa.close()
+            return None
+        mapa_dist, mapa_pred = mapas
+
+        num_vertices = int(round((len(mapa_dist) // 8) ** 0.5))
+        if (num_vertices * num_vertices * 8 != len(mapa_dist) or
+                num_vertices * num_vertices * 4 != len(mapa_pred)):
+            # Fecha os mapeamentos antes de apagar os arquivos (no Windows,
+            # um arquivo mapeado não pode ser removido)
+            mapa_dist.close()
+            mapa_pred.close()
+            self.invalidar(chave)
+            return None
+
+        # Marca o uso da entrada para a política LRU (outro processo pode
+        # tê-la removido nesse meio tempo; o mmap continua válido)
+        for extensao in _EXTENSOES:
+            try:
+                os.utime(self._caminho(chave, extensao))
+            except FileNotFoundError:
+                pass
+
+        return montar_caminhos_minimos(mapa_dist, mapa_pred, num_vertices, "cache")
+
+    def salvar(self, chave: str, caminhos: CaminhosMinimos):
+        """Grava uma entrada de forma atômica e aplica o limite de tamanho."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        buffers = (
+            (".dist", caminhos.distancias),
+            (".pred", caminhos.predecessores)
+        )
+        for extensao, linhas in buffers:
+            destino = self._caminho(chave, extensao)
+            temporario = f"{destino}.{os.getpid()}.tmp"
+            with open(temporario, 'wb') as f:
+                for linha in linhas:
+                    f.write(linha)
+            os.replace(temporario, destino)
+        self._aplicar_limite()
+
+    def obter(
+        self,
+        grafo: Grafo,
+        metodo: Optional[str] = None
+    ) -> CaminhosMinimos:
+        """Devolve os caminhos mínimos do grafo, calculando-os se necessário."""
+        chave = chave_grafo(grafo)
+        caminhos = self.carregar(chave)
+        if caminhos is None:
+            caminhos = calcular_caminhos_minimos(grafo, metodo)
+            self.salvar(chave, caminhos)
+        return caminhos
+
+    def invalidar(self, chave: str):
+        """Remove uma entrada do cache."""
+        for extensao in _EXTENSOES:
+            try:
+                os.remove(self._caminho(chave, extensao))
+            except FileNotFoundError:
+                pass
+
+    def limpar(self):
+        """Remove todas as entradas do cache."""
+        for chave in self._chaves():
+            self.invalidar(chave)
+
+    def _chaves(self) -> List[str]:
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted({
+            nome[:-5] for nome in os.listdir(self.diretorio)
+            if nome.endswith(_EXTENSOES)
+        })
+
+    def _aplicar_limite(self):
+        """Remove as entradas menos usadas até caber em tamanho_maximo."""
+        entradas = []
+        total = 0
+        for chave in self._chaves():
+            tamanho = 0
+            ultimo_uso = 0.0
+            for extensao in _EXTENSOES:
+                try:
+                    info = os.stat(self._caminho(chave, extensao))
+                except FileNotFoundError:
+                    continue
+                tamanho += info.st_size
+                ultimo_uso = max(ultimo_uso, info.st_mtime)
+            entradas.append((ultimo_uso, chave, tamanho))
+            total += tamanho
+
+        for _, chave, tamanho in sorted(entradas):
+            if total <= self.tamanho_maximo:
+                break
+            self.invalidar(chave)
+            total -= tamanho
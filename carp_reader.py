@@ -1,137 +1,168 @@
-from typing import Tuple, List
-from carp_solver import Aresta
+import io
+import mmap
+import os
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, TextIO, Tuple, Union
+from carp_solver import Aresta, TIPO_ARCO, TIPO_ARESTA, TIPO_NO
+from grafo import Grafo
+
+
+FonteInstancia = Union[str, os.PathLike, TextIO, BinaryIO, mmap.mmap, bytes]
+
+
+def _linhas(fonte: FonteInstancia) -> Iterator[str]:
+    """
+    Percorre as linhas de uma instância sem carregá-la inteira na memória.
+
+    Aceita um caminho, um arquivo aberto (texto ou binário), um mmap ou um
+    buffer de bytes.
+    """
+    if isinstance(fonte, (str, os.PathLike)):
+        with open(fonte, 'r') as f:
+            yield from f
+    elif isinstance(fonte, mmap.mmap):
+        for linha in iter(fonte.readline, b""):
+            yield linha.decode()
+    elif isinstance(fonte, (bytes, bytearray, memoryview)):
+        yield from io.TextIOWrapper(io.BytesIO(fonte))
+    else:
+        for linha in fonte:
+            yield linha.decode() if isinstance(linha, bytes) else linha
+
+
+def ler_cabecalho_carp(fonte: FonteInstancia) -> Dict[str, str]:
+    """
+    Lê apenas o cabeçalho de uma instância (até a primeira linha em branco).
+    
+    Args:
+        fonte: Caminho, arquivo aberto, mmap ou buffer da instância
+        
+    Returns:
+        Dicionário campo -> valor, por exemplo {"#Nodes": "563", ...}
+    """
+    cabecalho = {}
+    for linha in _linhas(fonte):
+        if not linha.strip():
+            break
+        if ':' in linha:
+            campo, valor = linha.split(':', 1)
+            cabecalho[campo.strip()] = valor.strip()
+    return cabecalho
+
+
+# Cabeçalho de seção -> (prefixo das linhas, é requerida, tipo)
+_SECOES = {
+    "ReN.": ("N", True, TIPO_NO),
+    "ReE.": ("E", True, TIPO_ARESTA),
+    "EDGE": ("NrE", False, TIPO_ARESTA),
+    "ReA.": ("A", True, TIPO_ARCO),
+    "ARC": ("NrA", False, TIPO_ARCO),
+}
+
+
+def _numericos(campos: List[str]) -> bool:
+    """Indica se todos os campos da linha são inteiros não negativos."""
+    return all(campo.isdigit() for campo in campos)
 
 
 def ler_instancia_carp(
-    nome_arquivo: str
-) -> Tuple[List[List[int]], List[Aresta], int, int]:
+    fonte: FonteInstancia
+) -> Tuple[Grafo, List[Aresta], int, int]:
     """
-    Lê um arquivo de instância do CARP e retorna os dados necessários.
+    Lê uma instância do CARP em uma única passada, linha a linha.
+    
+    O leitor troca de estado nos cabeçalhos de seção (ReN., ReE., EDGE, ReA.
+    e ARC) e grava os arcos diretamente em colunas ``array``, de forma que a
+    memória usada não depende do tamanho do arquivo, apenas do grafo.
     
     Args:
-        nome_arquivo: Nome do arquivo de instância
+        fonte: Caminho, arquivo aberto (texto ou binário), mmap ou buffer
         
     Returns:
         Tuple contendo:
-        - matriz_adjacencia: Matriz de adjacência do grafo
-        - arestas_requeridas: Lista de arestas requeridas
+        - grafo: Grafo em formato CSR (arestas nos dois sentidos)
+        - arestas_requeridas: Lista de nós, arestas e arcos (requeridos ou não)
         - capacidade_veiculo: Capacidade do veículo
         - deposito: Vértice do depósito
     """
-    with open(nome_arquivo, 'r') as f:
-        linhas = f.readlines()
-    
-    # Encontra a capacidade do veículo e o depósito no cabeçalho do arquivo
     capacidade_veiculo = None
     deposito = None
     
-    for linha in linhas:
-        if linha.startswith('Capacity:'):
-            capacidade_veiculo = int(linha.split(':')[1].strip())
-        elif linha.startswith('Depot Node:'):
-            deposito = int(linha.split(':')[1].strip())
-        
-        if capacidade_veiculo is not None and deposito is not None:
-            break
-    
-    if capacidade_veiculo is None:
-        raise ValueError("Capacidade do veículo não encontrada no arquivo")
-    
-    if deposito is None:
-        raise ValueError("Depósito não encontrado no arquivo")
-    
-    # Primeiro, vamos identificar todos os vértices para criar a matriz
-    vertices = set()
     arestas_requeridas = []
+    # Arcos no sentido de percurso, em colunas paralelas
+    origens, destinos, custos = array('i'), array('i'), array('q')
+    maior_vertice = 0
+    secao = None
     
-    # Processa as linhas do arquivo
-    for linha in linhas:
-        linha = linha.strip()
-        if not linha:
-            continue
-            
+    for linha in _linhas(fonte):
         partes = linha.split()
         if not partes:
             continue
-            
-        # Verifica se é uma aresta requerida (E1, E2, etc)
-        if (partes[0].startswith('E') and 
-                len(partes[0]) > 1 and 
-                partes[0][1:].isdigit()):
-            if len(partes) >= 6:
-                origem = int(partes[1])
-                destino = int(partes[2])
-                custo = int(partes[3])
-                demanda = int(partes[4])
-                custo_servico = int(partes[5])
-                
-                vertices.add(origem)
-                vertices.add(destino)
-                
-                arestas_requeridas.append(
-                    Aresta(origem, destino, custo, demanda, 
-                        custo_servico, True)
-                )
         
-        # Verifica se é uma aresta não requerida (NrE1, NrE2, etc)
-        elif (partes[0].startswith('NrE') and 
-                len(partes[0]) > 3 and 
-                partes[0][3:].isdigit()):
-            if len(partes) >= 4:
-                origem = int(partes[1])
-                destino = int(partes[2])
-                custo = int(partes[3])
-                
-                vertices.add(origem)
-                vertices.add(destino)
-                
-                arestas_requeridas.append(
-                    Aresta(origem, destino, custo, 0, 0, False)
-                )
-                
-        # Verifica se é um arco requerido (A1, A2, etc)
-        elif (partes[0].startswith('A') and 
-                len(partes[0]) > 1 and 
-                partes[0][1:].isdigit()):
-            if len(partes) >= 6:
-                origem = int(partes[1])
-                destino = int(partes[2])
-                custo = int(partes[3])
-                demanda = int(partes[4])
-                custo_servico = int(partes[5])
-                
-                vertices.add(origem)
-                vertices.add(destino)
-                
-                arestas_requeridas.append(
-                    Aresta(origem, destino, custo, demanda, 
-                        custo_servico, True)
-                )
+        primeiro = partes[0]
+        if primeiro in _SECOES:
+            secao = _SECOES[primeiro]
+            continue
+        
+        if secao is None:
+            # Cabeçalho do arquivo
+            if linha.startswith('Capacity:'):
+                capacidade_veiculo = int(linha.split(':')[1])
+            elif linha.startswith('Depot Node:'):
+                deposito = int(linha.split(':')[1])
+            continue
         
-        # Verifica se é um arco não requerido (NrA1, NrA2, etc)
-        elif (partes[0].startswith('NrA') and 
-                len(partes[0]) > 3 and 
-                partes[0][3:].isdigit()):
-            if len(partes) >= 4:
-                origem = int(partes[1])
-                destino = int(partes[2])
-                custo = int(partes[3])
-                
-                vertices.add(origem)
-                vertices.add(destino)
-                
-                arestas_requeridas.append(
-                    Aresta(origem, destino, custo, 0, 0, False)
-                )
+        prefixo, requerida, tipo = secao
+        # Ignora linhas que não são da seção (ex.: comentários no fim ou
+        # texto que por acaso começa com o prefixo, como "Nota")
+        if (not primeiro.startswith(prefixo)
+                or not primeiro[len(prefixo):].isdigit()):
+            continue
+        
+        if tipo == TIPO_NO:
+            # Nó requerido: N<id> DEMANDA CUSTO_SERVICO
+            if len(partes) < 3 or not _numericos(partes[1:3]):
+                continue
+            no = int(primeiro[1:])
+            arestas_requeridas.append(
+                Aresta(no, no, 0, int(partes[1]), int(partes[2]), True,
+                       tipo=TIPO_NO)
+            )
+            maior_vertice = max(maior_vertice, no)
+            continue
+        
+        num_campos = 6 if requerida else 4
+        if len(partes) < num_campos or not _numericos(partes[1:num_campos]):
+            continue
+        
+        origem = int(partes[1])
+        destino = int(partes[2])
+        custo = int(partes[3])
+        if requerida:
+            aresta = Aresta(origem, destino, custo, int(partes[4]),
+                            int(partes[5]), True, tipo=tipo)
+        else:
+            aresta = Aresta(origem, destino, custo, 0, 0, False, tipo=tipo)
+        arestas_requeridas.append(aresta)
+        
+        origens.append(origem)
+        destinos.append(destino)
+        custos.append(custo)
+        if tipo == TIPO_ARESTA:
+            origens.append(destino)
+            destinos.append(origem)
+            custos.append(custo)
+        maior_vertice = max(maior_vertice, origem, destino)
     
-    # Cria a matriz de adjacência
-    num_vertices = max(vertices) + 1  # +1 porque os vértices começam em 1
-    matriz_adjacencia = [[0] * num_vertices for _ in range(num_vertices)]
+    if capacidade_veiculo is None:
+        raise ValueError("Capacidade do veículo não encontrada no arquivo")
     
-    # Preenche a matriz com todas as arestas e arcos
-    for aresta in arestas_requeridas:
-        matriz_adjacencia[aresta.origem][aresta.destino] = aresta.custo
-        if not aresta.requerida:  # Se não é requerida, é bidirecional
-            matriz_adjacencia[aresta.destino][aresta.origem] = aresta.custo
+    if deposito is None:
+        raise ValueError("Depósito não encontrado no arquivo")
     
-    return matriz_adjacencia, arestas_requeridas, capacidade_veiculo, deposito 
\ No newline at end of file
+    # Cria o grafo (+1 porque os vértices começam em 1); o depósito pode ter
+    # id maior que o de qualquer vértice listado nas seções
+    maior_vertice = max(maior_vertice, deposito)
+    grafo = Grafo.de_colunas(maior_vertice + 1, origens, destinos, custos)
+
+    return grafo, arestas_requeridas, capacidade_veiculo, deposito
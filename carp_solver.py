@@ -1,86 +1,252 @@
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
 import heapq
-from dataclasses import dataclass
-from typing import List, Tuple
+import os
+import random
 import time
 
-@dataclass
+from busca_local import AvaliadorMovimentos, DadosRota, Rota, VizinhancaGranular
+from cache_distancias import CacheDistancias
+from componentes import componentes_fortes
+from construcao import IndiceServicos, dividir_tour, tour_gigante
+from distancias import CaminhosMinimos, caminhos_sob_demanda, calcular_caminhos_minimos
+from grafo import Grafo
+from metaheuristica import METAHEURISTICAS
+
+# Tipos de elemento da instância
+TIPO_NO = "N"
+TIPO_ARESTA = "E"
+TIPO_ARCO = "A"
+
+# Heurísticas de construção aceitas por CARPSolver.resolver
+CONSTRUCOES = ("path_scanning", "split")
+
+# Estratégias de busca local: primeira melhoria ou melhor melhoria
+BUSCAS = ("primeira", "melhor")
+
+
 class Aresta:
-    origem: int
-    destino: int
-    custo: int
-    demanda: int
-    custo_servico: int
-    requerida: bool = False
-    id: int = 0
+    """
+    Aresta, arco ou nó da instância. Um nó requerido é representado como um
+    serviço com origem == destino e custo de travessia 0.
+    """
+    __slots__ = (
+        "origem", "destino", "custo", "demanda", "custo_servico", "requerida",
+        "id", "tipo"
+    )
+
+    def __init__(self, origem: int, destino: int, custo: int, demanda: int,
+                 custo_servico: int, requerida: bool = False, id: int = 0,
+                 tipo: str = TIPO_ARCO):
+        self.origem = origem
+        self.destino = destino
+        self.custo = custo
+        self.demanda = demanda
+        self.custo_servico = custo_servico
+        self.requerida = requerida
+        self.id = id
+        self.tipo = tipo
+
+    def __repr__(self) -> str:
+        return (
+            f"Aresta(origem={self.origem}, destino={self.destino}, "
+            f"custo={self.custo}, demanda={self.demanda}, "
+            f"custo_servico={self.custo_servico}, requerida={self.requerida}, "
+            f"id={self.id}, tipo={self.tipo!r})"
+        )
+
+
+class TabelaServicos:
+    """
+    Índice dos serviços (nós, arestas e arcos requeridos) de uma instância.
+
+    Os atributos de cada serviço ficam em colunas ``array`` indexadas pelo id
+    do serviço (a posição 0 não é usada, pois os ids começam em 1), o que
+    permite consultas em tempo constante nos laços do solver. origem e
+    destino guardam o sentido lido da instância; nas rotas, uma aresta
+    (bidirecional[id] == 1) pode aparecer como (destino, origem, id).
+    """
+    __slots__ = (
+        "origem", "destino", "demanda", "custo_servico", "custo",
+        "bidirecional"
+    )
+
+    def __init__(self, arestas: List[Aresta]):
+        self.origem = array('i', [0])
+        self.destino = array('i', [0])
+        self.demanda = array('q', [0])
+        self.custo_servico = array('q', [0])
+        self.custo = array('q', [0])
+        self.bidirecional = bytearray(1)
+
+        for aresta in arestas:
+            if not aresta.requerida:
+                continue
+            aresta.id = len(self.origem)
+            self.origem.append(aresta.origem)
+            self.destino.append(aresta.destino)
+            self.demanda.append(aresta.demanda)
+            self.custo_servico.append(aresta.custo_servico)
+            self.custo.append(aresta.custo)
+            self.bidirecional.append(aresta.tipo == TIPO_ARESTA)
 
-@dataclass
-class Rota:
-    sequencia: List[Tuple[int, int, int]]  # (origem, destino, id_servico)
-    demanda_total: int
-    custo_total: int
+    def __len__(self) -> int:
+        return len(self.origem) - 1
+
+    def ids(self) -> range:
+        """Ids de todos os serviços."""
+        return range(1, len(self.origem))
+
+
+class Checkpoint:
+    """
+    Grava a melhor solução conhecida (incumbente) em intervalos regulares.
+
+    Como gerar_arquivo_solucao grava de forma atômica, uma execução
+    interrompida (prazo, sinal ou falha) deixa um arquivo de solução válido
+    com a última incumbente registrada.
+    """
+
+    def __init__(self, solver: "CARPSolver", nome_arquivo: str,
+                 intervalo: float = 5.0):
+        """
+        Args:
+            solver: Solver que gera o arquivo de solução
+            nome_arquivo: Caminho do arquivo de solução
+            intervalo: Intervalo mínimo (segundos) entre gravações; 0 grava a
+                cada melhoria
+        """
+        self.solver = solver
+        self.nome_arquivo = nome_arquivo
+        self.intervalo = intervalo
+        self.inicio = time.process_time()
+        self.melhor_custo: Optional[int] = None
+        self.ultima_gravacao = float('-inf')
+
+    def registrar(self, rotas: List[Rota], forcar: bool = False) -> bool:
+        """
+        Grava as rotas se forem melhores que a incumbente e o intervalo já
+        tiver passado (ou se forcar for True).
+
+        Returns:
+            True se o arquivo foi gravado
+        """
+        agora = time.monotonic()
+        if not forcar and agora - self.ultima_gravacao < self.intervalo:
+            return False
+        custo_total = sum(rota.custo_total for rota in rotas)
+        if self.melhor_custo is not None and custo_total >= self.melhor_custo:
+            return False
+        clocks = int((time.process_time() - self.inicio) * 1e9)
+        self.solver.gerar_arquivo_solucao(
+            rotas, custo_total, self.nome_arquivo, clocks
+        )
+        self.melhor_custo = custo_total
+        self.ultima_gravacao = agora
+        return True
 
 
 class CARPSolver:
-    def __init__(self, matriz_adjacencia: List[List[int]], arestas_requeridas: List[Aresta], capacidade_veiculo: int, deposito: int):
-        self.matriz_adjacencia = matriz_adjacencia
+    def __init__(self, grafo: Grafo, arestas_requeridas: List[Aresta], capacidade_veiculo: int, deposito: int,
+                 cache_distancias: Optional[CacheDistancias] = None,
+                 caminhos_minimos: Optional[CaminhosMinimos] = None,
+                 k_vizinhos: Optional[int] = None,
+                 busca: str = "primeira",
+                 oraculo: bool = False,
+                 max_linhas: Optional[int] = None):
+        self.grafo = grafo
         self.arestas_requeridas = arestas_requeridas
         self.capacidade_veiculo = capacidade_veiculo
         self.deposito = deposito
-        self.num_vertices = len(matriz_adjacencia)
+        self.num_vertices = grafo.num_vertices
+        self.cache_distancias = cache_distancias
+        self.caminhos_minimos = caminhos_minimos
+        self.servicos = TabelaServicos(arestas_requeridas)
+        self._verificar_alcance()
+        # Com oraculo, as distâncias são calculadas por Dijkstra só a partir
+        # dos vértices consultados, guardando no máximo max_linhas linhas
+        # (padrão: extremidades dos serviços mais o depósito)
+        self.oraculo = oraculo
+        self.max_linhas = max_linhas
+        # Instante (time.monotonic()) em que a busca local deve parar
+        self.prazo: Optional[float] = None
+        # Tamanho da lista granular dos movimentos entre rotas (None: todos os
+        # pares); a lista é calculada na primeira busca local
+        self.k_vizinhos = k_vizinhos
+        self._granular: Optional[VizinhancaGranular] = None
+        if busca not in BUSCAS:
+            raise ValueError(f"Busca desconhecida: {busca}")
+        self.busca = busca
+        # Tempo de parede (segundos) de cada etapa, para relatórios
+        self.tempos: Dict[str, float] = {}
+        inicio = time.perf_counter()
         self.distancias = self._calcular_distancias()
+        self.tempos["caminhos_minimos"] = time.perf_counter() - inicio
 
-    def _calcular_distancias(self) -> List[List[int]]:
-        """Calcula as distâncias mínimas entre todos os pares de vértices usando Floyd-Warshall"""
-        dist = [[float('inf')] * self.num_vertices for _ in range(self.num_vertices)]
-        
-        # Inicializa com as distâncias diretas da matriz de adjacência
-        for i in range(self.num_vertices):
-            for j in range(self.num_vertices):
-                if i == j:
-                    dist[i][j] = 0
-                elif self.matriz_adjacencia[i][j] != 0:
-                    dist[i][j] = self.matriz_adjacencia[i][j]
-        
-        # Algoritmo Floyd-Warshall
-        for k in range(self.num_vertices):
-            for i in range(self.num_vertices):
-                for j in range(self.num_vertices):
-                    if dist[i][k] != float('inf') and dist[k][j] != float('inf'):
-                        dist[i][j] = min(dist[i][j], dist[i][k] + dist[k][j])
-        
-        return dist
+    def _calcular_distancias(self) -> List[Sequence[int]]:
+        """Calcula as distâncias mínimas entre todos os pares de vértices"""
+        if self.caminhos_minimos is not None:
+            # Matriz já calculada (ex.: memória compartilhada entre processos)
+            caminhos = self.caminhos_minimos
+        elif self.oraculo:
+            max_linhas = self.max_linhas
+            if max_linhas is None:
+                max_linhas = len(self.vertices_consultados())
+            caminhos = caminhos_sob_demanda(self.grafo, max_linhas)
+        elif self.cache_distancias is not None:
+            caminhos = self.cache_distancias.obter(self.grafo)
+        else:
+            caminhos = calcular_caminhos_minimos(self.grafo)
+        self.predecessores = caminhos.predecessores
+        return caminhos.distancias
+
+    def _verificar_alcance(self):
+        """
+        Falha logo na criação do solver se algum serviço não pode ser feito
+        em uma rota que sai e volta ao depósito, em vez de devolver custos
+        infinitos depois da busca.
+
+        Um serviço de origem o e destino d exige caminhos depósito → o e
+        d → depósito; como o leva a d, isso equivale a o e d estarem na
+        componente fortemente conexa do depósito.
+        """
+        servicos = self.servicos
+        if len(servicos) == 0:
+            return
+        rotulos, _ = componentes_fortes(self.grafo)
+        if 0 <= self.deposito < len(rotulos):
+            componente = rotulos[self.deposito]
+        else:
+            componente = -1  # depósito sem nenhum arco
+        inalcancaveis = [
+            (servicos.origem[s], servicos.destino[s])
+            for s in servicos.ids()
+            if rotulos[servicos.origem[s]] != componente
+            or rotulos[servicos.destino[s]] != componente
+        ]
+        if inalcancaveis:
+            exemplos = ", ".join(f"{o}-{d}" for o, d in inalcancaveis[:5])
+            raise ValueError(
+                f"{len(inalcancaveis)} serviço(s) fora do alcance do depósito "
+                f"{self.deposito} (ex.: {exemplos})"
+            )
+
+    def vertices_consultados(self) -> set:
+        """Vértices de origem das consultas de distância: extremidades dos serviços e depósito"""
+        vertices = {self.deposito}
+        vertices.update(self.servicos.origem[1:])
+        vertices.update(self.servicos.destino[1:])
+        return vertices
 
     def _encontrar_caminho(self, origem: int, destino: int) -> List[int]:
-        """Encontra o caminho mais curto entre dois vértices usando Dijkstra"""
-        distancias = [float('inf')] * self.num_vertices
-        distancias[origem] = 0
-        predecessores = [-1] * self.num_vertices
-        heap = [(0, origem)]
-        visitados = set()
-
-        while heap:
-            dist_atual, vertice_atual = heapq.heappop(heap)
-            
-            if vertice_atual in visitados:
-                continue
-                
-            visitados.add(vertice_atual)
-            
-            if vertice_atual == destino:
-                break
-                
-            for vizinho in range(self.num_vertices):
-                if self.matriz_adjacencia[vertice_atual][vizinho] != 0:
-                    nova_dist = dist_atual + self.matriz_adjacencia[vertice_atual][vizinho]
-                    if nova_dist < distancias[vizinho]:
-                        distancias[vizinho] = nova_dist
-                        predecessores[vizinho] = vertice_atual
-                        heapq.heappush(heap, (nova_dist, vizinho))
-
-        # Reconstrói o caminho
+        """Reconstrói o caminho mais curto entre dois vértices a partir dos predecessores"""
+        if origem == destino:
+            return [origem]
+
+        predecessores = self.predecessores[origem]
         if predecessores[destino] == -1:
             return []
-            
+
         caminho = []
         atual = destino
         while atual != -1:
@@ -88,7 +254,7 @@ class CARPSolver:
             atual = predecessores[atual]
         return list(reversed(caminho))
 
-    def _calcular_custo_rota(self, rota: List[Tuple[int, int, int]]) -> int:
+    def _calcular_custo_rota(self, rota: Sequence[Tuple[int, int, int]]) -> int:
         """Calcula o custo total de uma rota"""
         if not rota:
             return 0
@@ -99,15 +265,12 @@ class CARPSolver:
         # Custo para ir do depósito até o primeiro serviço
         custo_total += self.distancias[vertice_atual][rota[0][0]]
 
+        custo_servico = self.servicos.custo_servico
+
         # Custo dos serviços e deslocamentos entre eles
-        for i, (origem, destino, _) in enumerate(rota):
+        for i, (origem, destino, id_servico) in enumerate(rota):
             # Custo do serviço
-            for aresta in self.arestas_requeridas:
-                if ((aresta.origem == origem and aresta.destino == destino) or
-                    (not aresta.requerida and 
-                     aresta.origem == destino and aresta.destino == origem)):
-                    custo_total += aresta.custo_servico
-                    break
+            custo_total += custo_servico[id_servico]
             
             # Custo para ir até o próximo serviço
             if i < len(rota) - 1:
@@ -122,189 +285,977 @@ class CARPSolver:
 
         return custo_total
 
-    def _construir_solucao_inicial(self) -> List[Rota]:
-        """Constrói uma solução inicial usando uma heurística construtiva path-scanning"""
+    def _construir_solucao_inicial(
+        self,
+        limiar: float = 0.7,
+        peso: float = 0.3,
+        rng: Optional[random.Random] = None
+    ) -> List[Rota]:
+        """
+        Constrói uma solução inicial usando uma heurística construtiva path-scanning.
+
+        Os serviços não atendidos ficam em um IndiceServicos: a cada passo só
+        são avaliados os serviços que cabem no veículo, em ordem de distância
+        a partir do vértice atual, e a varredura para assim que nenhum serviço
+        mais distante pode superar o melhor encontrado. A escolha é a mesma da
+        varredura completa (mesmo critério e mesmo desempate pelo id).
+
+        Args:
+            limiar: Fração da capacidade a partir da qual a rota passa a
+                priorizar serviços próximos do depósito
+            peso: Peso da distância ao depósito no critério de seleção
+            rng: Se informado, os empates são desfeitos em ordem aleatória
+                em vez de pelo id
+
+        Returns:
+            Lista de rotas
+        """
         rotas: List[Rota] = []
-        # Filtra apenas arestas requeridas e atribui IDs únicos
-        arestas_nao_atendidas = []
-        id_servico = 1
-        for aresta in self.arestas_requeridas:
-            if aresta.requerida:
-                aresta.id = id_servico
-                arestas_nao_atendidas.append(aresta)
-                id_servico += 1
-        
-        while arestas_nao_atendidas:
+        servicos = self.servicos
+        origem = servicos.origem
+        destino = servicos.destino
+        demanda = servicos.demanda
+        custo_servico = servicos.custo_servico
+        distancias = self.distancias
+        deposito = self.deposito
+        capacidade = self.capacidade_veiculo
+
+        # Critério 2 (parte que não depende do vértice atual): priorizar
+        # serviços mais distantes do depósito enquanto a carga é baixa
+        ajuste_inicio = array('d', [0.0]) * len(origem)
+        ajuste_fim = array('d', [0.0]) * len(origem)
+        for i in servicos.ids():
+            dist_deposito_origem = distancias[origem[i]][deposito]
+            dist_deposito_destino = distancias[destino[i]][deposito]
+            ajuste_inicio[i] = max(dist_deposito_origem, dist_deposito_destino) * peso
+            ajuste_fim[i] = min(dist_deposito_origem, dist_deposito_destino) * peso
+
+        # Menor valor possível de cada critério com custo de chegada zero,
+        # usado como limite inferior para interromper a varredura
+        piso_inicio = min(
+            (custo_servico[i] / demanda[i] - ajuste_inicio[i] for i in servicos.ids()),
+            default=0.0
+        )
+        piso_fim = min(
+            (custo_servico[i] / demanda[i] + ajuste_fim[i] for i in servicos.ids()),
+            default=0.0
+        )
+
+        # Prioridade de desempate de cada serviço
+        desempate = list(range(len(origem)))
+        if rng is not None:
+            rng.shuffle(desempate)
+
+        nao_atendidos = IndiceServicos(distancias, origem, demanda, servicos.ids())
+        atendido = nao_atendidos.atendido
+
+        while nao_atendidos:
             rota_atual: List[Tuple[int, int, int]] = []  # (origem, destino, id_servico)
             demanda_atual = 0
-            vertice_atual = self.deposito
-            
-            while arestas_nao_atendidas:
-                # Lista de arestas candidatas (que respeitam a capacidade)
-                candidatas = [
-                    aresta for aresta in arestas_nao_atendidas
-                    if demanda_atual + aresta.demanda <= self.capacidade_veiculo
-                ]
-                
-                if not candidatas:
+            vertice_atual = deposito
+
+            while nao_atendidos:
+                capacidade_restante = capacidade - demanda_atual
+                maior_demanda = nao_atendidos.maior_demanda_viavel(capacidade_restante)
+                if maior_demanda is None:
                     break
-                
-                # Critérios de seleção
-                melhor_aresta = None
+
+                inicio_rota = demanda_atual < capacidade * limiar
+                piso = piso_inicio if inicio_rota else piso_fim
+                linha = distancias[vertice_atual]
+
+                melhor_servico = 0
                 melhor_valor = float('inf')
-                
-                for aresta in candidatas:
-                    # Custo para chegar na aresta
-                    custo_ate_origem = self.distancias[vertice_atual][aresta.origem]
-                    
-                    # Distância até o depósito após servir a aresta
-                    dist_deposito_origem = self.distancias[aresta.origem][self.deposito]
-                    dist_deposito_destino = self.distancias[aresta.destino][self.deposito]
-                    
+                limite = float('inf')
+
+                for i in nao_atendidos.por_proximidade(vertice_atual):
+                    # Custo para chegar no serviço
+                    custo_ate_origem = linha[origem[i]]
+                    # Nenhum serviço mais distante tem valor menor que este
+                    if custo_ate_origem > limite:
+                        break
+                    if atendido[i] or demanda[i] > capacidade_restante:
+                        continue
+
                     # Critério 1: Minimizar custo/demanda
-                    valor_servico = (aresta.custo_servico + custo_ate_origem) / aresta.demanda
-                    
-                    # Critério 2: Priorizar arestas mais distantes do depósito quando capacidade alta
-                    if demanda_atual < self.capacidade_veiculo * 0.7:
-                        valor_servico -= max(dist_deposito_origem, dist_deposito_destino) * 0.3
+                    valor_servico = (custo_servico[i] + custo_ate_origem) / demanda[i]
+
+                    # Critério 2: Priorizar serviços mais distantes do depósito quando capacidade alta
+                    if inicio_rota:
+                        valor_servico -= ajuste_inicio[i]
                     else:
-                        valor_servico += min(dist_deposito_origem, dist_deposito_destino) * 0.3
-                    
-                    if valor_servico < melhor_valor:
+                        valor_servico += ajuste_fim[i]
+
+                    if (valor_servico < melhor_valor or
+                            (valor_servico == melhor_valor and
+                             desempate[i] < desempate[melhor_servico])):
                         melhor_valor = valor_servico
-                        melhor_aresta = aresta
-                
-                # Adiciona a aresta à rota
+                        melhor_servico = i
+                        limite = (melhor_valor - piso) * maior_demanda
+                        # Folga para erros de arredondamento do limite
+                        limite += 1e-6 * (1 + abs(limite))
+
+                # Adiciona o serviço à rota
                 rota_atual.append(
-                    (melhor_aresta.origem, melhor_aresta.destino, melhor_aresta.id)
+                    (origem[melhor_servico], destino[melhor_servico], melhor_servico)
                 )
-                demanda_atual += melhor_aresta.demanda
-                vertice_atual = melhor_aresta.destino
-                arestas_nao_atendidas.remove(melhor_aresta)
-            
+                demanda_atual += demanda[melhor_servico]
+                vertice_atual = destino[melhor_servico]
+                nao_atendidos.remover(melhor_servico)
+
             if rota_atual:
                 custo_total = self._calcular_custo_rota(rota_atual)
                 rotas.append(Rota(rota_atual, demanda_atual, custo_total))
-        
+
         return rotas
 
-    def _melhorar_solucao(self, rotas: List[Rota], max_iteracoes: int = 1000) -> List[Rota]:
-        """Melhora a solução usando múltiplas estratégias de busca local"""
-        melhor_custo_total = sum(rota.custo_total for rota in rotas)
-        
-        for _ in range(max_iteracoes):
-            melhorou = False
-            
-            # 1. Tenta mover serviços entre rotas
-            for i in range(len(rotas)):
-                for j in range(len(rotas)):
-                    if i == j:
+    def _construir_solucao_split(
+        self,
+        rng: Optional[random.Random] = None
+    ) -> List[Rota]:
+        """
+        Constrói uma solução "rota primeiro, agrupamento depois": um tour
+        gigante por vizinho mais próximo sobre todos os serviços, dividido de
+        forma ótima em viagens pelo split de Ulusoy.
+
+        Args:
+            rng: Se informado, o tour sorteia o próximo serviço entre os mais
+                próximos, gerando tours diferentes a cada chamada
+
+        Returns:
+            Lista de rotas
+        """
+        servicos = self.servicos
+        indice = IndiceServicos(
+            self.distancias, servicos.origem, servicos.demanda, servicos.ids()
+        )
+        tour = tour_gigante(indice, self.deposito, servicos.destino, rng)
+        viagens, _ = dividir_tour(
+            tour, self.distancias, servicos.origem, servicos.destino,
+            servicos.demanda, servicos.custo_servico, self.deposito,
+            self.capacidade_veiculo
+        )
+
+        rotas: List[Rota] = []
+        for viagem in viagens:
+            sequencia = [
+                (servicos.origem[i], servicos.destino[i], i) for i in viagem
+            ]
+            rotas.append(Rota(
+                sequencia,
+                sum(servicos.demanda[i] for i in viagem),
+                self._calcular_custo_rota(sequencia)
+            ))
+        return rotas
+
+    def _construir(
+        self,
+        construcao: str = "path_scanning",
+        rng: Optional[random.Random] = None
+    ) -> List[Rota]:
+        """Constrói uma solução com a heurística escolhida (ver CONSTRUCOES)."""
+        if construcao == "split":
+            return self._construir_solucao_split(rng)
+        if construcao != "path_scanning":
+            raise ValueError(f"Construção desconhecida: {construcao}")
+        return self._construir_solucao_inicial(rng=rng)
+
+    def _tempo_esgotado(self) -> bool:
+        """Verifica o prazo; barato o bastante para os laços das vizinhanças."""
+        return self.prazo is not None and time.monotonic() >= self.prazo
+
+    def _atualizar_rota(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        indice: int,
+        avaliador: AvaliadorMovimentos
+    ):
+        """Recalcula os dados de uma rota alterada no lugar por um movimento"""
+        dados[indice] = avaliador.preparar(rotas[indice])
+        rotas[indice].custo_total = dados[indice].custo
+        rotas[indice].demanda_total = dados[indice].carga[-1]
+
+    def _descartar_vazias(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        *indices: int
+    ) -> bool:
+        """
+        Remove de rotas e dados as rotas de indices que ficaram sem serviços
+        (relocate e 2-opt* podem esvaziar uma rota). Os índices das rotas
+        seguintes mudam.
+
+        Returns:
+            True se alguma rota foi removida
+        """
+        removeu = False
+        for indice in sorted(set(indices), reverse=True):
+            if not rotas[indice].ids:
+                del rotas[indice]
+                del dados[indice]
+                removeu = True
+        return removeu
+
+    def _mover_servico(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Tenta mover um serviço para outra rota (relocate)"""
+        demanda = self.servicos.demanda
+        custo_servico = self.servicos.custo_servico
+        dist = self.distancias
+        # Vizinhos de cada posição de inserção de cada rota, a partir de
+        # DadosRota; calculados sob demanda, pois a passada termina no
+        # primeiro movimento aceito
+        vizinhos: List[Optional[list]] = [None] * len(rotas)
+        for i in range(len(rotas)):
+            rota_i = rotas[i]
+            servicos_i = list(rota_i)
+            # Remoção mais custo de serviço da inserção, que não depende de j
+            deltas_remocao = [
+                avaliador.delta_remocao(rota_i, pos_i) + custo_servico[servico[2]]
+                for pos_i, servico in enumerate(servicos_i)
+            ]
+            for j in range(len(rotas)):
+                if i == j:
+                    continue
+                if self._tempo_esgotado():
+                    return False
+                rota_j = rotas[j]
+                folga_j = self.capacidade_veiculo - rota_j.demanda_total
+
+                for pos_i, servico in enumerate(servicos_i):
+                    # Verifica se é possível mover para a outra rota
+                    if demanda[servico[2]] > folga_j:
                         continue
-                    
-                    for pos_i in range(len(rotas[i].sequencia)):
-                        servico = rotas[i].sequencia[pos_i]
-                        
-                        # Encontra a demanda do serviço
-                        demanda_servico = next(
-                            a.demanda for a in self.arestas_requeridas
-                            if ((a.origem == servico[0] and a.destino == servico[1]) or
-                                (a.origem == servico[1] and a.destino == servico[0]))
+                    vizinhos_j = vizinhos[j]
+                    if vizinhos_j is None:
+                        vizinhos_j = vizinhos[j] = list(zip(
+                            [dist[e] for e in dados[j].entrada], dados[j].saida,
+                            dados[j].atalho
+                        ))
+                    delta_remocao = deltas_remocao[pos_i]
+                    orientacoes = avaliador.orientacoes(servico)
+                    # Tenta inserir em todas as posições possíveis, nos dois
+                    # sentidos se o serviço for uma aresta
+                    for pos_j, (linha_anterior, proximo, atalho) in enumerate(vizinhos_j):
+                        for orientado in orientacoes:
+                            delta = (
+                                delta_remocao + linha_anterior[orientado[0]]
+                                + dist[orientado[1]][proximo] - atalho
+                            )
+                            if delta < 0:
+                                rota_i.remover(pos_i)
+                                rota_j.inserir(pos_j, orientado)
+                                self._atualizar_rota(rotas, dados, i, avaliador)
+                                self._atualizar_rota(rotas, dados, j, avaliador)
+                                self._descartar_vazias(rotas, dados, i, j)
+                                return True
+        return False
+
+    def _trocar_servicos(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Tenta trocar dois serviços de rotas diferentes (swap)"""
+        demanda = self.servicos.demanda
+        dist = self.distancias
+        capacidade = self.capacidade_veiculo
+        # Por posição: linhas de distância do vértice anterior e do destino,
+        # origem e vértice seguinte, a partir de DadosRota (sob demanda)
+        cache: List[Optional[list]] = [None] * len(rotas)
+
+        def extremos(r: int) -> list:
+            if cache[r] is None:
+                entrada, saida = dados[r].entrada, dados[r].saida
+                cache[r] = [
+                    (dist[entrada[k]], dist[entrada[k + 1]], saida[k], saida[k + 1])
+                    for k in range(len(entrada) - 1)
+                ]
+            return cache[r]
+
+        for i in range(len(rotas)):
+            rota_i = rotas[i]
+            for j in range(i + 1, len(rotas)):
+                if self._tempo_esgotado():
+                    return False
+                rota_j = rotas[j]
+                folga_i = capacidade - rota_i.demanda_total
+                folga_j = capacidade - rota_j.demanda_total
+
+                extremos_i = extremos(i)
+                extremos_j = extremos(j)
+                for pos_i, id_i in enumerate(rota_i.ids):
+                    demanda_i = demanda[id_i]
+                    linha_anterior_i, linha_destino_i, origem_i, proximo_i = \
+                        extremos_i[pos_i]
+                    # Os custos de serviço se cancelam na troca
+                    base_i = (
+                        -linha_anterior_i[origem_i] - linha_destino_i[proximo_i]
+                    )
+                    for pos_j, id_j in enumerate(rota_j.ids):
+                        diferenca = demanda[id_j] - demanda_i
+                        if diferenca > folga_i or -diferenca > folga_j:
+                            continue
+                        linha_anterior_j, linha_destino_j, origem_j, proximo_j = \
+                            extremos_j[pos_j]
+                        delta = (
+                            base_i
+                            + linha_anterior_i[origem_j] + linha_destino_j[proximo_i]
+                            + linha_anterior_j[origem_i] + linha_destino_i[proximo_j]
+                            - linha_anterior_j[origem_j] - linha_destino_j[proximo_j]
                         )
-                        
-                        # Verifica se é possível mover para a outra rota
-                        if rotas[j].demanda_total + demanda_servico <= self.capacidade_veiculo:
-                            # Tenta inserir em todas as posições possíveis
-                            for pos_j in range(len(rotas[j].sequencia) + 1):
-                                # Move o serviço
-                                nova_rota_i = (
-                                    rotas[i].sequencia[:pos_i] +
-                                    rotas[i].sequencia[pos_i + 1:]
-                                )
-                                nova_rota_j = (
-                                    rotas[j].sequencia[:pos_j] +
-                                    [servico] +
-                                    rotas[j].sequencia[pos_j:]
-                                )
-                                
-                                # Calcula novos custos
-                                novo_custo_i = self._calcular_custo_rota(nova_rota_i)
-                                novo_custo_j = self._calcular_custo_rota(nova_rota_j)
-                                novo_custo_total = (
-                                    sum(r.custo_total for r in rotas[:i]) +
-                                    novo_custo_i +
-                                    sum(r.custo_total for r in rotas[i+1:j]) +
-                                    novo_custo_j +
-                                    sum(r.custo_total for r in rotas[j+1:])
-                                )
-                                
-                                if novo_custo_total < melhor_custo_total:
-                                    # Atualiza as rotas
-                                    rotas[i].sequencia = nova_rota_i
-                                    rotas[i].custo_total = novo_custo_i
-                                    rotas[i].demanda_total -= demanda_servico
-                                    
-                                    rotas[j].sequencia = nova_rota_j
-                                    rotas[j].custo_total = novo_custo_j
-                                    rotas[j].demanda_total += demanda_servico
-                                    
-                                    melhor_custo_total = novo_custo_total
-                                    melhorou = True
-                                    break
-                            
-                            if melhorou:
-                                break
-                    
-                    if melhorou:
-                        break
-                        
-                if melhorou:
-                    break
-            
-            # 2. Tenta inverter a ordem dos serviços em cada rota
-            if not melhorou:
-                for i in range(len(rotas)):
-                    # Tenta inverter diferentes segmentos da rota
-                    for inicio in range(len(rotas[i].sequencia)):
-                        for fim in range(inicio + 2, len(rotas[i].sequencia) + 1):
-                            # Cria uma nova sequência com o segmento invertido
-                            nova_sequencia = (
-                                rotas[i].sequencia[:inicio] +
-                                list(reversed(rotas[i].sequencia[inicio:fim])) +
-                                rotas[i].sequencia[fim:]
+                        if delta < 0:
+                            rota_j.substituir(
+                                pos_j, rota_i.substituir(pos_i, rota_j[pos_j])
                             )
-                            
-                            # Calcula o novo custo
-                            novo_custo = self._calcular_custo_rota(nova_sequencia)
-                            
-                            if novo_custo < rotas[i].custo_total:
-                                rotas[i].sequencia = nova_sequencia
-                                rotas[i].custo_total = novo_custo
-                                melhor_custo_total = sum(r.custo_total for r in rotas)
-                                melhorou = True
-                                break
-                        
-                        if melhorou:
-                            break
-                    
-                    if melhorou:
-                        break
-            
+                            self._atualizar_rota(rotas, dados, i, avaliador)
+                            self._atualizar_rota(rotas, dados, j, avaliador)
+                            return True
+        return False
+
+    def _trocar_caudas(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Tenta trocar os finais de duas rotas (2-opt*)"""
+        capacidade = self.capacidade_veiculo
+        for i in range(len(rotas)):
+            dados_i = dados[i]
+            carga_i = dados_i.carga
+            for j in range(i + 1, len(rotas)):
+                if self._tempo_esgotado():
+                    return False
+                dados_j = dados[j]
+                carga_j = dados_j.carga
+                custo_atual = dados_i.custo + dados_j.custo
+
+                for corte_i in range(len(carga_i)):
+                    resto_i = carga_i[-1] - carga_i[corte_i]
+                    for corte_j in range(len(carga_j)):
+                        resto_j = carga_j[-1] - carga_j[corte_j]
+                        if (carga_i[corte_i] + resto_j > capacidade or
+                                carga_j[corte_j] + resto_i > capacidade):
+                            continue
+                        novo_custo = (
+                            avaliador.custo_2opt(dados_i, corte_i, dados_j, corte_j) +
+                            avaliador.custo_2opt(dados_j, corte_j, dados_i, corte_i)
+                        )
+                        if novo_custo < custo_atual:
+                            rotas[i].trocar_caudas(corte_i, rotas[j], corte_j)
+                            self._atualizar_rota(rotas, dados, i, avaliador)
+                            self._atualizar_rota(rotas, dados, j, avaliador)
+                            self._descartar_vazias(rotas, dados, i, j)
+                            return True
+        return False
+
+    def _orientar_servicos(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Escolhe o melhor sentido das arestas de cada rota (DP exata)"""
+        melhorou = False
+        for i in range(len(rotas)):
+            if self._tempo_esgotado():
+                break
+            custo, viradas = avaliador.orientar(rotas[i])
+            if custo < dados[i].custo:
+                for pos in viradas:
+                    rotas[i].virar(pos)
+                self._atualizar_rota(rotas, dados, i, avaliador)
+                melhorou = True
+        return melhorou
+
+    def _mover_servico_granular(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Relocate restrito: o serviço só é inserido ao lado de um vizinho"""
+        granular = self._granular
+        demanda = self.servicos.demanda
+        capacidade = self.capacidade_veiculo
+        rota_de, posicao_de = granular.posicoes(rotas)
+        for i in range(len(rotas)):
+            if self._tempo_esgotado():
+                return False
+            rota_i = rotas[i]
+            for pos_i, servico in enumerate(rota_i):
+                id_servico = servico[2]
+                folga = capacidade - demanda[id_servico]
+                # (rota, posição) de inserção: antes e depois de cada vizinho
+                candidatos = []
+                for vizinho in granular.vizinhos[id_servico]:
+                    j = rota_de[vizinho]
+                    if j != i and rotas[j].demanda_total <= folga:
+                        candidatos.append((j, posicao_de[vizinho]))
+                        candidatos.append((j, posicao_de[vizinho] + 1))
+                if granular.perto_deposito[id_servico]:
+                    for j in range(len(rotas)):
+                        if j != i and rotas[j].demanda_total <= folga:
+                            candidatos.append((j, 0))
+                            candidatos.append((j, len(rotas[j])))
+                if not candidatos:
+                    continue
+
+                delta_remocao = avaliador.delta_remocao(rota_i, pos_i)
+                orientacoes = avaliador.orientacoes(servico)
+                for j, pos_j in candidatos:
+                    rota_j = rotas[j]
+                    for orientado in orientacoes:
+                        delta = delta_remocao + avaliador.delta_insercao(
+                            rota_j, pos_j, orientado
+                        )
+                        if delta < 0:
+                            rota_i.remover(pos_i)
+                            rota_j.inserir(pos_j, orientado)
+                            self._atualizar_rota(rotas, dados, i, avaliador)
+                            self._atualizar_rota(rotas, dados, j, avaliador)
+                            self._descartar_vazias(rotas, dados, i, j)
+                            return True
+        return False
+
+    def _trocar_servicos_granular(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Swap restrito: o serviço assume a posição ao lado de um vizinho"""
+        granular = self._granular
+        demanda = self.servicos.demanda
+        capacidade = self.capacidade_veiculo
+        rota_de, posicao_de = granular.posicoes(rotas)
+        for i in range(len(rotas)):
+            if self._tempo_esgotado():
+                return False
+            rota_i = rotas[i]
+            folga_i = capacidade - rota_i.demanda_total
+            for pos_i, id_i in enumerate(rota_i.ids):
+                demanda_i = demanda[id_i]
+                for vizinho in granular.vizinhos[id_i]:
+                    j = rota_de[vizinho]
+                    if j == i:
+                        continue
+                    rota_j = rotas[j]
+                    folga_j = capacidade - rota_j.demanda_total
+                    posicao = posicao_de[vizinho]
+                    for pos_j in (posicao - 1, posicao + 1):
+                        if not 0 <= pos_j < len(rota_j.ids):
+                            continue
+                        diferenca = demanda[rota_j.ids[pos_j]] - demanda_i
+                        if diferenca > folga_i or -diferenca > folga_j:
+                            continue
+                        delta = avaliador.delta_troca(rota_i, pos_i, rota_j, pos_j)
+                        if delta < 0:
+                            rota_j.substituir(
+                                pos_j, rota_i.substituir(pos_i, rota_j[pos_j])
+                            )
+                            self._atualizar_rota(rotas, dados, i, avaliador)
+                            self._atualizar_rota(rotas, dados, j, avaliador)
+                            return True
+        return False
+
+    def _trocar_caudas_granular(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """2-opt* restrito: o corte liga o serviço a um vizinho de outra rota"""
+        granular = self._granular
+        capacidade = self.capacidade_veiculo
+        rota_de, posicao_de = granular.posicoes(rotas)
+        for i in range(len(rotas)):
+            if self._tempo_esgotado():
+                return False
+            dados_i = dados[i]
+            carga_i = dados_i.carga
+            for pos_i, id_servico in enumerate(rotas[i].ids):
+                corte_i = pos_i + 1
+                resto_i = carga_i[-1] - carga_i[corte_i]
+                for vizinho in granular.vizinhos[id_servico]:
+                    j = rota_de[vizinho]
+                    if j == i:
+                        continue
+                    dados_j = dados[j]
+                    carga_j = dados_j.carga
+                    # rota_i[:corte_i] passa a seguir para o vizinho
+                    corte_j = posicao_de[vizinho]
+                    resto_j = carga_j[-1] - carga_j[corte_j]
+                    if (carga_i[corte_i] + resto_j > capacidade or
+                            carga_j[corte_j] + resto_i > capacidade):
+                        continue
+                    novo_custo = (
+                        avaliador.custo_2opt(dados_i, corte_i, dados_j, corte_j) +
+                        avaliador.custo_2opt(dados_j, corte_j, dados_i, corte_i)
+                    )
+                    if novo_custo < dados_i.custo + dados_j.custo:
+                        rotas[i].trocar_caudas(corte_i, rotas[j], corte_j)
+                        self._atualizar_rota(rotas, dados, i, avaliador)
+                        self._atualizar_rota(rotas, dados, j, avaliador)
+                        self._descartar_vazias(rotas, dados, i, j)
+                        return True
+        return False
+
+    def _inverter_segmento(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos
+    ) -> bool:
+        """Tenta inverter a ordem de um segmento de serviços de uma rota"""
+        for i in range(len(rotas)):
+            rota = rotas[i]
+            for inicio in range(len(rota)):
+                if self._tempo_esgotado():
+                    return False
+                for fim in range(inicio + 2, len(rota) + 1):
+                    if avaliador.delta_inversao(rota, dados[i], inicio, fim) < 0:
+                        rota.inverter(inicio, fim)
+                        self._atualizar_rota(rotas, dados, i, avaliador)
+                        return True
+        return False
+
+    def _preparar_granular(self) -> Optional[VizinhancaGranular]:
+        """Calcula a lista granular na primeira vez que for necessária."""
+        if self.k_vizinhos is None:
+            return None
+        if self._granular is None or self._granular.k != self.k_vizinhos:
+            self._granular = VizinhancaGranular(
+                self.distancias, self.servicos, self.deposito, self.k_vizinhos
+            )
+        return self._granular
+
+    def _avaliar_par(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos,
+        i: int,
+        j: int,
+        posicoes: Optional[Tuple[List[int], List[int]]] = None
+    ) -> Tuple[int, Optional[tuple]]:
+        """
+        Melhor movimento entre as rotas i e j: relocate nos dois sentidos,
+        swap e 2-opt*. Com posicoes (rota e posição de cada serviço), só os
+        movimentos da lista granular são avaliados.
+
+        Returns:
+            Tuple com a variação de custo (negativa se melhora) e o movimento
+            (tipo, i, pos_i, j, pos_j[, serviço orientado]), ou (0, None)
+        """
+        demanda = self.servicos.demanda
+        capacidade = self.capacidade_veiculo
+        granular = self._granular if posicoes is not None else None
+        if granular is not None:
+            rota_de, posicao_de = posicoes
+        melhor_delta = 0
+        melhor = None
+
+        # Relocate de a para b
+        for a, b in ((i, j), (j, i)):
+            rota_a, rota_b = rotas[a], rotas[b]
+            folga_b = capacidade - rota_b.demanda_total
+            for pos_a, servico in enumerate(rota_a):
+                id_servico = servico[2]
+                if demanda[id_servico] > folga_b:
+                    continue
+                if granular is None:
+                    # Todas as posições de b de uma vez
+                    candidatos = [avaliador.melhor_insercao(dados[b], servico)]
+                else:
+                    destinos = set()
+                    for vizinho in granular.vizinhos[id_servico]:
+                        if rota_de[vizinho] == b:
+                            destinos.add(posicao_de[vizinho])
+                            destinos.add(posicao_de[vizinho] + 1)
+                    if granular.perto_deposito[id_servico]:
+                        destinos.update((0, len(rota_b)))
+                    if not destinos:
+                        continue
+                    candidatos = [
+                        (avaliador.delta_insercao(rota_b, pos_b, orientado),
+                         pos_b, orientado)
+                        for pos_b in destinos
+                        for orientado in avaliador.orientacoes(servico)
+                    ]
+                delta_remocao = avaliador.delta_remocao(rota_a, pos_a)
+                for delta_insercao, pos_b, orientado in candidatos:
+                    delta = delta_remocao + delta_insercao
+                    if delta < melhor_delta:
+                        melhor_delta = delta
+                        melhor = ("mover", a, pos_a, b, pos_b, orientado)
+
+        # Swap
+        rota_i, rota_j = rotas[i], rotas[j]
+        folga_i = capacidade - rota_i.demanda_total
+        folga_j = capacidade - rota_j.demanda_total
+        for pos_i, id_i in enumerate(rota_i.ids):
+            if granular is None:
+                # Todos os serviços de j de uma vez
+                candidatos = [avaliador.melhor_troca(
+                    rota_i, dados[i], pos_i, rota_j, dados[j], folga_i, folga_j
+                )]
+            else:
+                demanda_i = demanda[id_i]
+                candidatos = []
+                for vizinho in granular.vizinhos[id_i]:
+                    if rota_de[vizinho] != j:
+                        continue
+                    for pos_j in (posicao_de[vizinho] - 1, posicao_de[vizinho] + 1):
+                        if not 0 <= pos_j < len(rota_j.ids):
+                            continue
+                        diferenca = demanda[rota_j.ids[pos_j]] - demanda_i
+                        if diferenca > folga_i or -diferenca > folga_j:
+                            continue
+                        candidatos.append((
+                            avaliador.delta_troca(rota_i, pos_i, rota_j, pos_j),
+                            pos_j
+                        ))
+            for delta, pos_j in candidatos:
+                if delta < melhor_delta:
+                    melhor_delta = delta
+                    melhor = ("trocar", i, pos_i, j, pos_j)
+
+        # 2-opt*
+        dados_i, dados_j = dados[i], dados[j]
+        carga_i, carga_j = dados_i.carga, dados_j.carga
+        custo_atual = dados_i.custo + dados_j.custo
+        if granular is None:
+            delta, corte_i, corte_j = avaliador.melhor_2opt(
+                dados_i, dados_j, capacidade
+            )
+            if delta < melhor_delta:
+                melhor_delta = delta
+                melhor = ("caudas", i, corte_i, j, corte_j)
+            cortes = []
+        else:
+            cortes = []
+            for a, b, rota_a in ((i, j, rota_i), (j, i, rota_j)):
+                for pos_a, id_servico in enumerate(rota_a.ids):
+                    for vizinho in granular.vizinhos[id_servico]:
+                        if rota_de[vizinho] == b:
+                            corte = (pos_a + 1, posicao_de[vizinho])
+                            cortes.append(corte if a == i else corte[::-1])
+        for corte_i, corte_j in cortes:
+            resto_i = carga_i[-1] - carga_i[corte_i]
+            resto_j = carga_j[-1] - carga_j[corte_j]
+            if (carga_i[corte_i] + resto_j > capacidade or
+                    carga_j[corte_j] + resto_i > capacidade):
+                continue
+            delta = (
+                avaliador.custo_2opt(dados_i, corte_i, dados_j, corte_j) +
+                avaliador.custo_2opt(dados_j, corte_j, dados_i, corte_i) -
+                custo_atual
+            )
+            if delta < melhor_delta:
+                melhor_delta = delta
+                melhor = ("caudas", i, corte_i, j, corte_j)
+
+        return melhor_delta, melhor
+
+    def _avaliar_rota(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos,
+        i: int
+    ) -> Tuple[int, Optional[tuple]]:
+        """
+        Melhor movimento dentro da rota i, como em _avaliar_par: inversão de
+        segmento ou nova orientação das arestas (DP exata).
+        """
+        melhor_delta, melhor = 0, None
+        delta, inicio, fim = avaliador.melhor_inversao(rotas[i], dados[i])
+        if delta < melhor_delta:
+            melhor_delta, melhor = delta, ("inverter", i, inicio, fim)
+        custo, viradas = avaliador.orientar(rotas[i])
+        if custo - dados[i].custo < melhor_delta:
+            melhor_delta = custo - dados[i].custo
+            melhor = ("orientar", i, viradas)
+        return melhor_delta, melhor
+
+    def _aplicar_movimento(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        avaliador: AvaliadorMovimentos,
+        movimento: tuple
+    ) -> bool:
+        """
+        Aplica, no lugar, um movimento devolvido por _avaliar_par ou _avaliar_rota.
+
+        Returns:
+            True se o movimento esvaziou (e removeu) uma rota, o que muda os
+            índices das rotas seguintes
+        """
+        tipo, i = movimento[0], movimento[1]
+        rota_i = rotas[i]
+        if tipo == "orientar":
+            for pos in movimento[2]:
+                rota_i.virar(pos)
+            self._atualizar_rota(rotas, dados, i, avaliador)
+            return False
+        if tipo == "inverter":
+            _, _, inicio, fim = movimento
+            rota_i.inverter(inicio, fim)
+            self._atualizar_rota(rotas, dados, i, avaliador)
+            return False
+
+        _, _, pos_i, j, pos_j = movimento[:5]
+        rota_j = rotas[j]
+        if tipo == "mover":
+            rota_i.remover(pos_i)
+            rota_j.inserir(pos_j, movimento[5])
+        elif tipo == "trocar":
+            rota_j.substituir(pos_j, rota_i.substituir(pos_i, rota_j[pos_j]))
+        else:  # caudas: pos_i e pos_j são os cortes
+            rota_i.trocar_caudas(pos_i, rota_j, pos_j)
+        self._atualizar_rota(rotas, dados, i, avaliador)
+        self._atualizar_rota(rotas, dados, j, avaliador)
+        return self._descartar_vazias(rotas, dados, i, j)
+
+    def _melhorar_solucao_melhor(
+        self,
+        rotas: List[Rota],
+        max_iteracoes: int = 1000,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> List[Rota]:
+        """
+        Busca local por melhor melhoria com fila de prioridade.
+
+        O melhor movimento de cada par de rotas (e o melhor movimento interno
+        de cada rota) fica em um heap, indexado pela variação de custo. Ao aplicar um
+        movimento, só os pares que envolvem as rotas alteradas são
+        reavaliados; as entradas antigas dessas rotas são descartadas quando
+        saem do heap, pois a versão da rota mudou. Rotas não alteradas não são
+        varridas de novo (don't look bits por rota).
+        """
+        avaliador = AvaliadorMovimentos(
+            self.distancias, self.servicos, self.deposito
+        )
+        dados = [avaliador.preparar(rota) for rota in rotas]
+        granular = self._preparar_granular()
+        posicoes = granular.posicoes(rotas) if granular is not None else None
+        # Com lista granular, o heap vazio é confirmado com todos os pares
+        confirmado = granular is None
+
+        versoes = [0] * len(rotas)
+        heap: List[tuple] = []
+        contador = 0  # desempate estável entre entradas de mesmo custo
+
+        def avaliar(i: int, j: int, completo: bool = False):
+            nonlocal contador
+            if j < 0:
+                delta, movimento = self._avaliar_rota(
+                    rotas, dados, avaliador, i
+                )
+            else:
+                delta, movimento = self._avaliar_par(
+                    rotas, dados, avaliador, i, j,
+                    None if completo else posicoes
+                )
+            if movimento is not None:
+                contador += 1
+                heapq.heappush(heap, (
+                    delta, contador, i, j, versoes[i],
+                    versoes[j] if j >= 0 else 0, movimento
+                ))
+
+        def avaliar_todos(completo: bool = False):
+            for i in range(len(rotas)):
+                if self._tempo_esgotado():
+                    return
+                avaliar(i, -1)
+                for j in range(i + 1, len(rotas)):
+                    avaliar(i, j, completo)
+
+        avaliar_todos()
+        aplicados = 0
+        while aplicados < max_iteracoes and not self._tempo_esgotado():
+            if not heap:
+                if confirmado:
+                    break
+                confirmado = True
+                avaliar_todos(completo=True)
+                continue
+
+            _, _, i, j, versao_i, versao_j, movimento = heapq.heappop(heap)
+            if versoes[i] != versao_i or (j >= 0 and versoes[j] != versao_j):
+                continue  # entrada de uma rota que já mudou
+
+            removeu = self._aplicar_movimento(rotas, dados, avaliador, movimento)
+            aplicados += 1
+            confirmado = granular is None
+            if removeu:
+                # Os índices das rotas mudaram: o heap inteiro fica inválido
+                versoes = [0] * len(rotas)
+                heap.clear()
+                if granular is not None:
+                    posicoes = granular.posicoes(rotas)
+                if checkpoint is not None:
+                    checkpoint.registrar(rotas)
+                avaliar_todos()
+                continue
+            alteradas = (i,) if j < 0 else (i, j)
+            for r in alteradas:
+                versoes[r] += 1
+                if posicoes is not None:
+                    for pos, id_servico in enumerate(rotas[r].ids):
+                        posicoes[0][id_servico] = r
+                        posicoes[1][id_servico] = pos
+            if checkpoint is not None:
+                checkpoint.registrar(rotas)
+
+            for r in alteradas:
+                avaliar(r, -1)
+                for outra in range(len(rotas)):
+                    if outra != r and (outra not in alteradas or outra > r):
+                        avaliar(min(r, outra), max(r, outra))
+
+        return rotas
+
+    def _melhorar_solucao(self, rotas: List[Rota], max_iteracoes: int = 1000,
+                          prazo: Optional[float] = None,
+                          checkpoint: Optional[Checkpoint] = None) -> List[Rota]:
+        """
+        Melhora a solução usando múltiplas estratégias de busca local.
+
+        Os movimentos são avaliados pela variação de custo (AvaliadorMovimentos)
+        e as rotas só são reconstruídas quando um movimento é aceito. Com
+        k_vizinhos, os movimentos entre rotas usam a lista granular
+        (VizinhancaGranular) em vez de todos os pares de serviços. Se prazo
+        (instante de time.monotonic()) for informado, a busca para ao atingi-lo,
+        inclusive no meio de uma vizinhança; como só movimentos que melhoram
+        são aceitos, as rotas correntes são sempre a incumbente. Com
+        checkpoint, a incumbente é gravada periodicamente. Com busca="melhor",
+        usa _melhorar_solucao_melhor.
+        """
+        self.prazo = prazo
+        if self.busca == "melhor":
+            return self._melhorar_solucao_melhor(rotas, max_iteracoes, checkpoint)
+        avaliador = AvaliadorMovimentos(
+            self.distancias, self.servicos, self.deposito
+        )
+        dados = [avaliador.preparar(rota) for rota in rotas]
+
+        # Movimentos entre rotas: todos os pares ou só a lista granular
+        vizinhancas = (
+            self._mover_servico, self._trocar_servicos, self._trocar_caudas,
+            self._inverter_segmento, self._orientar_servicos
+        )
+        completas = None
+        if self.k_vizinhos is not None:
+            completas = vizinhancas
+            self._preparar_granular()
+            vizinhancas = (
+                self._mover_servico_granular,
+                self._trocar_servicos_granular,
+                self._trocar_caudas_granular,
+                self._inverter_segmento,
+                self._orientar_servicos
+            )
+
+        for _ in range(max_iteracoes):
+            # Uma vizinhança só é explorada se as anteriores não melhoraram
+            melhorou = any(
+                vizinhanca(rotas, dados, avaliador) for vizinhanca in vizinhancas
+            )
+            if not melhorou and completas is not None:
+                # Ótimo local da lista granular: confirma com todos os pares e,
+                # se houver melhoria, volta para a lista granular
+                melhorou = any(
+                    vizinhanca(rotas, dados, avaliador) for vizinhanca in completas
+                )
+
             if not melhorou:
                 break
+            if checkpoint is not None:
+                checkpoint.registrar(rotas)
+            if self._tempo_esgotado():
+                break
         
         return rotas
 
-    def resolver(self) -> Tuple[List[Rota], int]:
-        """Resolve o problema do CARP"""
+    def resolver(
+        self,
+        tempo_limite: Optional[float] = None,
+        arquivo_checkpoint: Optional[str] = None,
+        intervalo_checkpoint: float = 5.0,
+        construcao: str = "path_scanning",
+        metaheuristica: Optional[str] = None,
+        semente: Optional[int] = None
+    ) -> Tuple[List[Rota], int, int]:
+        """
+        Resolve o problema do CARP.
+
+        Args:
+            tempo_limite: Tempo máximo (segundos) da resolução, ou None
+            arquivo_checkpoint: Se informado, a melhor solução conhecida é
+                gravada neste arquivo logo após a construção, depois a cada
+                intervalo_checkpoint segundos de busca local e ao final
+            intervalo_checkpoint: Intervalo mínimo entre gravações (segundos)
+            construcao: Heurística da solução inicial ("path_scanning" ou
+                "split")
+            metaheuristica: Se informada ("ils" ou "tabu", ver
+                metaheuristica.METAHEURISTICAS), continua a partir do ótimo
+                local até tempo_limite (sem tempo_limite, até estagnar)
+            semente: Semente da metaheurística
+
+        Returns:
+            Tuple com as rotas, o custo total e o total de clocks (ns)
+        """
+        if metaheuristica is not None and metaheuristica not in METAHEURISTICAS:
+            raise ValueError(f"Metaheurística desconhecida: {metaheuristica}")
+
         # Marca o início da execução
         inicio = time.process_time()
+        inicio_parede = time.perf_counter()
+        prazo = None
+        if tempo_limite is not None:
+            prazo = time.monotonic() + tempo_limite
+        
+        checkpoint = None
+        if arquivo_checkpoint is not None:
+            checkpoint = Checkpoint(self, arquivo_checkpoint, intervalo_checkpoint)
         
         # Constrói uma solução inicial
-        rotas = self._construir_solucao_inicial()
+        rotas = self._construir(construcao)
+        self.tempos["construcao"] = time.perf_counter() - inicio_parede
+        if checkpoint is not None:
+            checkpoint.registrar(rotas, forcar=True)
         
         # Melhora a solução
-        rotas = self._melhorar_solucao(rotas)
+        inicio_busca = time.perf_counter()
+        rotas = self._melhorar_solucao(rotas, prazo=prazo, checkpoint=checkpoint)
+        self.tempos["busca_local"] = time.perf_counter() - inicio_busca
+
+        if metaheuristica is not None:
+            inicio_meta = time.perf_counter()
+            motor = METAHEURISTICAS[metaheuristica](self, random.Random(semente))
+            rotas = motor.executar(rotas, prazo, checkpoint)
+            self.tempos["metaheuristica"] = time.perf_counter() - inicio_meta
         
+        # Rotas que a busca esvaziou não fazem parte da solução
+        rotas = [rota for rota in rotas if rota.ids]
+
+        # O checkpoint limita a frequência das gravações: sem esta gravação,
+        # o arquivo poderia ficar até intervalo_checkpoint segundos defasado
+        if checkpoint is not None:
+            checkpoint.registrar(rotas, forcar=True)
+
         # Calcula o custo total
         custo_total = sum(rota.custo_total for rota in rotas)
         
@@ -323,8 +1274,16 @@ class CARPSolver:
         nome_arquivo: str,
         clocks: int
     ):
-        """Gera o arquivo de solução no formato especificado"""
-        with open(nome_arquivo, 'w') as f:
+        """
+        Gera o arquivo de solução no formato especificado.
+
+        O conteúdo é gravado em um arquivo temporário e depois renomeado, de
+        modo que um arquivo de solução nunca fica pela metade. Rotas sem
+        serviços são omitidas (e não contam no número de rotas).
+        """
+        rotas = [rota for rota in rotas if rota.ids]
+        temporario = f"{nome_arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w') as f:
             # Primeira linha: custo total
             f.write(f"{custo_total}\n")
             
@@ -341,16 +1300,12 @@ class CARPSolver:
             for i, rota in enumerate(rotas, 1):
                 # Calcula demanda total da rota
                 demanda_total = sum(
-                    next(
-                        a.demanda for a in self.arestas_requeridas
-                        if (a.origem == origem and a.destino == destino) or
-                           (a.origem == destino and a.destino == origem)
-                    )
-                    for origem, destino, _ in rota.sequencia
+                    self.servicos.demanda[id_servico]
+                    for id_servico in rota.ids
                 )
                 
                 # Total de visitas = serviços + 2 (depósito início e fim)
-                total_visitas = len(rota.sequencia) + 2
+                total_visitas = len(rota) + 2
                 
                 # Formato: índice_deposito dia_rota id_rota demanda custo total_visitas
                 linha = f" 0 1 {i} {demanda_total} {rota.custo_total} {total_visitas}"
@@ -359,8 +1314,9 @@ class CARPSolver:
                 linha += " (D 0,1,1)"
                 
                 # Adiciona os serviços com seus IDs
-                for origem, destino, id_servico in rota.sequencia:
+                for origem, destino, id_servico in rota:
                     linha += f" (S {id_servico},{origem},{destino})"
                 
                 linha += " (D 0,1,1)\n"
-                f.write(linha) 
\ No newline at end of file
+                f.write(linha)
+        os.replace(temporario, nome_arquivo)
@@ -0,0 +1,117 @@
+from array import array
+from typing import List, Tuple
+
+from grafo import Grafo
+
+
+def componentes_fracos(grafo: Grafo) -> Tuple[array, int]:
+    """
+    Componentes fracamente conexas (ignorando o sentido dos arcos), por
+    union-find sobre a lista de arcos, com união por tamanho e compressão de
+    caminho: O(E α(V)).
+
+    Returns:
+        Tuple com o rótulo (0..k-1) de cada vértice, numerado na ordem do menor
+        vértice de cada componente, e a quantidade k de componentes
+    """
+    n = grafo.num_vertices
+    pai = array('i', range(n))
+    tamanho = array('i', [1]) * n
+
+    def raiz(v: int) -> int:
+        while pai[v] != v:
+            pai[v] = pai[pai[v]]
+            v = pai[v]
+        return v
+
+    inicio, destino = grafo.inicio, grafo.destino
+    for u in range(n):
+        for k in range(inicio[u], inicio[u + 1]):
+            a, b = raiz(u), raiz(destino[k])
+            if a == b:
+                continue
+            if tamanho[a] < tamanho[b]:
+                a, b = b, a
+            pai[b] = a
+            tamanho[a] += tamanho[b]
+
+    rotulos = array('i', [-1]) * n
+    quantidade = 0
+    for v in range(n):
+        r = raiz(v)
+        if rotulos[r] == -1:
+            rotulos[r] = quantidade
+            quantidade += 1
+        rotulos[v] = rotulos[r]
+    return rotulos, quantidade
+
+
+def componentes_fortes(grafo: Grafo) -> Tuple[array, int]:
+    """
+    Componentes fortemente conexas pelo algoritmo de Tarjan, com a pilha de
+    chamadas explícita (sem limite de recursão): O(V + E).
+
+    Returns:
+        Tuple com o rótulo (0..k-1) de cada vértice e a quantidade k de
+        componentes. Os rótulos seguem a ordem topológica reversa: nenhum arco
+        sai de uma componente para outra de rótulo maior
+    """
+    n = grafo.num_vertices
+    inicio, destino = grafo.inicio, grafo.destino
+    indice = array('i', [-1]) * n
+    baixo = array('i', [0]) * n
+    na_pilha = bytearray(n)
+    # Próximo arco a examinar de cada vértice em visita
+    proximo = array('i', inicio[:n])
+    rotulos = array('i', [-1]) * n
+    pilha: List[int] = []
+    quantidade = 0
+    contador = 0
+
+    for raiz in range(n):
+        if indice[raiz] != -1:
+            continue
+        indice[raiz] = baixo[raiz] = contador
+        contador += 1
+        pilha.append(raiz)
+        na_pilha[raiz] = 1
+        chamadas = [raiz]
+
+        while chamadas:
+            v = chamadas[-1]
+            k = proximo[v]
+            if k < inicio[v + 1]:
+                proximo[v] = k + 1
+                w = destino[k]
+                if indice[w] == -1:
+                    indice[w] = baixo[w] = contador
+                    contador += 1
+                    pilha.append(w)
+                    na_pilha[w] = 1
+                    chamadas.append(w)
+                elif na_pilha[w] and indice[w] < baixo[v]:
+                    baixo[v] = indice[w]
+                continue
+
+            # Todos os arcos de v examinados: "retorna" ao chamador
+            chamadas.pop()
+            if chamadas and baixo[v] < baixo[chamadas[-1]]:
+                baixo[chamadas[-1]] = baixo[v]
+            if baixo[v] == indice[v]:
+                while True:
+                    w = pilha.pop()
+                    na_pilha[w] = 0
+                    rotulos[w] = quantidade
+                    if w == v:
+                        break
+                quantidade += 1
+
+    return rotulos, quantidade
+
+
+def agrupar_componentes(rotulos: array, quantidade: int) -> List[List[int]]:
+    """Lista de vértices de cada componente, a partir dos rótulos."""
+    componentes: List[List[int]] = [[] for _ in range(quantidade)]
+    for v, rotulo in enumerate(rotulos):
+        componentes[rotulo].append(v)
+    return componentes
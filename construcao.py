@@ -0,0 +1,212 @@
+import random
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class IndiceServicos:
+    """
+    Serviços ainda não atendidos durante a construção de rotas.
+
+    Os serviços ficam agrupados em baldes por demanda, o que responde em
+    O(log D) qual a maior demanda que ainda cabe no veículo, e cada vértice
+    guarda (sob demanda) a lista de serviços ordenada pela distância até a
+    origem deles. A remoção é preguiçosa: o serviço é apenas marcado como
+    atendido e descartado quando aparece na varredura.
+    """
+    __slots__ = (
+        "distancias", "origem", "demanda", "atendido", "restantes",
+        "demandas", "contagem", "_ordens"
+    )
+
+    def __init__(
+        self,
+        distancias: Sequence[Sequence[int]],
+        origem: Sequence[int],
+        demanda: Sequence[int],
+        ids: Iterable[int]
+    ):
+        """
+        Args:
+            distancias: Matriz de distâncias mínimas
+            origem: Coluna de origem dos serviços, indexada pelo id
+            demanda: Coluna de demanda dos serviços, indexada pelo id
+            ids: Serviços a atender
+        """
+        self.distancias = distancias
+        self.origem = origem
+        self.demanda = demanda
+        # 1 = atendido (ou fora do conjunto); as posições seguem os ids
+        self.atendido = bytearray(b"\x01") * len(origem)
+        for id_servico in ids:
+            self.atendido[id_servico] = 0
+        self.restantes = self.atendido.count(0)
+
+        # Baldes: demandas distintas em ordem crescente e quantos serviços
+        # não atendidos existem em cada uma
+        por_demanda: Dict[int, int] = {}
+        for id_servico in self.ids():
+            valor = demanda[id_servico]
+            por_demanda[valor] = por_demanda.get(valor, 0) + 1
+        self.demandas = sorted(por_demanda)
+        self.contagem = [por_demanda[valor] for valor in self.demandas]
+
+        # vértice -> ids ordenados pela distância até a origem do serviço
+        self._ordens: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return self.restantes
+
+    def ids(self) -> List[int]:
+        """Ids dos serviços ainda não atendidos, em ordem crescente."""
+        return [i for i, marcado in enumerate(self.atendido) if not marcado]
+
+    def remover(self, id_servico: int):
+        """Marca um serviço como atendido."""
+        self.atendido[id_servico] = 1
+        self.restantes -= 1
+        balde = bisect_right(self.demandas, self.demanda[id_servico]) - 1
+        self.contagem[balde] -= 1
+
+    def maior_demanda_viavel(self, capacidade_restante: int) -> Optional[int]:
+        """
+        Maior demanda de um serviço não atendido que cabe na capacidade
+        restante, ou None se nenhum couber.
+        """
+        balde = bisect_right(self.demandas, capacidade_restante) - 1
+        while balde >= 0:
+            if self.contagem[balde]:
+                return self.demandas[balde]
+            balde -= 1
+        return None
+
+    def por_proximidade(self, vertice: int) -> List[int]:
+        """
+        Serviços não atendidos ordenados pela distância de ``vertice`` até a
+        origem de cada um (empates pelo id). A lista é calculada uma vez por
+        vértice e compactada quando metade dela já foi atendida.
+        """
+        ordem = self._ordens.get(vertice)
+        if ordem is None:
+            linha = self.distancias[vertice]
+            origem = self.origem
+            ordem = sorted(self.ids(), key=lambda i: linha[origem[i]])
+        elif len(ordem) > 2 * self.restantes:
+            atendido = self.atendido
+            ordem = [i for i in ordem if not atendido[i]]
+        else:
+            return ordem
+        self._ordens[vertice] = ordem
+        return ordem
+
+
+def tour_gigante(
+    indice: IndiceServicos,
+    deposito: int,
+    destino: Sequence[int],
+    rng: Optional[random.Random] = None,
+    candidatos: int = 3
+) -> List[int]:
+    """
+    Ordena todos os serviços do índice em um único tour (sem capacidade),
+    sempre indo para o serviço não atendido mais próximo. Os serviços são
+    removidos do índice.
+
+    Args:
+        indice: Serviços a ordenar
+        deposito: Vértice de partida
+        destino: Coluna de destino dos serviços, indexada pelo id
+        rng: Se informado, o próximo serviço é sorteado entre os
+            ``candidatos`` mais próximos
+        candidatos: Tamanho da lista de sorteio
+
+    Returns:
+        Ids dos serviços na ordem do tour
+    """
+    tour: List[int] = []
+    atendido = indice.atendido
+    vertice = deposito
+    while indice:
+        proximos: List[int] = []
+        limite = 1 if rng is None else candidatos
+        for i in indice.por_proximidade(vertice):
+            if not atendido[i]:
+                proximos.append(i)
+                if len(proximos) == limite:
+                    break
+        escolhido = proximos[0] if rng is None else rng.choice(proximos)
+        tour.append(escolhido)
+        indice.remover(escolhido)
+        vertice = destino[escolhido]
+    return tour
+
+
+def dividir_tour(
+    tour: Sequence[int],
+    distancias: Sequence[Sequence[int]],
+    origem: Sequence[int],
+    destino: Sequence[int],
+    demanda: Sequence[int],
+    custo_servico: Sequence[int],
+    deposito: int,
+    capacidade: int
+) -> Tuple[List[List[int]], int]:
+    """
+    Divide um tour gigante em viagens que respeitam a capacidade, de forma
+    ótima para a ordem dada (split de Ulusoy).
+
+    É um caminho mínimo em um grafo acíclico: o arco (i, j) representa a
+    viagem que atende tour[i:j]. Com somas de prefixo de demanda, custo de
+    serviço e deslocamento entre serviços consecutivos, o custo de cada
+    viagem sai em O(1), e o total é O(n·k), com k o maior número de serviços
+    que cabe em um veículo.
+
+    Returns:
+        Tuple com as viagens (listas de ids) e o custo total
+    """
+    n = len(tour)
+    # Somas de prefixo: demanda e custo de serviço dos k primeiros serviços e
+    # deslocamento entre os serviços consecutivos até a posição k - 1
+    demanda_acumulada = [0] * (n + 1)
+    servico_acumulado = [0] * (n + 1)
+    ligacao_acumulada = [0] * (n + 1)
+    for k, i in enumerate(tour):
+        demanda_acumulada[k + 1] = demanda_acumulada[k] + demanda[i]
+        servico_acumulado[k + 1] = servico_acumulado[k] + custo_servico[i]
+        ligacao_acumulada[k + 1] = ligacao_acumulada[k]
+        if k:
+            ligacao_acumulada[k + 1] += distancias[destino[tour[k - 1]]][origem[i]]
+
+    linha_deposito = distancias[deposito]
+    volta = [distancias[destino[i]][deposito] for i in tour]
+
+    custo = [0] + [None] * n  # custo mínimo para atender tour[:j]
+    anterior = [0] * (n + 1)
+    for i in range(n):
+        if custo[i] is None:
+            continue
+        base = (
+            custo[i] + linha_deposito[origem[tour[i]]] -
+            servico_acumulado[i] - ligacao_acumulada[i + 1]
+        )
+        j = i + 1
+        while (j <= n and
+                demanda_acumulada[j] - demanda_acumulada[i] <= capacidade):
+            valor = (
+                base + servico_acumulado[j] + ligacao_acumulada[j] + volta[j - 1]
+            )
+            if custo[j] is None or valor < custo[j]:
+                custo[j] = valor
+                anterior[j] = i
+            j += 1
+
+    if custo[n] is None:
+        raise ValueError("Um serviço tem demanda maior que a capacidade do veículo")
+
+    viagens: List[List[int]] = []
+    j = n
+    while j > 0:
+        i = anterior[j]
+        viagens.append(list(tour[i:j]))
+        j = i
+    viagens.reverse()
+    return viagens, custo[n]
@@ -0,0 +1,279 @@
+import heapq
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from grafo import Grafo
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy é opcional
+    np = None
+
+
+# Distância usada para pares sem caminho. Cabe em int64 mesmo somada a si
+# mesma, o que permite o relaxamento vetorizado sem overflow.
+INFINITO = 2 ** 61
+
+# Com NumPy, grafos com densidade (|E| / |V|²) acima deste limite usam
+# Floyd-Warshall; abaixo dele, V execuções de Dijkstra são mais baratas.
+DENSIDADE_LIMITE = 0.05
+
+# Quantidade de linhas relaxadas por vez no Floyd-Warshall em blocos
+TAMANHO_BLOCO = 256
+
+_INFINITO_INT32 = 2 ** 29
+
+
+@dataclass
+class CaminhosMinimos:
+    """
+    Resultado do cálculo de caminhos mínimos entre todos os pares.
+
+    As linhas são visões (memoryview) sobre buffers contíguos de inteiros,
+    de modo que ``distancias[u][v]`` devolve um ``int`` do Python sem cópia.
+    """
+    num_vertices: int
+    distancias: List[Sequence[int]]
+    predecessores: List[Sequence[int]]
+    metodo: str
+
+
+def _linhas(buffer, num_vertices: int, formato: str) -> List[memoryview]:
+    """Divide um buffer contíguo em visões de linha sem copiar os dados."""
+    mv = memoryview(buffer).cast('B').cast(formato)
+    return [
+        mv[i * num_vertices:(i + 1) * num_vertices]
+        for i in range(num_vertices)
+    ]
+
+
+def montar_caminhos_minimos(
+    buffer_distancias,
+    buffer_predecessores,
+    num_vertices: int,
+    metodo: str
+) -> CaminhosMinimos:
+    """Cria um CaminhosMinimos a partir de buffers int64 (dist) e int32 (pred)."""
+    return CaminhosMinimos(
+        num_vertices,
+        _linhas(buffer_distancias, num_vertices, 'q'),
+        _linhas(buffer_predecessores, num_vertices, 'i'),
+        metodo
+    )
+
+
+def dijkstra_origem(
+    adjacencia: List[List[Tuple[int, int]]],
+    num_vertices: int,
+    origem: int
+) -> Tuple[List[int], List[int]]:
+    """Dijkstra com heap a partir de um vértice, em O(E log V)."""
+    dist = [INFINITO] * num_vertices
+    pred = [-1] * num_vertices
+    dist[origem] = 0
+    heap = [(0, origem)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, custo in adjacencia[u]:
+            nova_dist = d + custo
+            if nova_dist < dist[v]:
+                dist[v] = nova_dist
+                pred[v] = u
+                heapq.heappush(heap, (nova_dist, v))
+
+    return dist, pred
+
+
+def _dijkstra_todos(grafo: Grafo) -> Tuple[array, array]:
+    """Executa Dijkstra com heap a partir de cada vértice, em O(V·E log V)."""
+    n = grafo.num_vertices
+    adjacencia = grafo.lista_adjacencia()
+    distancias = array('q')
+    predecessores = array('i')
+
+    for origem in range(n):
+        dist, pred = dijkstra_origem(adjacencia, n, origem)
+        distancias.extend(dist)
+        predecessores.extend(pred)
+
+    return distancias, predecessores
+
+
+class OraculoDistancias:
+    """
+    Caminhos mínimos sob demanda, para grafos em que a matriz V×V não cabe
+    na memória.
+
+    Cada linha (distâncias e predecessores a partir de um vértice) é
+    calculada por Dijkstra na primeira consulta e guardada em um cache LRU
+    de no máximo ``capacidade`` linhas. O solver só consulta linhas das
+    extremidades dos serviços e do depósito, então a memória cresce com o
+    número de serviços, e não com V².
+
+    ``distancias`` e ``predecessores`` têm a mesma interface das matrizes
+    densas: ``distancias[u][v]``.
+    """
+    __slots__ = (
+        "num_vertices", "capacidade", "calculadas", "_adjacencia", "_linhas",
+        "distancias", "predecessores"
+    )
+
+    def __init__(self, grafo: Grafo, capacidade: Optional[int] = None):
+        """
+        Args:
+            grafo: Grafo em formato CSR
+            capacidade: Máximo de linhas guardadas (None: sem limite)
+        """
+        if capacidade is not None and capacidade < 1:
+            raise ValueError("A capacidade do oráculo deve ser positiva")
+        self.num_vertices = grafo.num_vertices
+        self.capacidade = capacidade
+        self.calculadas = 0  # execuções de Dijkstra, para relatórios
+        self._adjacencia = grafo.lista_adjacencia()
+        # origem -> (distâncias int64, predecessores int32), da menos para a
+        # mais recentemente usada
+        self._linhas: "OrderedDict[int, Tuple[array, array]]" = OrderedDict()
+        self.distancias = _LinhasOraculo(self, 0)
+        self.predecessores = _LinhasOraculo(self, 1)
+
+    def __len__(self) -> int:
+        """Quantidade de linhas guardadas no momento."""
+        return len(self._linhas)
+
+    def linha(self, origem: int) -> Tuple[array, array]:
+        """Distâncias e predecessores a partir de origem."""
+        par = self._linhas.get(origem)
+        if par is None:
+            return self._calcular(origem)
+        self._linhas.move_to_end(origem)
+        return par
+
+    def _calcular(self, origem: int) -> Tuple[array, array]:
+        if not 0 <= origem < self.num_vertices:
+            raise IndexError(f"Vértice fora do grafo: {origem}")
+        dist, pred = dijkstra_origem(self._adjacencia, self.num_vertices, origem)
+        par = (array('q', dist), array('i', pred))
+        self.calculadas += 1
+        self._linhas[origem] = par
+        if self.capacidade is not None and len(self._linhas) > self.capacidade:
+            self._linhas.popitem(last=False)
+        return par
+
+
+class _LinhasOraculo:
+    """Visão ``linhas[u][v]`` de uma das colunas do OraculoDistancias."""
+    __slots__ = ("oraculo", "indice")
+
+    def __init__(self, oraculo: OraculoDistancias, indice: int):
+        self.oraculo = oraculo
+        self.indice = indice
+
+    def __len__(self) -> int:
+        return self.oraculo.num_vertices
+
+    def __getitem__(self, origem: int) -> array:
+        # Caminho rápido do OraculoDistancias.linha, chamado nos laços do solver
+        linhas = self.oraculo._linhas
+        par = linhas.get(origem)
+        if par is None:
+            return self.oraculo._calcular(origem)[self.indice]
+        linhas.move_to_end(origem)
+        return par[self.indice]
+
+
+def caminhos_sob_demanda(
+    grafo: Grafo,
+    capacidade: Optional[int] = None
+) -> CaminhosMinimos:
+    """CaminhosMinimos cujas linhas vêm de um OraculoDistancias."""
+    oraculo = OraculoDistancias(grafo, capacidade)
+    return CaminhosMinimos(
+        grafo.num_vertices, oraculo.distancias, oraculo.predecessores,
+        "sob_demanda"
+    )
+
+
+def _floyd_warshall_numpy(grafo: Grafo):
+    """
+    Floyd-Warshall vetorizado: para cada k, relaxa blocos de linhas contra a
+    linha k por broadcast. Usa int32 quando a soma dos custos cabe nele.
+    """
+    n = grafo.num_vertices
+    soma_custos = sum(grafo.custo)
+    if soma_custos < _INFINITO_INT32:
+        tipo, infinito = np.int32, _INFINITO_INT32
+    else:
+        tipo, infinito = np.int64, INFINITO
+
+    dist = np.full((n, n), infinito, dtype=tipo)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    for u, v, custo in grafo.arcos():
+        if custo < dist[u, v]:
+            dist[u, v] = custo
+            pred[u, v] = u
+    np.fill_diagonal(dist, 0)
+
+    for k in range(n):
+        linha_k = dist[k]
+        pred_k = pred[k]
+        for inicio in range(0, n, TAMANHO_BLOCO):
+            fim = min(inicio + TAMANHO_BLOCO, n)
+            bloco = dist[inicio:fim]
+            candidato = bloco[:, k, None] + linha_k
+            melhora = candidato < bloco
+            np.copyto(bloco, candidato, where=melhora)
+            np.copyto(
+                pred[inicio:fim],
+                np.broadcast_to(pred_k, melhora.shape),
+                where=melhora
+            )
+
+    if tipo is np.int32:
+        inalcancavel = dist >= _INFINITO_INT32
+        dist = dist.astype(np.int64)
+        dist[inalcancavel] = INFINITO
+
+    return dist, pred
+
+
+def escolher_metodo(num_vertices: int, num_arestas: int) -> str:
+    """Escolhe o algoritmo de caminhos mínimos pela densidade do grafo."""
+    if np is None or num_vertices == 0:
+        return "dijkstra"
+    densidade = num_arestas / (num_vertices * num_vertices)
+    return "floyd" if densidade >= DENSIDADE_LIMITE else "dijkstra"
+
+
+def calcular_caminhos_minimos(
+    grafo: Grafo,
+    metodo: Optional[str] = None
+) -> CaminhosMinimos:
+    """
+    Calcula distâncias e predecessores entre todos os pares de vértices.
+
+    Args:
+        grafo: Grafo em formato CSR
+        metodo: "floyd", "dijkstra" ou None para escolher pela densidade
+
+    Returns:
+        CaminhosMinimos com uma linha por vértice de origem
+    """
+    n = grafo.num_vertices
+    if metodo is None:
+        metodo = escolher_metodo(n, grafo.num_arcos)
+
+    if metodo == "floyd":
+        if np is None:
+            raise ValueError("O método 'floyd' requer o NumPy instalado")
+        dist, pred = _floyd_warshall_numpy(grafo)
+    elif metodo == "dijkstra":
+        dist, pred = _dijkstra_todos(grafo)
+    else:
+        raise ValueError(f"Método de caminhos mínimos desconhecido: {metodo}")
+
+    return montar_caminhos_minimos(dist, pred, n, metodo)
@@ -0,0 +1,120 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class Grafo:
+    """
+    Grafo direcionado esparso no formato CSR (compressed sparse row).
+
+    Os arcos que saem do vértice u ocupam as posições
+    ``inicio[u]:inicio[u + 1]`` de ``destino`` e ``custo``, ordenados pelo
+    vértice de destino. Arestas (não direcionadas) são guardadas como dois
+    arcos. A memória usada é O(V + E) em vez de O(V²) da matriz densa.
+    """
+    # __weakref__ permite usar o grafo como chave de caches fracos (metricas)
+    __slots__ = ("num_vertices", "inicio", "destino", "custo", "__weakref__")
+
+    def __init__(self, num_vertices: int, inicio: array, destino: array, custo: array):
+        self.num_vertices = num_vertices
+        self.inicio = inicio
+        self.destino = destino
+        self.custo = custo
+
+    @classmethod
+    def de_arcos(
+        cls,
+        num_vertices: int,
+        arcos: Iterable[Tuple[int, int, int]]
+    ) -> "Grafo":
+        """Monta o grafo a partir de triplas (origem, destino, custo)."""
+        origens, destinos, custos = array('i'), array('i'), array('q')
+        for u, v, c in arcos:
+            origens.append(u)
+            destinos.append(v)
+            custos.append(c)
+        return cls.de_colunas(num_vertices, origens, destinos, custos)
+
+    @classmethod
+    def de_colunas(
+        cls,
+        num_vertices: int,
+        origens: array,
+        destinos: array,
+        custos: array
+    ) -> "Grafo":
+        """
+        Monta o grafo a partir de colunas paralelas de arcos, com ordenação por
+        contagem da origem (O(V + E)) e ordenação local de cada linha.
+        """
+        inicio = array('i', [0]) * (num_vertices + 1)
+        for u in origens:
+            inicio[u + 1] += 1
+        for u in range(num_vertices):
+            inicio[u + 1] += inicio[u]
+
+        posicao = array('i', inicio[:num_vertices])
+        ordem = array('i', [0]) * len(origens)
+        for i, u in enumerate(origens):
+            ordem[posicao[u]] = i
+            posicao[u] += 1
+
+        destino = array('i', [0]) * len(origens)
+        custo = array('q', [0]) * len(origens)
+        for u in range(num_vertices):
+            a, b = inicio[u], inicio[u + 1]
+            linha = sorted((destinos[i], custos[i]) for i in ordem[a:b])
+            for k, (v, c) in enumerate(linha, a):
+                destino[k] = v
+                custo[k] = c
+        return cls(num_vertices, inicio, destino, custo)
+
+    @classmethod
+    def de_matriz(cls, matriz_adjacencia: List[List[int]]) -> "Grafo":
+        """Monta o grafo a partir de uma matriz de adjacência densa."""
+        return cls.de_arcos(
+            len(matriz_adjacencia),
+            (
+                (u, v, c)
+                for u, linha in enumerate(matriz_adjacencia)
+                for v, c in enumerate(linha) if c != 0
+            )
+        )
+
+    @property
+    def num_arcos(self) -> int:
+        return len(self.destino)
+
+    def vizinhos(self, u: int) -> Iterator[Tuple[int, int]]:
+        """Pares (vizinho, custo) dos arcos que saem de u."""
+        a, b = self.inicio[u], self.inicio[u + 1]
+        return zip(self.destino[a:b], self.custo[a:b])
+
+    def grau_saida(self, u: int) -> int:
+        return self.inicio[u + 1] - self.inicio[u]
+
+    def lista_adjacencia(self) -> List[List[Tuple[int, int]]]:
+        """Listas de (vizinho, custo) por vértice, para laços de Dijkstra."""
+        return [list(self.vizinhos(u)) for u in range(self.num_vertices)]
+
+    def linha_matriz(self, u: int) -> List[int]:
+        """Linha u da matriz de adjacência densa equivalente."""
+        linha = [0] * self.num_vertices
+        for v, c in self.vizinhos(u):
+            linha[v] = c
+        return linha
+
+    def arcos(self) -> Iterator[Tuple[int, int, int]]:
+        """Todas as triplas (origem, destino, custo)."""
+        for u in range(self.num_vertices):
+            for v, c in self.vizinhos(u):
+                yield u, v, c
+
+
+def deduplicar_arcos(
+    arcos: Iterable[Tuple[int, int, int]]
+) -> List[Tuple[int, int, int]]:
+    """Mantém um arco por par (u, v), com o último custo informado."""
+    por_par: Dict[Tuple[int, int], int] = {}
+    for u, v, c in arcos:
+        por_par[(u, v)] = c
+    return [(u, v, c) for (u, v), c in por_par.items()]
@@ -1,7 +1,20 @@
 import os
-import heapq
-from carp_solver import CARPSolver
-from carp_reader import ler_instancia_carp
+from cache_distancias import CacheDistancias
+from carp_solver import CARPSolver, TIPO_NO
+from carp_reader import ler_cabecalho_carp, ler_instancia_carp
+from componentes import agrupar_componentes, componentes_fortes, componentes_fracos
+from grafo import Grafo, deduplicar_arcos
+from metricas import calcular_estatisticas, obter_estimativas, obter_metricas
+from resolver_lote import resolver_em_paralelo
+
+
+# Cache em disco das distâncias, reaproveitado entre execuções do solver
+CACHE_DISTANCIAS = CacheDistancias()
+
+# Acima deste número de vértices, intermediação, caminho médio e diâmetro são
+# estimados a partir de AMOSTRAS_ESTIMATIVA origens sorteadas
+MAX_VERTICES_EXATO = 5000
+AMOSTRAS_ESTIMATIVA = 64
 
 
 def modelar_grafo(conteudo):
@@ -22,12 +35,12 @@ def modelar_grafo(conteudo):
             if no not in nos:
                 nos[no] = len(nos)  # Atribuir um índice único para cada nó
 
-    # Criar uma matriz de adjacência inicializada com zeros
+    # Matriz de predecessores inicializada com -1
     tamanho = len(nos)
-    matriz_adjacencia = [[0] * tamanho for _ in range(tamanho)]
     matriz_predessores = [[-1] * tamanho for _ in range(tamanho)]
 
-    # Preencher a matriz com os valores do arquivo
+    # Coletar os arcos do arquivo (arestas entram nos dois sentidos)
+    arcos = []
     secao_arestas = False
     secao_arcos = False
     for linha in linhas:
@@ -48,13 +61,14 @@ def modelar_grafo(conteudo):
             para = f"N{partes[2]}"
             custo_transporte = int(partes[3])
             if de in nos and para in nos:
-                matriz_adjacencia[nos[de]][nos[para]] = custo_transporte
+                arcos.append((nos[de], nos[para], custo_transporte))
                 matriz_predessores[nos[de]][nos[para]] = nos[de]
                 if secao_arestas:
-                    matriz_adjacencia[nos[para]][nos[de]] = custo_transporte
+                    arcos.append((nos[para], nos[de], custo_transporte))
                     matriz_predessores[nos[para]][nos[de]] = nos[para]
 
-    return matriz_adjacencia, matriz_predessores
+    grafo = Grafo.de_arcos(tamanho, deduplicar_arcos(arcos))
+    return grafo, matriz_predessores
 
 
 def ler_arquivo(nome_arquivo):
@@ -72,191 +86,59 @@ def ler_arquivo(nome_arquivo):
         return f"Erro ao acessar o arquivo: {e}"
 
 
-def calcular_quantidade_vertices(matriz_adjacencia):
-    return len(matriz_adjacencia)
-
-
-def calcular_quantidade_arestas(matriz_adjacencia):
-    quantidade_arestas = 0
-    for i in range(len(matriz_adjacencia)):
-        for j in range(len(matriz_adjacencia[i])):
-            if matriz_adjacencia[i][j] != 0:
-                quantidade_arestas += 1
-    return quantidade_arestas // 2  # Dividir por 2 para evitar contagem dupla
-
-
-def calcular_quantidade_arcos(matriz_adjacencia):
-    quantidade_arcos = 0
-    for i in range(len(matriz_adjacencia)):
-        for j in range(len(matriz_adjacencia[i])):
-            if matriz_adjacencia[i][j] != 0:
-                quantidade_arcos += 1
-    return quantidade_arcos  # Contagem direta, pois arcos são direcionais
-
-
-def calcular_quantidade_vertices_requeridos(matriz_adjacencia):
-    vertices_requeridos = set()
-    for i in range(len(matriz_adjacencia)):
-        for j in range(len(matriz_adjacencia[i])):
-            if matriz_adjacencia[i][j] != 0:
-                vertices_requeridos.add(i)
-                vertices_requeridos.add(j)
-    return len(vertices_requeridos)  # Retorna a quantidade de vértices únicos
-
-
-def calcular_quantidade_arestas_requeridas(matriz_adjacencia):
-    quantidade_arestas_requeridas = 0
-    for i in range(len(matriz_adjacencia)):
-        for j in range(len(matriz_adjacencia[i])):
-            if matriz_adjacencia[i][j] != 0:
-                quantidade_arestas_requeridas += 1
-    return quantidade_arestas_requeridas // 2  # Dividir por 2
-
-
-def calcular_quantidade_arcos_requeridos(matriz_adjacencia):
-    quantidade_arcos_requeridos = 0
-    for i in range(len(matriz_adjacencia)):
-        for j in range(len(matriz_adjacencia[i])):
-            if matriz_adjacencia[i][j] != 0:
-                quantidade_arcos_requeridos += 1
-    return quantidade_arcos_requeridos
-
-
-def calcular_densidade_grafo(matriz_adjacencia):
-    quantidade_vertices = calcular_quantidade_vertices(matriz_adjacencia)
-    quantidade_arestas = calcular_quantidade_arestas(matriz_adjacencia)
-    if quantidade_vertices > 1:
-        densidade = (2 * quantidade_arestas) / (
-            quantidade_vertices * (quantidade_vertices - 1)
-        )
-    else:
-        densidade = 0
-    return densidade
-
-
-def retorna_componentes_conectados(matriz_adjacencia):
-    componentes = []
-    visitados = set()
-
-    for i in range(len(matriz_adjacencia)):
-        if i not in visitados:
-            componente = []
-            pilha = [i]
-
-            while pilha:
-                vertice = pilha.pop()
-                if vertice not in visitados:
-                    visitados.add(vertice)
-                    componente.append(vertice)
-                    for j in range(len(matriz_adjacencia[vertice])):
-                        if (matriz_adjacencia[vertice][j] != 0 and 
-                            j not in visitados):
-                            pilha.append(j)
-
-            componentes.append(componente)
-
-    return componentes
-
-
-def calcular_grau_minimo_vertices(matriz_adjacencia):
-    grau_minimo = float("inf")
-    for i in range(len(matriz_adjacencia)):
-        grau = sum(
-            1 for j in range(len(matriz_adjacencia[i]))
-            if matriz_adjacencia[i][j] != 0
-        )
-        if grau < grau_minimo:
-            grau_minimo = grau
-    return grau_minimo
-
-
-def calcular_grau_maximo_vertices(matriz_adjacencia):
-    grau_maximo = float("-inf")
-    for i in range(len(matriz_adjacencia)):
-        grau = sum(
-            1 for j in range(len(matriz_adjacencia[i]))
-            if matriz_adjacencia[i][j] != 0
-        )
-        if grau > grau_maximo:
-            grau_maximo = grau
-    return grau_maximo
-
-
-def dijkstra(matriz, origem, matriz_predessores):
-    distancias = [float("inf")] * len(matriz)
-    distancias[origem] = 0
-    heap = [(0, origem)]
-
-    while heap:
-        distancia_atual, no_atual = heapq.heappop(heap)
-
-        if distancia_atual > distancias[no_atual]:
-            continue
-
-        for vizinho in range(len(matriz[no_atual])):
-            if matriz[no_atual][vizinho] != 0:
-                nova_dist = distancia_atual + matriz[no_atual][vizinho]
-                if nova_dist < distancias[vizinho]:
-                    distancias[vizinho] = nova_dist
-                    matriz_predessores[origem][vizinho] = no_atual
-                    heapq.heappush(heap, (nova_dist, vizinho))
-
-    return distancias
-
-
-def calcular_intermediacao(matriz_adjacencia, matriz_predessores):
-    intermediacao = [0] * len(matriz_adjacencia)
+def calcular_estatisticas_instancia(conteudo):
+    """
+    Contagens, densidade e graus da instância completa, com os nós, arestas e
+    arcos requeridos e não requeridos lidos do arquivo.
+    """
+    dados = conteudo.encode()
+    _, arestas, _, _ = ler_instancia_carp(dados)
+    try:
+        num_vertices = int(ler_cabecalho_carp(dados).get("#Nodes", "0"))
+    except ValueError:
+        num_vertices = 0
+    return calcular_estatisticas(arestas, num_vertices)
 
-    for origem in range(len(matriz_adjacencia)):
-        dijkstra(matriz_adjacencia, origem, matriz_predessores)
 
-        for destino in range(len(matriz_adjacencia)):
-            if origem != destino:
-                caminho = []
-                atual = destino
-                while atual != -1 and atual != origem:
-                    caminho.append(atual)
-                    atual = matriz_predessores[origem][atual]
-                caminho.reverse()
+def retorna_componentes_conectados(grafo):
+    """Componentes fracamente conexas (arcos em qualquer sentido)."""
+    return agrupar_componentes(*componentes_fracos(grafo))
 
-                for no in caminho[1:-1]:  # Exclui origem e destino
-                    intermediacao[no] += 1
 
-    return intermediacao
+def retorna_componentes_fortemente_conectados(grafo):
+    """Componentes fortemente conexas (arcos só no seu sentido)."""
+    return agrupar_componentes(*componentes_fortes(grafo))
 
 
-def calcular_caminho_medio(matriz_adjacencia, matriz_predessores):
-    total_caminhos = 0
-    total_distancia = 0
+def _metricas_caminhos(grafo, matriz_predessores):
+    """
+    Métricas de caminhos mínimos do grafo, calculadas uma única vez por grafo
+    carregado. Copia as árvores de caminhos mínimos para matriz_predessores,
+    exibida pela opção 2 do menu.
+    """
+    metricas = obter_metricas(grafo)
+    for origem, linha in enumerate(metricas.predecessores):
+        destino_linha = matriz_predessores[origem]
+        for destino, predecessor in enumerate(linha):
+            if predecessor != -1:
+                destino_linha[destino] = predecessor
+    return metricas
 
-    for origem in range(len(matriz_adjacencia)):
-        distancias = dijkstra(matriz_adjacencia, origem, matriz_predessores)
-        for destino in range(len(distancias)):
-            if origem != destino and distancias[destino] != float("inf"):
-                total_caminhos += 1
-                total_distancia += distancias[destino]
 
-    if total_caminhos > 0:
-        return total_distancia / total_caminhos
-    else:
-        return 0
+def calcular_intermediacao(grafo, matriz_predessores):
+    return _metricas_caminhos(grafo, matriz_predessores).intermediacao
 
 
-def calcular_diametro(matriz_adjacencia, matriz_predessores):
-    diametro = 0
+def calcular_caminho_medio(grafo, matriz_predessores):
+    return _metricas_caminhos(grafo, matriz_predessores).caminho_medio
 
-    for origem in range(len(matriz_adjacencia)):
-        distancias = dijkstra(matriz_adjacencia, origem, matriz_predessores)
-        for destino in range(len(distancias)):
-            if origem != destino and distancias[destino] != float("inf"):
-                if distancias[destino] > diametro:
-                    diametro = distancias[destino]
 
-    return diametro
+def calcular_diametro(grafo, matriz_predessores):
+    return _metricas_caminhos(grafo, matriz_predessores).diametro
 
 
-def imprimir_matriz(matriz, matriz_predessores):
-    tamanho = len(matriz)
+def imprimir_matriz(grafo, matriz_predessores):
+    tamanho = grafo.num_vertices
 
     # Imprimir cabeçalho da matriz de adjacência
     print("Matriz de Adjacência:")
@@ -264,7 +146,7 @@ def imprimir_matriz(matriz, matriz_predessores):
 
     # Imprimir linhas da matriz de adjacência
     for i in range(tamanho):
-        linha = [str(matriz[i][j]) for j in range(tamanho)]
+        linha = [str(custo) for custo in grafo.linha_matriz(i)]
         print(f"{i + 1}\t" + "\t".join(linha))
 
     print("\nMatriz de Predecessores:")
@@ -276,63 +158,109 @@ def imprimir_matriz(matriz, matriz_predessores):
         print(f"{i + 1}\t" + "\t".join(linha))
 
 
-def exibir_metricas(matriz_adjacencia, matriz_predessores):
+def _textos_metricas_caminhos(grafo, matriz_predessores):
+    """Intermediação, caminho médio e diâmetro formatados para exibição."""
+    if grafo.num_vertices <= MAX_VERTICES_EXATO:
+        # Uma varredura de Dijkstra para todas as métricas de caminhos
+        metricas = _metricas_caminhos(grafo, matriz_predessores)
+        return (
+            f"{[round(valor, 2) for valor in metricas.intermediacao]}",
+            f"{metricas.caminho_medio:.4f}",
+            f"{metricas.diametro}"
+        )
+
+    estimativa, diametro = obter_estimativas(grafo, AMOSTRAS_ESTIMATIVA)
+    intermediacao = f"{[round(valor, 2) for valor in estimativa.intermediacao]}"
+    caminho_medio = f"{estimativa.caminho_medio:.4f}"
+    if not estimativa.exata:
+        intermediacao += (
+            f" (estimada com {estimativa.amostras} origens: erro de até "
+            f"{estimativa.margem:.0f} com {estimativa.confianca:.0%} de confiança)"
+        )
+        caminho_medio += f" (estimado com {estimativa.amostras} origens)"
+    if diametro.exato:
+        texto_diametro = f"{diametro.limite_inferior}"
+    elif diametro.limite_superior is None:
+        texto_diametro = f"pelo menos {diametro.limite_inferior}"
+    else:
+        texto_diametro = (
+            f"entre {diametro.limite_inferior} e {diametro.limite_superior}"
+        )
+    texto_diametro += f" ({diametro.varreduras} varreduras de Dijkstra)"
+    return intermediacao, caminho_medio, texto_diametro
+
+
+def exibir_metricas(grafo, matriz_predessores, estatisticas):
+    intermediacao, caminho_medio, diametro = _textos_metricas_caminhos(
+        grafo, matriz_predessores
+    )
     print("\nMétricas do Grafo:")
+    # As contagens usam a instância inteira; as métricas de caminhos e
+    # componentes usam o grafo de modelar_grafo (só elementos requeridos)
+    print("\nInstância completa (nós, arestas e arcos, requeridos ou não):")
     print(
         f"1. Quantidade de vértices: "
-        f"{calcular_quantidade_vertices(matriz_adjacencia)}"
+        f"{estatisticas.num_vertices}"
     )
     print(
         f"2. Quantidade de arestas: "
-        f"{calcular_quantidade_arestas(matriz_adjacencia)}"
+        f"{estatisticas.num_arestas}"
     )
     print(
         f"3. Quantidade de arcos: "
-        f"{calcular_quantidade_arcos(matriz_adjacencia)}"
+        f"{estatisticas.num_arcos}"
     )
     print(
         f"4. Quantidade de vértices requeridos: "
-        f"{calcular_quantidade_vertices_requeridos(matriz_adjacencia)}"
+        f"{estatisticas.vertices_requeridos}"
     )
     print(
         f"5. Quantidade de arestas requeridas: "
-        f"{calcular_quantidade_arestas_requeridas(matriz_adjacencia)}"
+        f"{estatisticas.arestas_requeridas}"
     )
     print(
         f"6. Quantidade de arcos requeridos: "
-        f"{calcular_quantidade_arcos_requeridos(matriz_adjacencia)}"
+        f"{estatisticas.arcos_requeridos}"
     )
     print(
         f"7. Densidade do grafo: "
-        f"{calcular_densidade_grafo(matriz_adjacencia):.4f}"
+        f"{estatisticas.densidade:.4f}"
+    )
+    print(
+        f"8. Grau mínimo dos vértices: "
+        f"{estatisticas.grau_minimo}"
+    )
+    print(
+        f"9. Grau máximo dos vértices: "
+        f"{estatisticas.grau_maximo}"
     )
     print(
-        f"8. Componentes conectados: "
-        f"{retorna_componentes_conectados(matriz_adjacencia)}"
+        "\nGrafo dos elementos requeridos (seções ReN., ReE. e ReA., "
+        "o mesmo da opção 2):"
     )
     print(
-        f"9. Grau mínimo dos vértices: "
-        f"{calcular_grau_minimo_vertices(matriz_adjacencia)}"
+        f"10. Componentes conectados: "
+        f"{retorna_componentes_conectados(grafo)}"
     )
     print(
-        f"10. Grau máximo dos vértices: "
-        f"{calcular_grau_maximo_vertices(matriz_adjacencia)}"
+        f"11. Componentes fortemente conectados: "
+        f"{retorna_componentes_fortemente_conectados(grafo)}"
     )
     print(
-        f"11. Intermediação: "
-        f"{calcular_intermediacao(matriz_adjacencia, matriz_predessores)}"
+        f"12. Intermediação: "
+        f"{intermediacao}"
     )
     print(
-        f"12. Caminho médio: "
-        f"{calcular_caminho_medio(matriz_adjacencia, matriz_predessores):.4f}"
+        f"13. Caminho médio: "
+        f"{caminho_medio}"
     )
     print(
-        f"13. Diâmetro: "
-        f"{calcular_diametro(matriz_adjacencia, matriz_predessores)}"
+        f"14. Diâmetro: "
+        f"{diametro}"
     )
 
 
-def resolver_carp(matriz_adjacencia, nome_arquivo):
+def resolver_carp(grafo, nome_arquivo):
     """Resolve o problema do CARP para o arquivo atual"""
     try:
         # Cria o diretório best_solutions se não existir
@@ -340,24 +268,29 @@ def resolver_carp(matriz_adjacencia, nome_arquivo):
             os.makedirs("best_solutions")
         
         # Lê a instância usando o arquivo atual
-        matriz_adjacencia, arestas_requeridas, capacidade, deposito = \
+        grafo, arestas_requeridas, capacidade, deposito = \
             ler_instancia_carp(os.path.join("selected_instances", nome_arquivo))
         
         print("\nInformações da instância:")
-        print(f"- Número de vértices: {len(matriz_adjacencia)}")
+        print(f"- Número de vértices: {grafo.num_vertices}")
         print(
-            "- Número de arestas requeridas: "
-            f"{sum(1 for a in arestas_requeridas if a.requerida)}"
+            "- Número de nós requeridos: "
+            f"{sum(1 for a in arestas_requeridas if a.requerida and a.tipo == TIPO_NO)}"
+        )
+        print(
+            "- Número de arestas/arcos requeridos: "
+            f"{sum(1 for a in arestas_requeridas if a.requerida and a.tipo != TIPO_NO)}"
         )
         print(f"- Capacidade do veículo: {capacidade}")
         print(f"- Vértice do depósito: {deposito}")
         
         # Cria e executa o solver
         solver = CARPSolver(
-            matriz_adjacencia,
+            grafo,
             arestas_requeridas,
             capacidade,
-            deposito
+            deposito,
+            CACHE_DISTANCIAS
         )
         
         print("\nResolvendo o problema...")
@@ -380,8 +313,11 @@ def resolver_carp(matriz_adjacencia, nome_arquivo):
         print("Erro ao resolver a instância:", e)
 
 
-def resolver_todas_instancias():
-    """Resolve todas as instâncias presentes na pasta selected_instances"""
+def resolver_todas_instancias(num_processos=None):
+    """
+    Resolve todas as instâncias presentes na pasta selected_instances,
+    distribuindo-as entre processos (padrão: um por núcleo)
+    """
     try:
         # Lista todos os arquivos .dat na pasta selected_instances
         arquivos = [
@@ -397,23 +333,25 @@ def resolver_todas_instancias():
         for arquivo in arquivos:
             print(f"- {arquivo}")
         
-        # Processa cada arquivo
-        for i, arquivo in enumerate(arquivos, 1):
-            print(f"\n[{i}/{len(arquivos)}] Processando {arquivo}...")
-            
-            try:
-                # Lê e modela o grafo
-                conteudo = ler_arquivo(arquivo)
-                if conteudo.startswith("Erro"):
-                    print(f"Erro ao ler arquivo {arquivo}:")
-                    print(conteudo)
-                    continue
-                
-                matriz_adjacencia, _ = modelar_grafo(conteudo)
-                resolver_carp(matriz_adjacencia, arquivo)
-                
-            except Exception as e:
-                print(f"Erro ao processar arquivo {arquivo}:", e)
+        caminhos = [os.path.join("selected_instances", f) for f in arquivos]
+        
+        # Processa os arquivos em paralelo, exibindo cada um ao terminar
+        resultados = resolver_em_paralelo(
+            caminhos, "best_solutions", num_processos
+        )
+        for i, resultado in enumerate(resultados, 1):
+            if resultado.erro is not None:
+                print(
+                    f"[{i}/{len(arquivos)}] Erro ao processar arquivo "
+                    f"{resultado.nome}: {resultado.erro}"
+                )
+            else:
+                print(
+                    f"[{i}/{len(arquivos)}] {resultado.nome}: "
+                    f"custo {resultado.custo_total}, "
+                    f"{resultado.num_rotas} rotas, "
+                    f"{resultado.clocks/1e9:.3f} s -> {resultado.arquivo_solucao}"
+                )
         
         print("\nProcessamento concluído!")
         
@@ -423,11 +361,11 @@ def resolver_todas_instancias():
 
 def main():
     print("Bem-vindo ao programa de análise de grafos!")
-    matriz_adjacencia = None
+    grafo = None
     nome_arquivo_atual = None
 
     while True:
-        if matriz_adjacencia is None:
+        if grafo is None:
             arquivo = input(
                 "\nPor favor, insira o nome do arquivo que deseja acessar: "
             )
@@ -437,7 +375,8 @@ def main():
                 print(conteudo)
                 continue
             else:
-                matriz_adjacencia, matriz_predessores = modelar_grafo(conteudo)
+                grafo, matriz_predessores = modelar_grafo(conteudo)
+                estatisticas = calcular_estatisticas_instancia(conteudo)
                 nome_arquivo_atual = arquivo
 
         print("\nMenu:")
@@ -451,18 +390,18 @@ def main():
         opcao = input("Escolha uma opção: ")
 
         if opcao == "1":
-            matriz_adjacencia = None
+            grafo = None
             nome_arquivo_atual = None
         elif opcao == "2":
-            imprimir_matriz(matriz_adjacencia, matriz_predessores)
+            imprimir_matriz(grafo, matriz_predessores)
         elif opcao == "3":
-            exibir_metricas(matriz_adjacencia, matriz_predessores)
+            exibir_metricas(grafo, matriz_predessores, estatisticas)
         elif opcao == "4":
-            if matriz_adjacencia is None:
+            if grafo is None:
                 print("Por favor, carregue um arquivo primeiro.")
             else:
                 resolver_carp(
-                    matriz_adjacencia,
+                    grafo,
                     nome_arquivo_atual
                 )
         elif opcao == "5":
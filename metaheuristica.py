@@ -0,0 +1,420 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from busca_local import AvaliadorMovimentos, DadosRota, Rota
+
+if TYPE_CHECKING:
+    from carp_solver import CARPSolver, Checkpoint
+
+
+def copiar_rotas(rotas: List[Rota]) -> List[Rota]:
+    """Cópia independente das rotas, sem as rotas vazias."""
+    return [rota.copiar() for rota in rotas if len(rota)]
+
+
+class Metaheuristica(ABC):
+    """
+    Base das metaheurísticas aplicadas depois da busca local de CARPSolver.
+
+    Cada subclasse implementa executar, que parte de uma solução (em geral
+    um ótimo local) e devolve a melhor solução encontrada. Com prazo, a
+    execução vai até ele, recomeçando da melhor solução a cada
+    max_sem_melhora iterações seguidas sem melhora; sem prazo, termina
+    nesse ponto. Todos os movimentos são avaliados pela variação de custo
+    (AvaliadorMovimentos).
+    """
+
+    def __init__(
+        self,
+        solver: "CARPSolver",
+        rng: Optional[random.Random] = None,
+        max_sem_melhora: int = 50
+    ):
+        """
+        Args:
+            solver: Solver da instância (distâncias, serviços e busca local)
+            rng: Gerador aleatório; None usa random.Random() sem semente
+            max_sem_melhora: Iterações seguidas sem melhorar a melhor solução
+                que encerram a execução (ou, com prazo, recomeçam da melhor)
+        """
+        self.solver = solver
+        self.rng = rng if rng is not None else random.Random()
+        self.max_sem_melhora = max_sem_melhora
+        self.avaliador = AvaliadorMovimentos(
+            solver.distancias, solver.servicos, solver.deposito
+        )
+        self.iteracoes = 0
+
+    @abstractmethod
+    def executar(
+        self,
+        rotas: List[Rota],
+        prazo: Optional[float] = None,
+        checkpoint: Optional["Checkpoint"] = None
+    ) -> List[Rota]:
+        """
+        Args:
+            rotas: Solução inicial (não é alterada)
+            prazo: Instante (time.monotonic()) em que a execução para
+            checkpoint: Recebe as melhorias da melhor solução
+
+        Returns:
+            Melhor solução encontrada
+        """
+
+    @staticmethod
+    def _tempo_esgotado(prazo: Optional[float]) -> bool:
+        return prazo is not None and time.monotonic() >= prazo
+
+
+class BuscaLocalIterada(Metaheuristica):
+    """
+    Busca local iterada (ILS) com perturbação por destruição e reconstrução.
+
+    A cada iteração, um grupo de serviços próximos entre si é retirado da
+    solução corrente e reinserido, um a um, na posição de menor custo que
+    respeita a capacidade (uma rota nova se nenhuma couber); em seguida a
+    busca local do solver leva a solução a um novo ótimo local. A nova
+    solução é aceita se não passar de (1 + desvio) vezes o custo da melhor
+    conhecida (record-to-record travel); caso contrário, a corrente volta a
+    ser a anterior.
+    """
+
+    def __init__(
+        self,
+        solver: "CARPSolver",
+        rng: Optional[random.Random] = None,
+        max_sem_melhora: int = 30,
+        fracao_remocao: float = 0.1,
+        max_remocao: int = 40,
+        desvio: float = 0.005
+    ):
+        """
+        Args:
+            fracao_remocao: Fração dos serviços retirados por perturbação
+                (no máximo; o tamanho é sorteado a partir de 2)
+            max_remocao: Limite absoluto de serviços retirados
+            desvio: Tolerância do critério de aceitação
+
+        Os demais argumentos são os de Metaheuristica.
+        """
+        super().__init__(solver, rng, max_sem_melhora)
+        self.fracao_remocao = fracao_remocao
+        self.max_remocao = max_remocao
+        self.desvio = desvio
+
+    def _remover(self, rotas: List[Rota]) -> List[Tuple[int, int, int]]:
+        """
+        Retira da solução um serviço sorteado e os serviços mais próximos
+        dele (proximidade da lista granular: min(d(t_a, o_b), d(t_b, o_a))).
+        """
+        dist = self.solver.distancias
+        total = sum(len(rota) for rota in rotas)
+        maximo = max(2, min(self.max_remocao, int(total * self.fracao_remocao)))
+        quantidade = min(total, self.rng.randint(2, maximo))
+
+        servicos = [(i, pos) for i, rota in enumerate(rotas) for pos in range(len(rota))]
+        i, pos = self.rng.choice(servicos)
+        origem, destino, _ = rotas[i][pos]
+        linha_destino = dist[destino]
+        proximidade = sorted(
+            (min(linha_destino[rotas[j].origens[k]], dist[rotas[j].destinos[k]][origem]),
+             j, k)
+            for j, k in servicos
+        )
+        escolhidos = sorted(
+            ((j, k) for _, j, k in proximidade[:quantidade]), reverse=True
+        )
+        # Posições em ordem decrescente, para que as remoções não desloquem
+        # as posições ainda não removidas
+        return [rotas[j].remover(k) for j, k in escolhidos]
+
+    def _reinserir(
+        self,
+        rotas: List[Rota],
+        removidos: List[Tuple[int, int, int]]
+    ):
+        """Insere cada serviço na posição viável de menor custo."""
+        solver = self.solver
+        avaliador = self.avaliador
+        demanda = solver.servicos.demanda
+        capacidade = solver.capacidade_veiculo
+        rotas[:] = [rota for rota in rotas if len(rota)]
+        # Atualiza também carga e custo das rotas que perderam serviços
+        dados: List[Optional[DadosRota]] = [None] * len(rotas)
+        for i in range(len(rotas)):
+            solver._atualizar_rota(rotas, dados, i, avaliador)
+
+        self.rng.shuffle(removidos)
+        # Maiores demandas primeiro: são as mais difíceis de encaixar
+        removidos.sort(key=lambda servico: -demanda[servico[2]])
+        for servico in removidos:
+            melhor = None
+            for i, rota in enumerate(rotas):
+                if rota.demanda_total + demanda[servico[2]] > capacidade:
+                    continue
+                delta, pos, orientado = avaliador.melhor_insercao(dados[i], servico)
+                if melhor is None or delta < melhor[0]:
+                    melhor = (delta, i, pos, orientado)
+            if melhor is None:
+                rotas.append(Rota())
+                dados.append(avaliador.preparar(rotas[-1]))
+                melhor = (0, len(rotas) - 1, 0, servico)
+            _, i, pos, orientado = melhor
+            rotas[i].inserir(pos, orientado)
+            solver._atualizar_rota(rotas, dados, i, avaliador)
+
+    def executar(
+        self,
+        rotas: List[Rota],
+        prazo: Optional[float] = None,
+        checkpoint: Optional["Checkpoint"] = None
+    ) -> List[Rota]:
+        solver = self.solver
+        corrente = copiar_rotas(rotas)
+        custo_corrente = sum(rota.custo_total for rota in corrente)
+        melhor, melhor_custo = copiar_rotas(corrente), custo_corrente
+
+        sem_melhora = 0
+        while not self._tempo_esgotado(prazo):
+            if sem_melhora >= self.max_sem_melhora:
+                if prazo is None:
+                    break
+                # Ainda há tempo: recomeça da melhor solução
+                corrente = copiar_rotas(melhor)
+                custo_corrente, sem_melhora = melhor_custo, 0
+            self.iteracoes += 1
+            candidata = copiar_rotas(corrente)
+            self._reinserir(candidata, self._remover(candidata))
+            candidata = solver._melhorar_solucao(
+                candidata, prazo=prazo, checkpoint=checkpoint
+            )
+            custo = sum(rota.custo_total for rota in candidata)
+
+            if custo < melhor_custo:
+                melhor, melhor_custo = copiar_rotas(candidata), custo
+                sem_melhora = 0
+                if checkpoint is not None:
+                    checkpoint.registrar(melhor)
+            else:
+                sem_melhora += 1
+            if custo <= melhor_custo * (1 + self.desvio):
+                corrente, custo_corrente = candidata, custo
+
+        return melhor
+
+
+class BuscaTabu(Metaheuristica):
+    """
+    Busca tabu sobre os movimentos entre rotas (relocate e swap).
+
+    A cada iteração é aplicado o melhor movimento não tabu, mesmo que piore a
+    solução. Ao sair da rota r, o serviço s fica proibido de voltar para r
+    durante um número sorteado de iterações (atributo tabu (s, r)). Um
+    movimento tabu é aceito se levar a uma solução melhor que a melhor
+    conhecida (critério de aspiração). Com k_vizinhos no solver, um serviço
+    só é avaliado nas rotas que contêm algum dos seus vizinhos granulares.
+    Ao final, a melhor solução passa pela busca local completa do solver
+    (2-opt*, inversão e orientação das arestas).
+    """
+
+    def __init__(
+        self,
+        solver: "CARPSolver",
+        rng: Optional[random.Random] = None,
+        max_sem_melhora: int = 200,
+        duracao: Tuple[int, int] = (5, 15)
+    ):
+        """
+        Args:
+            duracao: Faixa (mínimo, máximo) do número de iterações em que um
+                atributo fica tabu
+
+        Os demais argumentos são os de Metaheuristica.
+        """
+        super().__init__(solver, rng, max_sem_melhora)
+        self.duracao = duracao
+        self._reiniciar_avaliacoes(0)
+
+    def _reiniciar_avaliacoes(self, num_rotas: int):
+        """
+        Descarta as avaliações guardadas. Entre iterações, só as rotas do
+        movimento aplicado mudam: a melhor inserção de cada serviço em cada
+        rota e a melhor troca de cada serviço com cada rota ficam guardadas
+        com a versão das rotas envolvidas e só são refeitas quando ela muda.
+        """
+        self._versoes = [0] * num_rotas
+        # (serviço, rota) -> (versão, resultado de melhor_insercao/melhor_troca)
+        self._insercoes: Dict[Tuple[int, int], tuple] = {}
+        self._trocas: Dict[Tuple[int, int], tuple] = {}
+
+    def _rotas_candidatas(
+        self,
+        rotas: List[Rota],
+        id_servico: int,
+        origem: int,
+        rota_de: Optional[List[int]]
+    ) -> List[int]:
+        if rota_de is None:
+            return [j for j in range(len(rotas)) if j != origem]
+        granular = self.solver._granular
+        candidatas = {rota_de[vizinho] for vizinho in granular.vizinhos[id_servico]}
+        candidatas.discard(origem)
+        return sorted(candidatas)
+
+    def _melhor_movimento(
+        self,
+        rotas: List[Rota],
+        dados: List[DadosRota],
+        tabu: Dict[Tuple[int, int], int],
+        aspiracao: int,
+        rota_de: Optional[List[int]]
+    ) -> Tuple[Optional[int], Optional[tuple]]:
+        """
+        Melhor movimento permitido, no formato de CARPSolver._aplicar_movimento.
+
+        Args:
+            tabu: (serviço, rota) -> última iteração em que o atributo é tabu
+            aspiracao: Variação de custo abaixo da qual um movimento tabu é
+                aceito (melhor custo conhecido - custo corrente)
+            rota_de: Rota de cada serviço, para a lista granular (None: todas
+                as rotas)
+
+        Returns:
+            Tuple com a variação de custo e o movimento, ou (None, None)
+        """
+        avaliador = self.avaliador
+        demanda = self.solver.servicos.demanda
+        capacidade = self.solver.capacidade_veiculo
+        iteracao = self.iteracoes
+        versoes = self._versoes
+        insercoes, trocas = self._insercoes, self._trocas
+        melhor_delta, melhor = None, None
+
+        def permitido(delta: int, *atributos: Tuple[int, int]) -> bool:
+            if delta < aspiracao:
+                return True
+            return all(tabu.get(atributo, 0) < iteracao for atributo in atributos)
+
+        for a, rota_a in enumerate(rotas):
+            folga_a = capacidade - rota_a.demanda_total
+            for pos_a, servico in enumerate(rota_a):
+                id_servico = servico[2]
+                delta_remocao = avaliador.delta_remocao(rota_a, pos_a)
+                for b in self._rotas_candidatas(rotas, id_servico, a, rota_de):
+                    rota_b = rotas[b]
+                    folga_b = capacidade - rota_b.demanda_total
+                    # Relocate de a para b
+                    if demanda[id_servico] <= folga_b:
+                        versao, insercao = insercoes.get((id_servico, b), (-1, None))
+                        if versao != versoes[b]:
+                            insercao = avaliador.melhor_insercao(dados[b], servico)
+                            insercoes[(id_servico, b)] = (versoes[b], insercao)
+                        delta, pos_b, orientado = insercao
+                        delta += delta_remocao
+                        if ((melhor_delta is None or delta < melhor_delta) and
+                                permitido(delta, (id_servico, b))):
+                            melhor_delta = delta
+                            melhor = ("mover", a, pos_a, b, pos_b, orientado)
+                    # Swap (cada par de rotas é avaliado uma vez)
+                    if (b < a and rota_de is None) or not rota_b.ids:
+                        continue
+                    versao, troca = trocas.get((id_servico, b), (None, None))
+                    if versao != (a, versoes[a], versoes[b]):
+                        troca = avaliador.melhor_troca(
+                            rota_a, dados[a], pos_a, rota_b, dados[b], folga_a, folga_b
+                        )
+                        trocas[(id_servico, b)] = ((a, versoes[a], versoes[b]), troca)
+                    delta, pos_b = troca
+                    if pos_b < 0:
+                        continue
+                    if ((melhor_delta is None or delta < melhor_delta) and
+                            permitido(delta, (id_servico, b),
+                                      (rota_b.ids[pos_b], a))):
+                        melhor_delta = delta
+                        melhor = ("trocar", a, pos_a, b, pos_b)
+        return melhor_delta, melhor
+
+    def executar(
+        self,
+        rotas: List[Rota],
+        prazo: Optional[float] = None,
+        checkpoint: Optional["Checkpoint"] = None
+    ) -> List[Rota]:
+        solver = self.solver
+        avaliador = self.avaliador
+        rotas = copiar_rotas(rotas)
+        dados = [avaliador.preparar(rota) for rota in rotas]
+        custo = sum(d.custo for d in dados)
+        melhor, melhor_custo = copiar_rotas(rotas), custo
+
+        granular = solver._preparar_granular()
+        rota_de = granular.posicoes(rotas)[0] if granular is not None else None
+        tabu: Dict[Tuple[int, int], int] = {}
+        self._reiniciar_avaliacoes(len(rotas))
+
+        sem_melhora = 0
+        while not self._tempo_esgotado(prazo):
+            if sem_melhora >= self.max_sem_melhora:
+                if prazo is None:
+                    break
+                # Ainda há tempo: recomeça da melhor solução, sem tabus
+                rotas = copiar_rotas(melhor)
+                dados = [avaliador.preparar(rota) for rota in rotas]
+                custo, sem_melhora = melhor_custo, 0
+                if rota_de is not None:
+                    rota_de = granular.posicoes(rotas)[0]
+                tabu.clear()
+                self._reiniciar_avaliacoes(len(rotas))
+            self.iteracoes += 1
+            delta, movimento = self._melhor_movimento(
+                rotas, dados, tabu, melhor_custo - custo, rota_de
+            )
+            if movimento is None:
+                break
+
+            tipo, a, pos_a, b, pos_b = movimento[:5]
+            saidas = [(rotas[a].ids[pos_a], a)]
+            if tipo == "trocar":
+                saidas.append((rotas[b].ids[pos_b], b))
+            removeu = solver._aplicar_movimento(rotas, dados, avaliador, movimento)
+            custo += delta
+            for atributo in saidas:
+                tabu[atributo] = self.iteracoes + self.rng.randint(*self.duracao)
+            if removeu:
+                # Só o relocate esvazia uma rota, a de origem (a): os índices
+                # das rotas seguintes diminuem, e as avaliações guardadas e os
+                # atributos tabu, indexados pela rota, precisam acompanhar
+                tabu = {
+                    (id_servico, r - (r > a)): fim
+                    for (id_servico, r), fim in tabu.items() if r != a
+                }
+                self._reiniciar_avaliacoes(len(rotas))
+                if rota_de is not None:
+                    rota_de = granular.posicoes(rotas)[0]
+            else:
+                self._versoes[a] += 1
+                self._versoes[b] += 1
+                if rota_de is not None:
+                    for r in (a, b):
+                        for id_servico in rotas[r].ids:
+                            rota_de[id_servico] = r
+
+            if custo < melhor_custo:
+                melhor, melhor_custo = copiar_rotas(rotas), custo
+                sem_melhora = 0
+                if checkpoint is not None:
+                    checkpoint.registrar(melhor)
+            else:
+                sem_melhora += 1
+
+        return solver._melhorar_solucao(melhor, prazo=prazo, checkpoint=checkpoint)
+
+
+# Metaheurísticas aceitas por CARPSolver.resolver
+METAHEURISTICAS = {
+    "ils": BuscaLocalIterada,
+    "tabu": BuscaTabu,
+}
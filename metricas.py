@@ -0,0 +1,552 @@
+import heapq
+import math
+import os
+import random
+import weakref
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from carp_solver import Aresta, TIPO_ARESTA, TIPO_NO
+from distancias import INFINITO, dijkstra_origem
+from grafo import Grafo
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy é opcional
+    np = None
+
+
+# Abaixo deste tamanho, abrir o pool custa mais que a própria varredura
+MIN_VERTICES_PARALELO = 200
+
+# Métricas já calculadas de cada grafo carregado; a entrada some junto com
+# o grafo
+_CACHE: "weakref.WeakKeyDictionary[Grafo, MetricasGrafo]" = weakref.WeakKeyDictionary()
+# Estimativas de cada grafo, por (amostras, max_varreduras)
+_CACHE_ESTIMATIVAS: "weakref.WeakKeyDictionary[Grafo, dict]" = weakref.WeakKeyDictionary()
+
+# Listas de adjacência de cada processo do pool, criadas pelo inicializador
+_adjacencia_trabalhador: Optional[List[List[Tuple[int, int]]]] = None
+
+
+@dataclass
+class EstatisticasGrafo:
+    """Contagens, densidade e graus de uma instância, calculados de uma vez."""
+    num_vertices: int
+    num_arestas: int
+    num_arcos: int
+    vertices_requeridos: int
+    arestas_requeridas: int
+    arcos_requeridos: int
+    # Pares ordenados ligados / V(V − 1): arestas valem nos dois sentidos
+    densidade: float
+    # Arestas e arcos incidentes (entrando ou saindo) em cada vértice,
+    # indexado pelo número do vértice na instância (1..V; 0 não é usado)
+    graus: array
+    grau_minimo: int
+    grau_maximo: int
+
+
+@dataclass
+class MetricasGrafo:
+    """Métricas que dependem dos caminhos mínimos, obtidas em uma só varredura."""
+    # Centralidade de intermediação de Brandes (pares ordenados, sem
+    # normalização): caminhos mínimos empatados dividem o crédito
+    intermediacao: List[float]
+    caminho_medio: float
+    diametro: int
+    # Linha de predecessores de cada origem (-1: sem predecessor)
+    predecessores: List[array]
+
+
+@dataclass
+class MetricasAproximadas:
+    """Intermediação e caminho médio estimados a partir de origens sorteadas."""
+    intermediacao: List[float]
+    caminho_medio: float
+    amostras: int
+    # Com probabilidade de pelo menos confianca, todos os valores de
+    # intermediacao estão a no máximo margem dos exatos
+    margem: float
+    confianca: float
+
+    @property
+    def exata(self) -> bool:
+        return self.margem == 0
+
+
+@dataclass
+class LimitesDiametro:
+    """Intervalo que contém o diâmetro (maior distância finita entre pares)."""
+    limite_inferior: int
+    # None quando nenhum limite vale (algum vértice não alcança a raiz ou
+    # não é alcançado por ela e ainda não foi varrido)
+    limite_superior: Optional[int]
+    varreduras: int
+
+    @property
+    def exato(self) -> bool:
+        return self.limite_superior == self.limite_inferior
+
+
+@dataclass
+class _Parcial:
+    """Acumuladores da varredura de um subconjunto das origens."""
+    intermediacao: List[float]
+    soma_distancias: int
+    pares: int
+    diametro: int
+    predecessores: List[Tuple[int, array]]
+
+
+def _brandes_origem(
+    adjacencia: List[List[Tuple[int, int]]],
+    num_vertices: int,
+    origem: int,
+    intermediacao: List[float]
+) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Etapa do algoritmo de Brandes a partir de origem: Dijkstra contando os
+    caminhos mínimos de cada vértice (sigma) e guardando todos os seus
+    predecessores, seguido do acúmulo das dependências em ordem reversa.
+
+    A dependência de v é a fração dos caminhos mínimos da origem aos demais
+    destinos que passa por v; empates entre caminhos dividem o crédito.
+
+    Returns:
+        Distâncias, predecessores (o primeiro que alcançou a distância
+        mínima, como na matriz de predecessores) e os vértices alcançados na
+        ordem em que foram fixados
+    """
+    dist = [INFINITO] * num_vertices
+    pred = [-1] * num_vertices
+    sigma = [0] * num_vertices
+    anteriores: List[List[int]] = [[] for _ in range(num_vertices)]
+    fixado = [False] * num_vertices
+    dist[origem] = 0
+    sigma[origem] = 1
+    ordem = []
+    heap = [(0, origem)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if fixado[u]:
+            continue
+        fixado[u] = True
+        ordem.append(u)
+        sigma_u = sigma[u]
+        for v, custo in adjacencia[u]:
+            nova_dist = d + custo
+            if nova_dist < dist[v]:
+                dist[v] = nova_dist
+                pred[v] = u
+                sigma[v] = sigma_u
+                anteriores[v] = [u]
+                heapq.heappush(heap, (nova_dist, v))
+            elif nova_dist == dist[v] and not fixado[v]:
+                sigma[v] += sigma_u
+                anteriores[v].append(u)
+
+    dependencia = [0.0] * num_vertices
+    for w in reversed(ordem):
+        fator = (1.0 + dependencia[w]) / sigma[w]
+        for v in anteriores[w]:
+            dependencia[v] += sigma[v] * fator
+        if w != origem:
+            intermediacao[w] += dependencia[w]
+
+    return dist, pred, ordem
+
+
+def _varrer_origens(
+    adjacencia: List[List[Tuple[int, int]]],
+    origens: Sequence[int],
+    guardar_predecessores: bool = True
+) -> _Parcial:
+    """Acumula as métricas dos caminhos mínimos que partem de origens."""
+    n = len(adjacencia)
+    intermediacao = [0.0] * n
+    soma_distancias = pares = diametro = 0
+    predecessores = []
+
+    for origem in origens:
+        dist, pred, ordem = _brandes_origem(adjacencia, n, origem, intermediacao)
+        for v in ordem:
+            d = dist[v]
+            soma_distancias += d
+            if d > diametro:
+                diametro = d
+        pares += len(ordem) - 1
+        if guardar_predecessores:
+            predecessores.append((origem, array('i', pred)))
+
+    return _Parcial(intermediacao, soma_distancias, pares, diametro, predecessores)
+
+
+def _inicializar_trabalhador(adjacencia: List[List[Tuple[int, int]]]):
+    global _adjacencia_trabalhador
+    _adjacencia_trabalhador = adjacencia
+
+
+def _varrer_origens_trabalhador(
+    origens: Sequence[int],
+    guardar_predecessores: bool
+) -> _Parcial:
+    return _varrer_origens(_adjacencia_trabalhador, origens, guardar_predecessores)
+
+
+def _varrer_em_paralelo(
+    adjacencia: List[List[Tuple[int, int]]],
+    origens: Sequence[int],
+    num_processos: Optional[int],
+    guardar_predecessores: bool = True
+) -> List[_Parcial]:
+    """Divide origens entre processos (None: núcleos da máquina)."""
+    n = len(adjacencia)
+    if num_processos is None:
+        num_processos = os.cpu_count() or 1
+    num_processos = min(num_processos, len(origens))
+    if num_processos <= 1 or n < MIN_VERTICES_PARALELO:
+        return [_varrer_origens(adjacencia, origens, guardar_predecessores)]
+
+    # Origens intercaladas, para que os blocos tenham custo parecido
+    blocos = [origens[i::num_processos] for i in range(num_processos)]
+    with ProcessPoolExecutor(
+        max_workers=num_processos,
+        initializer=_inicializar_trabalhador,
+        initargs=(adjacencia,)
+    ) as executor:
+        return list(executor.map(
+            _varrer_origens_trabalhador, blocos,
+            [guardar_predecessores] * num_processos
+        ))
+
+
+def calcular_estatisticas(
+    arestas: Sequence[Aresta],
+    num_vertices: int
+) -> EstatisticasGrafo:
+    """
+    Calcula as métricas de contagem a partir dos nós, arestas e arcos da
+    instância (requeridos ou não, como devolvidos por ler_instancia_carp).
+
+    Uma passada copia as extremidades e os indicadores para colunas ``array``;
+    as contagens e os graus saem delas (com NumPy, por bincount e
+    count_nonzero), sem percorrer matriz alguma.
+
+    Args:
+        arestas: Nós, arestas e arcos da instância
+        num_vertices: Quantidade de vértices (numerados de 1 a num_vertices)
+
+    Returns:
+        EstatisticasGrafo da instância
+    """
+    extremidades = array('i')   # origem e destino de cada ligação, em pares
+    e_aresta = array('b')
+    requerida = array('b')
+    vertices_requeridos = 0
+    for aresta in arestas:
+        if aresta.tipo == TIPO_NO:
+            vertices_requeridos += 1
+            continue
+        extremidades.append(aresta.origem)
+        extremidades.append(aresta.destino)
+        e_aresta.append(aresta.tipo == TIPO_ARESTA)
+        requerida.append(bool(aresta.requerida))
+    num_vertices = max(num_vertices, max(extremidades, default=0))
+
+    if np is not None:
+        tipos = np.frombuffer(e_aresta, dtype=np.int8).astype(bool)
+        requeridas = np.frombuffer(requerida, dtype=np.int8).astype(bool)
+        graus = array('i', np.bincount(
+            np.frombuffer(extremidades, dtype=np.int32),
+            minlength=num_vertices + 1
+        ).astype(np.int32).tobytes())
+        num_arestas = int(np.count_nonzero(tipos))
+        arestas_requeridas = int(np.count_nonzero(tipos & requeridas))
+        arcos_requeridos = int(np.count_nonzero(~tipos & requeridas))
+    else:
+        graus = array('i', bytes(4 * (num_vertices + 1)))
+        for v in extremidades:
+            graus[v] += 1
+        num_arestas = sum(e_aresta)
+        arestas_requeridas = sum(a and r for a, r in zip(e_aresta, requerida))
+        arcos_requeridos = sum(requerida) - arestas_requeridas
+    num_arcos = len(e_aresta) - num_arestas
+
+    pares = num_vertices * (num_vertices - 1)
+    return EstatisticasGrafo(
+        num_vertices=num_vertices,
+        num_arestas=num_arestas,
+        num_arcos=num_arcos,
+        vertices_requeridos=vertices_requeridos,
+        arestas_requeridas=arestas_requeridas,
+        arcos_requeridos=arcos_requeridos,
+        densidade=(2 * num_arestas + num_arcos) / pares if pares > 0 else 0,
+        graus=graus,
+        grau_minimo=min(graus[1:], default=0),
+        grau_maximo=max(graus[1:], default=0)
+    )
+
+
+def graus_saida(grafo: Grafo) -> List[int]:
+    """Grau de saída de cada vértice, pelas diferenças de inicio."""
+    inicio = grafo.inicio
+    return [inicio[u + 1] - inicio[u] for u in range(grafo.num_vertices)]
+
+
+def calcular_metricas(grafo: Grafo, num_processos: Optional[int] = None) -> MetricasGrafo:
+    """
+    Calcula intermediação, caminho médio e diâmetro com um único
+    Dijkstra por origem, em O(VE + V² log V) no total: a intermediação usa o
+    algoritmo de Brandes, que conta todos os caminhos mínimos empatados.
+
+    Args:
+        grafo: Grafo em formato CSR
+        num_processos: Processos que dividem as origens (None: núcleos da
+            máquina; grafos pequenos são sempre varridos no processo atual)
+
+    Returns:
+        MetricasGrafo do grafo
+    """
+    n = grafo.num_vertices
+    parciais = _varrer_em_paralelo(
+        grafo.lista_adjacencia(), range(n), num_processos
+    )
+
+    intermediacao = [0.0] * n
+    predecessores: List[Optional[array]] = [None] * n
+    soma_distancias = pares = diametro = 0
+    for parcial in parciais:
+        for v, valor in enumerate(parcial.intermediacao):
+            intermediacao[v] += valor
+        for origem, linha in parcial.predecessores:
+            predecessores[origem] = linha
+        soma_distancias += parcial.soma_distancias
+        pares += parcial.pares
+        diametro = max(diametro, parcial.diametro)
+
+    return MetricasGrafo(
+        intermediacao=intermediacao,
+        caminho_medio=soma_distancias / pares if pares > 0 else 0,
+        diametro=diametro,
+        predecessores=predecessores
+    )
+
+
+def obter_metricas(grafo: Grafo, num_processos: Optional[int] = None) -> MetricasGrafo:
+    """calcular_metricas com cache: consultas repetidas ao mesmo grafo são imediatas."""
+    metricas = _CACHE.get(grafo)
+    if metricas is None:
+        metricas = calcular_metricas(grafo, num_processos)
+        _CACHE[grafo] = metricas
+    return metricas
+
+
+def amostras_necessarias(num_vertices: int, erro: float, confianca: float) -> int:
+    """
+    Origens a sortear para que a intermediação estimada de todos os vértices
+    fique, com probabilidade confianca, a no máximo erro · V · (V − 2) da
+    exata.
+
+    A contribuição de cada origem a um vértice está em [0, V − 2], então a
+    desigualdade de Hoeffding (válida também para sorteio sem reposição),
+    com a união sobre os V vértices, pede ln(2V / (1 − confianca)) / (2 erro²)
+    origens.
+    """
+    if not 0 < erro:
+        raise ValueError("O erro deve ser positivo")
+    if not 0 < confianca < 1:
+        raise ValueError("A confiança deve estar entre 0 e 1")
+    if num_vertices <= 2:
+        return num_vertices
+    amostras = math.log(2 * num_vertices / (1 - confianca)) / (2 * erro * erro)
+    return min(num_vertices, math.ceil(amostras))
+
+
+def estimar_metricas(
+    grafo: Grafo,
+    amostras: Optional[int] = None,
+    erro: Optional[float] = None,
+    confianca: float = 0.95,
+    semente: Optional[int] = 0,
+    num_processos: Optional[int] = 1
+) -> MetricasAproximadas:
+    """
+    Estima intermediação e caminho médio com o algoritmo de Brandes a partir
+    de k origens sorteadas sem reposição, em O(k(E + V log V)).
+
+    A intermediação soma as dependências das origens sorteadas e multiplica
+    por V / k, o que dá um estimador não enviesado; o caminho médio é a média
+    das distâncias a partir delas. Com k = V o resultado é exato.
+
+    Args:
+        grafo: Grafo em formato CSR
+        amostras: Quantidade k de origens
+        erro: Alternativa a amostras: erro máximo desejado, como fração de
+            V · (V − 2) (ver amostras_necessarias)
+        confianca: Probabilidade com que a margem vale
+        semente: Semente do sorteio das origens
+        num_processos: Processos que dividem as origens (None: núcleos da
+            máquina)
+
+    Returns:
+        MetricasAproximadas, com a margem de erro para a confiança dada
+    """
+    n = grafo.num_vertices
+    if amostras is None:
+        if erro is None:
+            raise ValueError("Informe a quantidade de amostras ou o erro")
+        amostras = amostras_necessarias(n, erro, confianca)
+    elif amostras < 1:
+        raise ValueError("A quantidade de amostras deve ser positiva")
+    elif not 0 < confianca < 1:
+        raise ValueError("A confiança deve estar entre 0 e 1")
+    amostras = min(amostras, n)
+
+    origens = sorted(random.Random(semente).sample(range(n), amostras))
+    parciais = _varrer_em_paralelo(
+        grafo.lista_adjacencia(), origens, num_processos,
+        guardar_predecessores=False
+    )
+
+    escala = n / amostras if amostras else 0.0
+    intermediacao = [0.0] * n
+    soma_distancias = pares = 0
+    for parcial in parciais:
+        for v, valor in enumerate(parcial.intermediacao):
+            intermediacao[v] += valor * escala
+        soma_distancias += parcial.soma_distancias
+        pares += parcial.pares
+
+    margem = 0.0
+    if amostras < n:
+        margem = n * (n - 2) * math.sqrt(
+            math.log(2 * n / (1 - confianca)) / (2 * amostras)
+        )
+    return MetricasAproximadas(
+        intermediacao=intermediacao,
+        caminho_medio=soma_distancias / pares if pares > 0 else 0,
+        amostras=amostras,
+        margem=margem,
+        confianca=confianca
+    )
+
+
+def _adjacencia_reversa(grafo: Grafo) -> List[List[Tuple[int, int]]]:
+    """Listas de (vizinho, custo) dos arcos que chegam em cada vértice."""
+    reversa: List[List[Tuple[int, int]]] = [[] for _ in range(grafo.num_vertices)]
+    for u, v, c in grafo.arcos():
+        reversa[v].append((u, c))
+    return reversa
+
+
+def _excentricidade(dist: List[int]) -> Tuple[int, int]:
+    """Maior distância finita e o vértice que a atinge."""
+    maior, vertice = 0, -1
+    for v, d in enumerate(dist):
+        if maior < d < INFINITO:
+            maior, vertice = d, v
+    return maior, vertice
+
+
+def estimar_diametro(
+    grafo: Grafo,
+    max_varreduras: Optional[int] = 64,
+    semente: Optional[int] = 0
+) -> LimitesDiametro:
+    """
+    Limita o diâmetro com varreduras de Dijkstra, sem calcular todos os pares.
+
+    O limite inferior vem de varreduras duplas: a partir de um vértice
+    sorteado, vai-se ao mais distante (e ao mais distante dele pelos arcos
+    reversos) e toma-se a maior excentricidade vista. O limite superior segue
+    o iFUB para grafos direcionados: com a raiz r de maior grau, todo par
+    (x, y) tem d(x, y) ≤ d(x, r) + d(r, y); os vértices mais distantes de r
+    são varridos (para frente os que estão longe chegando em r, para trás os
+    que estão longe saindo de r) até que a soma das maiores distâncias ainda
+    não varridas não passe do limite inferior, quando o diâmetro é exato.
+
+    Args:
+        grafo: Grafo em formato CSR
+        max_varreduras: Máximo de execuções de Dijkstra (None: até ser exato)
+        semente: Semente do vértice inicial das varreduras duplas
+
+    Returns:
+        LimitesDiametro com o intervalo obtido dentro do orçamento
+    """
+    n = grafo.num_vertices
+    if n == 0:
+        return LimitesDiametro(0, 0, 0)
+    frente = grafo.lista_adjacencia()
+    tras = _adjacencia_reversa(grafo)
+    orcamento = max_varreduras if max_varreduras is not None else 2 * n + 4
+    varreduras = 0
+
+    def varrer(adjacencia, origem):
+        nonlocal varreduras
+        varreduras += 1
+        return dijkstra_origem(adjacencia, n, origem)[0]
+
+    # Raiz: d(r, ·) e d(·, r), que também valem como varreduras
+    graus = graus_saida(grafo)
+    raiz = max(range(n), key=graus.__getitem__)
+    saindo = varrer(frente, raiz)
+    chegando = varrer(tras, raiz)
+    limite_inferior, mais_longe = _excentricidade(saindo)
+    limite_inferior = max(limite_inferior, _excentricidade(chegando)[0])
+
+    # Varreduras duplas a partir de vértices sorteados
+    rng = random.Random(semente)
+    for _ in range(2):
+        if varreduras + 2 > orcamento:
+            break
+        origem = rng.randrange(n)
+        excentricidade, mais_longe = _excentricidade(varrer(frente, origem))
+        limite_inferior = max(limite_inferior, excentricidade)
+        if mais_longe >= 0:
+            limite_inferior = max(
+                limite_inferior,
+                _excentricidade(varrer(tras, mais_longe))[0]
+            )
+
+    # iFUB: x precisa de varredura para frente enquanto d(x, r) puder
+    # compor um par maior que o limite inferior; y, para trás, idem com d(r, y)
+    pendentes_frente = sorted(range(n), key=chegando.__getitem__)
+    pendentes_tras = sorted(range(n), key=saindo.__getitem__)
+    while True:
+        maior_chegando = chegando[pendentes_frente[-1]] if pendentes_frente else 0
+        maior_saindo = saindo[pendentes_tras[-1]] if pendentes_tras else 0
+        if maior_chegando < INFINITO and maior_saindo < INFINITO:
+            limite_superior = max(limite_inferior, maior_chegando + maior_saindo)
+        else:
+            limite_superior = None
+        if limite_superior == limite_inferior or varreduras >= orcamento:
+            break
+        if maior_chegando >= maior_saindo:
+            x = pendentes_frente.pop()
+            excentricidade = _excentricidade(varrer(frente, x))[0]
+        else:
+            y = pendentes_tras.pop()
+            excentricidade = _excentricidade(varrer(tras, y))[0]
+        limite_inferior = max(limite_inferior, excentricidade)
+
+    return LimitesDiametro(limite_inferior, limite_superior, varreduras)
+
+
+def obter_estimativas(
+    grafo: Grafo,
+    amostras: int,
+    max_varreduras: Optional[int] = 64
+) -> Tuple[MetricasAproximadas, LimitesDiametro]:
+    """estimar_metricas e estimar_diametro (semente 0) com cache por grafo."""
+    por_parametros = _CACHE_ESTIMATIVAS.setdefault(grafo, {})
+    chave = (amostras, max_varreduras)
+    if chave not in por_parametros:
+        por_parametros[chave] = (
+            estimar_metricas(grafo, amostras=amostras),
+            estimar_diametro(grafo, max_varreduras)
+        )
+    return por_parametros[chave]
@@ -0,0 +1,284 @@
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+from carp_solver import Aresta, CARPSolver, Checkpoint, Rota
+from distancias import CaminhosMinimos, montar_caminhos_minimos
+from grafo import Grafo
+
+
+# Faixas dos parâmetros sorteados em cada início aleatório
+FAIXA_LIMIAR = (0.5, 0.9)
+FAIXA_PESO = (0.1, 0.5)
+
+# Solver de cada processo do pool, criado uma vez pelo inicializador. A
+# referência ao bloco compartilhado mantém o mapeamento aberto.
+_solver_trabalhador: Optional[CARPSolver] = None
+_memoria_trabalhador: Optional[shared_memory.SharedMemory] = None
+
+
+@dataclass
+class ResultadoInicio:
+    semente: Optional[int]
+    rotas: List[Rota]
+    custo_total: int
+    clocks: int                 # ns de CPU do início
+    tempo_construcao: float
+    tempo_busca_local: float
+
+
+def executar_inicio(
+    solver: CARPSolver,
+    semente: Optional[int],
+    prazo: Optional[float] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    construcao: str = "path_scanning",
+    obrigatorio: bool = False
+) -> Optional[ResultadoInicio]:
+    """
+    Constrói uma solução e aplica a busca local.
+
+    Args:
+        solver: Solver da instância
+        semente: None para a construção determinística padrão; caso
+            contrário, semente do sorteio (limiar, peso e desempates no
+            path-scanning; ordem do tour gigante no split)
+        prazo: Instante (time.monotonic()) após o qual o início nem começa;
+            a busca local de um início em andamento para ao atingi-lo
+        checkpoint: Recebe a solução construída e as melhorias da busca local
+        construcao: Heurística de construção (ver carp_solver.CONSTRUCOES)
+        obrigatorio: Executa o início mesmo com o prazo vencido; nesse caso a
+            solução construída é devolvida sem busca local
+
+    Returns:
+        ResultadoInicio, ou None se o prazo já tiver passado
+    """
+    if prazo is not None and time.monotonic() >= prazo and not obrigatorio:
+        return None
+
+    inicio = time.process_time()
+    inicio_parede = time.perf_counter()
+    if semente is None:
+        rotas = solver._construir(construcao)
+    elif construcao == "split":
+        rotas = solver._construir_solucao_split(random.Random(semente))
+    else:
+        rng = random.Random(semente)
+        rotas = solver._construir_solucao_inicial(
+            rng.uniform(*FAIXA_LIMIAR), rng.uniform(*FAIXA_PESO), rng
+        )
+    tempo_construcao = time.perf_counter() - inicio_parede
+    if checkpoint is not None:
+        checkpoint.registrar(rotas, forcar=True)
+
+    inicio_busca = time.perf_counter()
+    if prazo is None or time.monotonic() < prazo:
+        rotas = solver._melhorar_solucao(
+            rotas, prazo=prazo, checkpoint=checkpoint
+        )
+    rotas = [rota for rota in rotas if rota.ids]
+    tempo_busca_local = time.perf_counter() - inicio_busca
+
+    return ResultadoInicio(
+        semente,
+        rotas,
+        sum(rota.custo_total for rota in rotas),
+        int((time.process_time() - inicio) * 1e9),
+        tempo_construcao,
+        tempo_busca_local
+    )
+
+
+def compartilhar_caminhos(
+    caminhos: CaminhosMinimos
+) -> shared_memory.SharedMemory:
+    """
+    Copia as matrizes de distâncias (int64) e predecessores (int32) para um
+    único bloco de memória compartilhada, nessa ordem.
+    """
+    n = caminhos.num_vertices
+    memoria = shared_memory.SharedMemory(create=True, size=max(n * n * 12, 1))
+    buffer = memoria.buf
+    posicao = 0
+    for linhas in (caminhos.distancias, caminhos.predecessores):
+        for linha in linhas:
+            dados = memoryview(linha).cast('B')
+            buffer[posicao:posicao + len(dados)] = dados
+            posicao += len(dados)
+    del buffer
+    return memoria
+
+
+def abrir_caminhos(
+    memoria: shared_memory.SharedMemory,
+    num_vertices: int
+) -> CaminhosMinimos:
+    """Monta um CaminhosMinimos somente leitura sobre o bloco compartilhado."""
+    tamanho_distancias = num_vertices * num_vertices * 8
+    buffer = memoria.buf.toreadonly()
+    return montar_caminhos_minimos(
+        buffer[:tamanho_distancias],
+        buffer[tamanho_distancias:tamanho_distancias + num_vertices * num_vertices * 4],
+        num_vertices,
+        "compartilhada"
+    )
+
+
+def _inicializar_trabalhador(
+    nome_memoria: Optional[str],
+    grafo: Grafo,
+    arestas_requeridas: List[Aresta],
+    capacidade_veiculo: int,
+    deposito: int,
+    k_vizinhos: Optional[int],
+    busca: str,
+    max_linhas: Optional[int] = None
+):
+    """Sem nome_memoria, o trabalhador usa seu próprio oráculo de distâncias."""
+    global _solver_trabalhador, _memoria_trabalhador
+    if nome_memoria is None:
+        _solver_trabalhador = CARPSolver(
+            grafo, arestas_requeridas, capacidade_veiculo, deposito,
+            k_vizinhos=k_vizinhos,
+            busca=busca,
+            oraculo=True,
+            max_linhas=max_linhas
+        )
+        return
+    if sys.version_info >= (3, 13):
+        _memoria_trabalhador = shared_memory.SharedMemory(nome_memoria, track=False)
+    else:
+        _memoria_trabalhador = shared_memory.SharedMemory(nome_memoria)
+    _solver_trabalhador = CARPSolver(
+        grafo, arestas_requeridas, capacidade_veiculo, deposito,
+        caminhos_minimos=abrir_caminhos(_memoria_trabalhador, grafo.num_vertices),
+        k_vizinhos=k_vizinhos,
+        busca=busca
+    )
+
+
+def _executar_inicio_trabalhador(
+    semente: Optional[int],
+    prazo: Optional[float],
+    construcao: str
+) -> Optional[ResultadoInicio]:
+    return executar_inicio(
+        _solver_trabalhador, semente, prazo, construcao=construcao
+    )
+
+
+def resolver_multi_inicio(
+    solver: CARPSolver,
+    num_inicios: int,
+    num_processos: Optional[int] = 1,
+    tempo_limite: Optional[float] = None,
+    semente: Optional[int] = None,
+    arquivo_checkpoint: Optional[str] = None,
+    intervalo_checkpoint: float = 5.0,
+    construcao: str = "path_scanning"
+) -> Tuple[List[Rota], int, int]:
+    """
+    Executa vários inícios da heurística construtiva, cada um seguido de
+    busca local, e devolve o melhor.
+
+    O primeiro início é determinístico (no path-scanning, com os parâmetros
+    padrão 0.7 e 0.3), de modo que o resultado nunca é pior que o de
+    CARPSolver.resolver sem prazo; os demais são aleatórios. Com mais de um processo, a
+    matriz de distâncias é copiada uma única vez para memória compartilhada
+    e lida por todos os processos do pool; se o solver usa o oráculo de
+    distâncias, cada processo monta o seu, já que não há matriz densa.
+
+    Args:
+        solver: Solver da instância (já com as distâncias calculadas)
+        num_inicios: Quantidade de inícios
+        num_processos: Quantidade de processos (None: núcleos da máquina)
+        tempo_limite: Tempo máximo total (segundos); inícios que não
+            começaram até lá são descartados
+        semente: Semente que gera as sementes de cada início
+        arquivo_checkpoint: Se informado, recebe a melhor solução encontrada
+            até o momento: a cada início concluído, ao final e, sem pool,
+            também durante a busca local (ver Checkpoint)
+        intervalo_checkpoint: Intervalo mínimo entre gravações (segundos)
+        construcao: Heurística de construção (ver carp_solver.CONSTRUCOES)
+
+    Returns:
+        Tuple com as rotas, o custo total e o total de clocks (ns) somados
+        em todos os inícios
+    """
+    prazo = None
+    if tempo_limite is not None:
+        prazo = time.monotonic() + tempo_limite
+
+    rng = random.Random(semente)
+    sementes: List[Optional[int]] = [None] + [
+        rng.getrandbits(63) for _ in range(num_inicios - 1)
+    ]
+
+    checkpoint = None
+    if arquivo_checkpoint is not None:
+        checkpoint = Checkpoint(solver, arquivo_checkpoint, intervalo_checkpoint)
+
+    inicio_parede = time.perf_counter()
+    if num_processos == 1 or num_inicios == 1:
+        resultados = [
+            executar_inicio(solver, s, prazo, checkpoint, construcao)
+            for s in sementes
+        ]
+    else:
+        memoria = None
+        if not solver.oraculo:
+            memoria = compartilhar_caminhos(
+                CaminhosMinimos(
+                    solver.num_vertices, solver.distancias,
+                    solver.predecessores, ""
+                )
+            )
+        try:
+            with ProcessPoolExecutor(
+                max_workers=num_processos,
+                initializer=_inicializar_trabalhador,
+                initargs=(
+                    memoria.name if memoria is not None else None,
+                    solver.grafo, solver.arestas_requeridas,
+                    solver.capacidade_veiculo, solver.deposito,
+                    solver.k_vizinhos, solver.busca, solver.max_linhas
+                )
+            ) as executor:
+                futuros = [
+                    executor.submit(
+                        _executar_inicio_trabalhador, s, prazo, construcao
+                    )
+                    for s in sementes
+                ]
+                resultados = []
+                for futuro in as_completed(futuros):
+                    resultado = futuro.result()
+                    resultados.append(resultado)
+                    if checkpoint is not None and resultado is not None:
+                        checkpoint.registrar(resultado.rotas, forcar=True)
+        finally:
+            if memoria is not None:
+                memoria.close()
+                memoria.unlink()
+
+    concluidos = [r for r in resultados if r is not None]
+    if not concluidos:
+        # Nenhum início coube no prazo: o início padrão roda mesmo assim,
+        # mas a busca local respeita o prazo (já vencido, em geral)
+        concluidos = [
+            executar_inicio(
+                solver, None, prazo, checkpoint, construcao, obrigatorio=True
+            )
+        ]
+
+    melhor = min(concluidos, key=lambda r: (r.custo_total, sementes.index(r.semente)))
+    if checkpoint is not None:
+        checkpoint.registrar(melhor.rotas, forcar=True)
+    solver.tempos["construcao"] = sum(r.tempo_construcao for r in concluidos)
+    solver.tempos["busca_local"] = sum(r.tempo_busca_local for r in concluidos)
+    solver.tempos["multi_inicio"] = time.perf_counter() - inicio_parede
+    return melhor.rotas, melhor.custo_total, sum(r.clocks for r in concluidos)
@@ -1,6 +1,20 @@
+import argparse
+import csv
+import glob
+import json
 import os
+import sys
+from dataclasses import asdict, fields
+from typing import List, Optional
+
+from cache_distancias import CacheDistancias
 from carp_reader import ler_instancia_carp
-from carp_solver import CARPSolver
+from carp_solver import BUSCAS, CONSTRUCOES, CARPSolver, TIPO_NO
+from metaheuristica import METAHEURISTICAS
+from resolver_lote import OpcoesResolucao, ResultadoInstancia, resolver_em_paralelo
+
+
+CAMPOS_RELATORIO = [campo.name for campo in fields(ResultadoInstancia)]
 
 
 def main():
@@ -31,26 +45,32 @@ def main():
     
     try:
         # Lê a instância
-        matriz_adjacencia, arestas_requeridas, capacidade, deposito = \
+        grafo, arestas_requeridas, capacidade, deposito = \
             ler_instancia_carp(caminho_arquivo)
         
         print("\nInformações da instância:")
-        print(f"- Número de vértices: {len(matriz_adjacencia)}")
-        print("- Número de arestas requeridas: "
-              f"{sum(1 for a in arestas_requeridas if a.requerida)}")
+        print(f"- Número de vértices: {grafo.num_vertices}")
+        print(
+            "- Número de nós requeridos: "
+            f"{sum(1 for a in arestas_requeridas if a.requerida and a.tipo == TIPO_NO)}"
+        )
+        print(
+            "- Número de arestas/arcos requeridos: "
+            f"{sum(1 for a in arestas_requeridas if a.requerida and a.tipo != TIPO_NO)}"
+        )
         print(f"- Capacidade do veículo: {capacidade}")
         print(f"- Vértice do depósito: {deposito}")
         
         # Cria e executa o solver
         solver = CARPSolver(
-            matriz_adjacencia,
+            grafo,
             arestas_requeridas,
             capacidade,
             deposito
         )
         
         print("\nResolvendo o problema...")
-        rotas, custo_total = solver.resolver()
+        rotas, custo_total, clocks = solver.resolver()
         
         print("\nSolução encontrada:")
         print(f"- Custo total: {custo_total}")
@@ -58,8 +78,180 @@ def main():
         
         # Gera o arquivo de solução
         nome_solucao = f"solucao_{nome_arquivo[:-4]}.dat"
-        solver.gerar_arquivo_solucao(rotas, custo_total, nome_solucao)
+        solver.gerar_arquivo_solucao(rotas, custo_total, nome_solucao, clocks)
         print("\nSolução salva em:", nome_solucao)
         
     except Exception as e:
-        print("Erro ao resolver a instância:", e)
\ No newline at end of file
+        print("Erro ao resolver a instância:", e)
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Resolve instâncias do CARP sem interação e gera um "
+                    "relatório com custos e tempos de cada etapa."
+    )
+    parser.add_argument(
+        "instancias", nargs="*",
+        help="Arquivos ou padrões glob (ex.: 'selected_instances/BHW*.dat'). "
+             "Sem argumentos, abre o menu interativo."
+    )
+    parser.add_argument(
+        "-o", "--saida", default="best_solutions",
+        help="Pasta dos arquivos sol-*.dat (padrão: best_solutions)"
+    )
+    parser.add_argument(
+        "-t", "--tempo-limite", type=float, default=None,
+        help="Tempo máximo de resolução por instância, em segundos"
+    )
+    parser.add_argument(
+        "--intervalo-checkpoint", type=float, default=5.0,
+        help="Intervalo mínimo, em segundos, entre gravações da melhor "
+             "solução conhecida no arquivo sol-*.dat (padrão: 5)"
+    )
+    parser.add_argument(
+        "-s", "--semente", type=int, default=None,
+        help="Semente aleatória usada em cada instância"
+    )
+    parser.add_argument(
+        "-p", "--processos", type=int, default=1,
+        help="Quantidade de processos em paralelo (padrão: 1)"
+    )
+    parser.add_argument(
+        "-c", "--construcao", choices=CONSTRUCOES, default="path_scanning",
+        help="Heurística da solução inicial: path_scanning (gulosa por "
+             "capacidade) ou split (tour gigante dividido de forma ótima)"
+    )
+    parser.add_argument(
+        "-k", "--vizinhos", type=int, default=None,
+        help="Restringe os movimentos entre rotas aos k serviços mais "
+             "próximos de cada serviço (ex.: 10 a 20; padrão: todos os pares)"
+    )
+    parser.add_argument(
+        "-b", "--busca", choices=BUSCAS, default="primeira",
+        help="Busca local por primeira melhoria ou por melhor melhoria com "
+             "fila de prioridade (padrão: primeira)"
+    )
+    parser.add_argument(
+        "-M", "--metaheuristica", choices=sorted(METAHEURISTICAS), default=None,
+        help="Continua a busca depois do ótimo local até o tempo limite: ils "
+             "(busca local iterada) ou tabu (busca tabu); sem -t, para quando "
+             "estagnar. Usa a semente de -s"
+    )
+    parser.add_argument(
+        "-m", "--inicios", type=int, default=1,
+        help="Inícios aleatórios da heurística construtiva por instância, "
+             "cada um seguido de busca local (padrão: 1)"
+    )
+    parser.add_argument(
+        "--processos-inicios", type=int, default=1,
+        help="Processos que executam os inícios de cada instância, "
+             "compartilhando a matriz de distâncias (padrão: 1)"
+    )
+    parser.add_argument(
+        "--oraculo", action="store_true",
+        help="Calcula as distâncias sob demanda, por Dijkstra a partir das "
+             "extremidades dos serviços e do depósito, em vez da matriz V×V "
+             "(para grafos grandes; ignora o cache de distâncias)"
+    )
+    parser.add_argument(
+        "--max-linhas", type=int, default=None,
+        help="Linhas de distância guardadas pelo oráculo (padrão: "
+             "extremidades dos serviços mais o depósito)"
+    )
+    parser.add_argument(
+        "-r", "--relatorio", default="-",
+        help="Arquivo do relatório ('-' para a saída padrão)"
+    )
+    parser.add_argument(
+        "-f", "--formato", choices=["json", "csv"], default="json",
+        help="Formato do relatório (padrão: json)"
+    )
+    parser.add_argument(
+        "--limpar-cache", action="store_true",
+        help="Remove o cache de distâncias antes de resolver"
+    )
+    return parser
+
+
+def expandir_instancias(padroes: List[str]) -> List[str]:
+    """Expande os padrões glob, sem repetir arquivos."""
+    caminhos = []
+    for padrao in padroes:
+        encontrados = sorted(glob.glob(padrao)) or [padrao]
+        for caminho in encontrados:
+            if caminho not in caminhos:
+                caminhos.append(caminho)
+    return caminhos
+
+
+def escrever_relatorio(linhas: List[dict], destino, formato: str):
+    if formato == "json":
+        json.dump(linhas, destino, indent=2, ensure_ascii=False)
+        destino.write("\n")
+    else:
+        escritor = csv.DictWriter(destino, fieldnames=CAMPOS_RELATORIO)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def executar_cli(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada não interativo.
+
+    Returns:
+        Código de saída: 0 se todas as instâncias foram resolvidas, 1 caso
+        contrário
+    """
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.metaheuristica is not None and args.inicios > 1:
+        parser.error("--metaheuristica não pode ser combinada com --inicios > 1")
+    if args.max_linhas is not None:
+        if not args.oraculo:
+            parser.error("--max-linhas só pode ser usado com --oraculo")
+        if args.max_linhas < 1:
+            parser.error("--max-linhas deve ser positivo")
+    if not args.instancias:
+        main()
+        return 0
+
+    if args.limpar_cache:
+        CacheDistancias().limpar()
+
+    caminhos = expandir_instancias(args.instancias)
+    opcoes = OpcoesResolucao(
+        tempo_limite=args.tempo_limite,
+        semente=args.semente,
+        num_inicios=args.inicios,
+        processos_inicios=args.processos_inicios,
+        intervalo_checkpoint=args.intervalo_checkpoint,
+        construcao=args.construcao,
+        k_vizinhos=args.vizinhos,
+        busca=args.busca,
+        metaheuristica=args.metaheuristica,
+        oraculo=args.oraculo,
+        max_linhas=args.max_linhas
+    )
+    resultados = resolver_em_paralelo(
+        caminhos, args.saida, args.processos, opcoes
+    )
+
+    linhas = []
+    for resultado in resultados:
+        linhas.append(asdict(resultado))
+        # Progresso no stderr para não misturar com o relatório
+        situacao = resultado.erro or f"custo {resultado.custo_total}"
+        print(f"{resultado.nome}: {situacao}", file=sys.stderr)
+    linhas.sort(key=lambda linha: linha["nome"])
+
+    if args.relatorio == "-":
+        escrever_relatorio(linhas, sys.stdout, args.formato)
+    else:
+        with open(args.relatorio, "w", newline="") as f:
+            escrever_relatorio(linhas, f, args.formato)
+
+    return 1 if any(linha["erro"] for linha in linhas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(executar_cli())
@@ -0,0 +1,235 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from cache_distancias import CacheDistancias
+from carp_reader import ler_cabecalho_carp, ler_instancia_carp
+from carp_solver import Aresta, CARPSolver
+from grafo import Grafo
+from multi_inicio import resolver_multi_inicio
+
+
+@dataclass
+class OpcoesResolucao:
+    """
+    Parâmetros de resolução de cada instância, repassados como um só objeto
+    (e por nome) do CLI e do benchmark até o solver.
+
+    Attributes:
+        tempo_limite: Tempo máximo de resolução por instância (segundos)
+        semente: Semente aleatória usada em cada instância
+        num_inicios: Inícios da heurística construtiva por instância
+        processos_inicios: Processos usados pelos inícios de cada instância
+        intervalo_checkpoint: Intervalo mínimo (segundos) entre gravações da
+            melhor solução conhecida de cada instância
+        construcao: Heurística da solução inicial (ver carp_solver.CONSTRUCOES)
+        k_vizinhos: Tamanho da lista granular (None: todos os pares)
+        busca: Estratégia da busca local (ver carp_solver.BUSCAS)
+        metaheuristica: Metaheurística aplicada após a busca local (ver
+            metaheuristica.METAHEURISTICAS), ou None; só com num_inicios == 1
+        oraculo: Calcula as distâncias sob demanda (ver
+            distancias.OraculoDistancias) em vez da matriz V×V
+        max_linhas: Linhas guardadas pelo oráculo (None: extremidades dos
+            serviços mais o depósito)
+    """
+    tempo_limite: Optional[float] = None
+    semente: Optional[int] = None
+    num_inicios: int = 1
+    processos_inicios: Optional[int] = 1
+    intervalo_checkpoint: float = 5.0
+    construcao: str = "path_scanning"
+    k_vizinhos: Optional[int] = None
+    busca: str = "primeira"
+    metaheuristica: Optional[str] = None
+    oraculo: bool = False
+    max_linhas: Optional[int] = None
+
+    def criar_solver(
+        self,
+        grafo: Grafo,
+        arestas_requeridas: List[Aresta],
+        capacidade: int,
+        deposito: int,
+        cache: Optional[CacheDistancias] = None
+    ) -> CARPSolver:
+        """CARPSolver com estas opções; o cache é ignorado com o oráculo."""
+        return CARPSolver(
+            grafo,
+            arestas_requeridas,
+            capacidade,
+            deposito,
+            None if self.oraculo else cache,
+            k_vizinhos=self.k_vizinhos,
+            busca=self.busca,
+            oraculo=self.oraculo,
+            max_linhas=self.max_linhas
+        )
+
+
+@dataclass
+class ResultadoInstancia:
+    nome: str
+    custo_total: int = 0
+    num_rotas: int = 0
+    clocks: int = 0
+    arquivo_solucao: str = ""
+    erro: Optional[str] = None
+    # Tempos de parede em segundos
+    tempo_leitura: float = 0.0
+    tempo_caminhos_minimos: float = 0.0
+    tempo_construcao: float = 0.0
+    tempo_busca_local: float = 0.0
+    tempo_metaheuristica: float = 0.0
+    semente: Optional[int] = None
+    inicios: int = 1
+
+
+def tamanho_instancia(caminho: str) -> int:
+    """
+    Estima o esforço de uma instância pelo cabeçalho (#Nodes × #Edges+#Arcs),
+    sem ler o corpo do arquivo.
+    """
+    try:
+        cabecalho = ler_cabecalho_carp(caminho)
+    except OSError:
+        return 0  # o erro é reportado quando a instância for resolvida
+
+    def campo(nome: str) -> int:
+        try:
+            return int(cabecalho.get(nome, "0"))
+        except ValueError:
+            return 0
+
+    return campo("#Nodes") * (campo("#Edges") + campo("#Arcs"))
+
+
+def ordenar_por_tamanho(caminhos: List[str]) -> List[str]:
+    """Ordena as instâncias da maior para a menor."""
+    return sorted(caminhos, key=tamanho_instancia, reverse=True)
+
+
+def nome_arquivo_solucao(caminho_instancia: str, diretorio_saida: str) -> str:
+    nome = os.path.splitext(os.path.basename(caminho_instancia))[0]
+    return os.path.join(diretorio_saida, f"sol-{nome}.dat")
+
+
+def resolver_instancia(
+    caminho: str,
+    diretorio_saida: str = "best_solutions",
+    opcoes: Optional[OpcoesResolucao] = None
+) -> ResultadoInstancia:
+    """
+    Resolve uma instância e grava sua solução. Executado nos processos do pool,
+    por isso não imprime nada: o resultado volta para o processo principal.
+
+    Com opcoes.num_inicios > 1, usa resolver_multi_inicio com
+    opcoes.processos_inicios processos e tempo_limite como orçamento total
+    dos inícios.
+
+    O arquivo de solução recebe a melhor solução conhecida a cada
+    intervalo_checkpoint segundos, de modo que uma instância interrompida
+    ainda deixa um arquivo válido. Com uma metaheuristica (só com um início),
+    a busca continua depois do ótimo local até tempo_limite, com a semente
+    dada.
+    """
+    if opcoes is None:
+        opcoes = OpcoesResolucao()
+    nome = os.path.basename(caminho)
+    semente = opcoes.semente
+    if semente is not None:
+        random.seed(semente)
+    try:
+        inicio = time.perf_counter()
+        grafo, arestas_requeridas, capacidade, deposito = \
+            ler_instancia_carp(caminho)
+        tempo_leitura = time.perf_counter() - inicio
+        arquivo_solucao = nome_arquivo_solucao(caminho, diretorio_saida)
+        solver = opcoes.criar_solver(
+            grafo, arestas_requeridas, capacidade, deposito, CacheDistancias()
+        )
+        if opcoes.num_inicios > 1:
+            if opcoes.metaheuristica is not None:
+                raise ValueError("Metaheurística só pode ser usada com um início")
+            rotas, custo_total, clocks = resolver_multi_inicio(
+                solver,
+                opcoes.num_inicios,
+                num_processos=opcoes.processos_inicios,
+                tempo_limite=opcoes.tempo_limite,
+                semente=semente,
+                arquivo_checkpoint=arquivo_solucao,
+                intervalo_checkpoint=opcoes.intervalo_checkpoint,
+                construcao=opcoes.construcao
+            )
+        else:
+            rotas, custo_total, clocks = solver.resolver(
+                tempo_limite=opcoes.tempo_limite,
+                arquivo_checkpoint=arquivo_solucao,
+                intervalo_checkpoint=opcoes.intervalo_checkpoint,
+                construcao=opcoes.construcao,
+                metaheuristica=opcoes.metaheuristica,
+                semente=semente
+            )
+
+        solver.gerar_arquivo_solucao(rotas, custo_total, arquivo_solucao, clocks)
+    except Exception as e:
+        return ResultadoInstancia(
+            nome, erro=str(e), semente=semente, inicios=opcoes.num_inicios
+        )
+
+    return ResultadoInstancia(
+        nome, custo_total, len(rotas), clocks, arquivo_solucao,
+        tempo_leitura=tempo_leitura,
+        tempo_caminhos_minimos=solver.tempos["caminhos_minimos"],
+        tempo_construcao=solver.tempos["construcao"],
+        tempo_busca_local=solver.tempos["busca_local"],
+        tempo_metaheuristica=solver.tempos.get("metaheuristica", 0.0),
+        semente=semente,
+        inicios=opcoes.num_inicios
+    )
+
+
+def resolver_em_paralelo(
+    caminhos: List[str],
+    diretorio_saida: str = "best_solutions",
+    num_processos: Optional[int] = None,
+    opcoes: Optional[OpcoesResolucao] = None
+) -> Iterator[ResultadoInstancia]:
+    """
+    Resolve várias instâncias em um pool de processos.
+
+    As maiores instâncias são enviadas primeiro, para que não fiquem sozinhas
+    no fim da fila, e os resultados são devolvidos à medida que terminam.
+
+    Args:
+        caminhos: Caminhos dos arquivos de instância
+        diretorio_saida: Pasta onde os arquivos sol-*.dat são gravados
+        num_processos: Quantidade de processos (padrão: núcleos da máquina)
+        opcoes: Parâmetros de resolução de cada instância (padrão:
+            OpcoesResolucao())
+
+    Yields:
+        ResultadoInstancia de cada instância, na ordem de conclusão
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    caminhos = ordenar_por_tamanho(caminhos)
+    if opcoes is None:
+        opcoes = OpcoesResolucao()
+
+    if num_processos == 1:
+        for caminho in caminhos:
+            yield resolver_instancia(caminho, diretorio_saida, opcoes)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_processos) as executor:
+        futuros = [
+            executor.submit(
+                resolver_instancia, caminho,
+                diretorio_saida=diretorio_saida, opcoes=opcoes
+            )
+            for caminho in caminhos
+        ]
+        for futuro in as_completed(futuros):
+            yield futuro.result()